@@ -0,0 +1,59 @@
+"""
+Бенчмарк: стоимость проверки JWT в зависимости get_current_user с кэшем и без.
+
+Запуск из корня репозитория (нужны JWT_SECRET_KEY и DB_USERS_URL в окружении или .env):
+    python -m api.benchmarks.bench_jwt_auth
+
+Сценарий — чат-сессии: TOKENS пользователей, каждый токен предъявляется REQUESTS/TOKENS раз.
+Печатает медианное время на запрос и долю попаданий кэша.
+"""
+import asyncio
+import statistics
+import time
+from datetime import timedelta
+
+from jose import jwt
+
+from api.deps import get_current_user
+from api.settings import settings
+from api.token_cache import VerifiedTokenCache
+import api.deps as deps
+
+TOKENS = 50
+REQUESTS = 20000
+RUNS = 5
+
+
+def make_tokens() -> list[str]:
+    exp = int(time.time() + timedelta(minutes=30).total_seconds())
+    return [
+        jwt.encode({"sub": str(i), "exp": exp}, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+        for i in range(TOKENS)
+    ]
+
+
+async def run(tokens: list[str]) -> float:
+    started = time.perf_counter()
+    for i in range(REQUESTS):
+        await get_current_user(tokens[i % len(tokens)])
+    return (time.perf_counter() - started) / REQUESTS
+
+
+def measure(tokens: list[str], cache: VerifiedTokenCache) -> float:
+    deps.token_cache = cache
+    return statistics.median(asyncio.run(run(tokens)) for _ in range(RUNS))
+
+
+def main():
+    tokens = make_tokens()
+    uncached = measure(tokens, VerifiedTokenCache(max_items=0, max_ttl=0))
+    cache = VerifiedTokenCache(max_items=settings.AUTH_TOKEN_CACHE_ITEMS, max_ttl=settings.AUTH_TOKEN_CACHE_MAX_TTL)
+    cached = measure(tokens, cache)
+    print(f"{'mode':<10} {'us/request':>12}")
+    print(f"{'jose':<10} {uncached * 1e6:>12.1f}")
+    print(f"{'cache':<10} {cached * 1e6:>12.1f}")
+    print(f"speedup x{uncached / cached:.1f}, hit rate {cache.stats()['hit_rate']:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,14 @@ class UserNotFoundException(Exception):
         super().__init__(message)
 
 
+class UserAlreadyExistsException(Exception):
+    """Исключение: логин или email уже заняты (нарушение уникальности)"""
+
+    def __init__(self, login: str):
+        self.login = login
+        super().__init__("Пользователь с таким именем или email уже существует")
+
+
 class ChatsNotFoundException(Exception):
     """Исключение: чаты не найдены"""
 
@@ -1,39 +1,30 @@
 import logging
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import (
-    AsyncSession,
-    async_sessionmaker,
-    create_async_engine,
-)
-from sqlalchemy.pool import NullPool
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..domain.user import User
 from .models import Users
-from .exceptions import UserNotFoundException
+from .exceptions import UserAlreadyExistsException, UserNotFoundException
+from .user_cache import UserCache, user_cache
 logger = logging.getLogger(__name__)
 
 
 class Manager:
-    """Менеджер для работы с базой данных"""
-
-    def __init__(self, db_uri: str):
-        engine = create_async_engine(
-            db_uri,
-            echo=False,
-            future=True,
-            poolclass=NullPool,
-        )
-        sessionmaker = async_sessionmaker(
-            bind=engine,
-            expire_on_commit=False,
-            class_=AsyncSession,
-        )
-        self._engine = engine
-        self._sessionmaker = sessionmaker
-        self._session = sessionmaker()
+    """
+    Менеджер для работы с базой данных.
+    Работает в сессии запроса (см. get_db_session), сам соединения не открывает.
+    Чтения пользователей идут через общий на процесс кэш (без хэша пароля), записи его сбрасывают.
+    """
+
+    def __init__(self, session: AsyncSession, cache: UserCache = user_cache):
+        self._session = session
+        self._cache = cache
 
     async def user_exists_by_login(self, login: str) -> bool:
         """Проверяет наличие пользователя по логину"""
+        if self._cache.get_by_login(login) is not None:
+            return True
         try:
             result = await self._session.execute(
                 select(Users.id).where(Users.login == login)
@@ -44,15 +35,27 @@ class Manager:
             raise
 
     async def create_user(self, login: str, email: str, full_name: str, password_hash: str) -> User:
-        """Создание нового пользователя"""
+        """
+        Создание нового пользователя одним INSERT ... RETURNING.
+        Занятость логина/email проверяет уникальный индекс, а не отдельный запрос.
+
+        Raises:
+            UserAlreadyExistsException: Если логин или email уже заняты
+        """
         try:
-            user_db = Users(login=login, email=email,
-                            full_name=full_name, password_hash=password_hash)
-            self._session.add(user_db)
-            await self._session.flush()
-            await self._session.refresh(user_db)
+            result = await self._session.execute(
+                insert(Users)
+                .values(login=login, email=email,
+                        full_name=full_name, password_hash=password_hash)
+                .returning(Users)
+            )
+            user = result.scalar_one().to_domain()
             await self._session.commit()
-            return user_db.to_domain()
+            self._cache.invalidate(user_id=user.id, login=login)
+            return user
+        except IntegrityError:
+            await self._session.rollback()
+            raise UserAlreadyExistsException(login=login)
         except Exception as e:
             await self._session.rollback()
             logger.error(f"Error creating user login={login}: {e}")
@@ -71,6 +74,9 @@ class Manager:
         Raises:
             UserNotFoundException: Если пользователь не найден
         """
+        user = self._cache.get_by_id(user_id)
+        if user is not None:
+            return user
         try:
             result = await self._session.execute(
                 select(Users).where(Users.id == user_id)
@@ -80,7 +86,9 @@ class Manager:
             if not user_db:
                 raise UserNotFoundException(user_id=user_id)
 
-            return user_db.to_domain()
+            user = user_db.to_domain()
+            self._cache.put(user)
+            return user
         except UserNotFoundException:
             raise
         except Exception as e:
@@ -100,6 +108,9 @@ class Manager:
         Raises:
             UserNotFoundException: Если пользователь не найден
         """
+        user = self._cache.get_by_login(login)
+        if user is not None:
+            return user
         try:
             result = await self._session.execute(
                 select(Users).where(Users.login == login)
@@ -109,13 +120,37 @@ class Manager:
             if not user_db:
                 raise UserNotFoundException(login=login)
 
-            return user_db.to_domain()
+            user = user_db.to_domain()
+            self._cache.put(user)
+            return user
         except UserNotFoundException:
             raise
         except Exception as e:
             logger.error(f"Error getting user by login login={login}: {e}")
             raise
 
+    async def get_user_for_login(self, login: str) -> User:
+        """
+        Пользователь с хэшем пароля для проверки при входе — всегда из БД, мимо кэша:
+        пароль, смененный через другую реплику gateway, не должен оставаться рабочим.
+
+        Raises:
+            UserNotFoundException: Если пользователь не найден
+        """
+        try:
+            result = await self._session.execute(
+                select(Users).where(Users.login == login)
+            )
+            user_db = result.scalar_one_or_none()
+        except Exception as e:
+            logger.error(f"Error getting user for login login={login}: {e}")
+            raise
+        if not user_db:
+            raise UserNotFoundException(login=login)
+        user = user_db.to_domain()
+        self._cache.put(user)
+        return user
+
     async def change_password(
             self, user_id: int, new_password_hash: str
     ):
@@ -128,4 +163,5 @@ class Manager:
             raise UserNotFoundException(user_id=user_id)
         user_db.password_hash = new_password_hash
         await self._session.commit()
+        self._cache.invalidate(user_id=user_id, login=user_db.login)
         await self._session.refresh(user_db)
@@ -0,0 +1,46 @@
+import logging
+
+from sqlalchemy import Column, Integer, Table, delete, insert, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .base import Base
+
+logger = logging.getLogger(__name__)
+
+# Увеличивается при каждом изменении моделей в db/models.py
+SCHEMA_VERSION = 1
+
+schema_version = Table(
+    "schema_version",
+    Base.metadata,
+    Column("version", Integer, nullable=False),
+)
+
+
+async def ensure_schema(engine: AsyncEngine):
+    """
+    Быстрая проверка схемы на старте: один SELECT версии вместо create_all.
+    Таблицы создаются, только если БД пустая или отстает от SCHEMA_VERSION.
+    """
+    try:
+        async with engine.connect() as conn:
+            current = (await conn.execute(select(schema_version.c.version))).scalar_one_or_none()
+    except DBAPIError:
+        # Таблицы версии еще нет — новая БД или созданная до введения версий
+        current = None
+
+    if current == SCHEMA_VERSION:
+        return
+    if current is not None and current > SCHEMA_VERSION:
+        logger.warning(f"DB schema version {current} is newer than expected {SCHEMA_VERSION}")
+        return
+
+    logger.info(f"Upgrading DB schema {current} -> {SCHEMA_VERSION}")
+    from . import models  # noqa: F401  Регистрирует таблицы в Base.metadata
+
+    async with engine.begin() as conn:
+        # Эта команда создает таблицы, если их нет
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(delete(schema_version))
+        await conn.execute(insert(schema_version).values(version=SCHEMA_VERSION))
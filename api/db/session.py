@@ -0,0 +1,50 @@
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.engine import make_url
+
+from ..settings import settings
+
+
+def create_db_engine(db_uri: str) -> AsyncEngine:
+    """
+    Единственный на процесс async-движок с пулом соединений.
+    Создается в lifespan gateway и закрывается при остановке.
+    """
+    connect_args = {}
+    if make_url(db_uri).drivername == "postgresql+asyncpg":
+        # Кэш подготовленных выражений asyncpg на каждое соединение пула
+        connect_args["prepared_statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+    return create_async_engine(
+        db_uri,
+        echo=False,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        connect_args=connect_args,
+    )
+
+
+def create_sessionmaker(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        bind=engine,
+        expire_on_commit=False,
+        class_=AsyncSession,
+    )
+
+
+def pool_stats(engine: AsyncEngine) -> dict:
+    """Загрузка пула соединений: сколько занято, свободно и открыто сверх pool_size."""
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
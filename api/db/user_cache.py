@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from dataclasses import replace
+
+from ..domain.user import User
+from ..settings import settings
+
+
+class UserCache:
+    """
+    Read-through кэш доменных User по ID и по логину (LRU + TTL).
+    Обе записи указывают на один объект и удаляются вместе.
+    Хэш пароля не кэшируется: сброс кэша при смене пароля виден только своей реплике gateway,
+    поэтому вход всегда проверяет пароль по БД (Manager.get_user_for_login).
+    """
+
+    def __init__(self, max_items: int, ttl_seconds: int):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        # id -> (expires_at, user); порядок — порядок LRU
+        self._by_id: OrderedDict[int, tuple[float, User]] = OrderedDict()
+        self._id_by_login: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_by_id(self, user_id: int) -> User | None:
+        entry = self._by_id.get(user_id)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                self.invalidate(user_id=user_id)
+            self.misses += 1
+            return None
+        self._by_id.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def get_by_login(self, login: str) -> User | None:
+        user_id = self._id_by_login.get(login)
+        if user_id is None:
+            self.misses += 1
+            return None
+        return self.get_by_id(user_id)
+
+    def put(self, user: User):
+        if self.max_items <= 0:
+            return
+        self.invalidate(user_id=user.id, login=user.login)
+        self._by_id[user.id] = (time.time() + self.ttl_seconds, replace(user, password_hash=""))
+        self._id_by_login[user.login] = user.id
+        while len(self._by_id) > self.max_items:
+            self.invalidate(user_id=next(iter(self._by_id)))
+
+    def invalidate(self, user_id: int | None = None, login: str | None = None):
+        if login is not None and user_id is None:
+            user_id = self._id_by_login.get(login)
+        entry = self._by_id.pop(user_id, None) if user_id is not None else None
+        if entry is not None:
+            self._id_by_login.pop(entry[1].login, None)
+        if login is not None:
+            self._id_by_login.pop(login, None)
+
+    def stats(self) -> dict:
+        return {"items": len(self._by_id), "hits": self.hits, "misses": self.misses}
+
+
+user_cache = UserCache(
+    max_items=settings.USER_CACHE_ITEMS,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+)
@@ -1,8 +1,11 @@
-from typing import Optional
-from fastapi import Depends, HTTPException, status
+from typing import AsyncIterator, Optional
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from api.settings import settings
+from jose import JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.db.manager import Manager
+from api.token_cache import token_cache
+from api.tracing import span
 
 # Схема авторизации: ожидает заголовок Authorization: Bearer <token>
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
@@ -21,11 +24,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
     )
     try:
         # Декодируем токен, используя секретный ключ
-        payload = jwt.decode(
-            token,
-            settings.JWT_SECRET_KEY,
-            algorithms=[settings.JWT_ALGORITHM]
-        )
+        # (проверенные токены берутся из кэша до истечения exp)
+        with span("auth"):
+            payload = token_cache.decode(token)
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
@@ -38,4 +39,14 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
 
 async def get_token_header(token: str = Depends(oauth2_scheme)) -> str:
     """Возвращает чистый токен для передачи в downstream сервисы."""
-    return token
\ No newline at end of file
+    return token
+
+
+async def get_db_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """Сессия БД на время запроса: соединение берется из общего пула и возвращается в него."""
+    async with request.app.state.db_sessionmaker() as session:
+        yield session
+
+
+def get_manager(session: AsyncSession = Depends(get_db_session)) -> Manager:
+    return Manager(session)
@@ -1,17 +1,20 @@
+# Первым импортом: в режиме STARTUP_PROFILE меряет импорт всех остальных модулей
+from .startup_profile import startup_profiler
+
 import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-from .db.base import Base  # Убедитесь, что пути правильные
-from sqlalchemy.ext.asyncio import (
-    AsyncSession,
-    async_sessionmaker,
-    create_async_engine,
-)
-from sqlalchemy.pool import NullPool
+from .db.schema import ensure_schema
+from .db.session import create_db_engine, create_sessionmaker, pool_stats
 from .settings import settings
 from .routers import auth, proxy
+from .routers.proxy import create_llm_client
+from .proxy_cache import ProxyCache
+from .token_cache import token_cache
+from . import metrics, tracing
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 # Логирование
 logging.basicConfig(level=logging.INFO)
@@ -44,20 +47,31 @@ async def lifespan(app: FastAPI):
     # app.state.sso_client = sso_client
 
     logger.info("Starting Users Data Base...")
-    engine = create_async_engine(
-        settings.DB_USERS_URL,
-        echo=False,
-        future=True,
-        poolclass=NullPool,
-    )
-    async with engine.begin() as conn:
-        # Эта команда создает таблицы, если их нет
-        await conn.run_sync(Base.metadata.create_all)
+    # Один движок с пулом соединений на весь процесс; сессии — на время запроса
+    with startup_profiler.stage("db engine"):
+        engine = create_db_engine(settings.DB_USERS_URL)
+    # Вместо create_all на каждом старте — проверка версии схемы одним запросом
+    with startup_profiler.stage("ensure_schema"):
+        await ensure_schema(engine)
+    app.state.db_engine = engine
+    app.state.db_sessionmaker = create_sessionmaker(engine)
     logger.info('Users Data Base is running...')
+
+    # Общий пул соединений прокси к llm_service
+    with startup_profiler.stage("llm client"):
+        app.state.llm_client = create_llm_client()
+    app.state.proxy_cache = ProxyCache(
+        max_items=settings.GATEWAY_CACHE_ITEMS,
+        max_bytes=settings.GATEWAY_CACHE_MAX_MB * 1024 * 1024,
+        ttl_seconds=settings.GATEWAY_CACHE_TTL_SECONDS,
+    ) if settings.GATEWAY_CACHE_ENABLED else None
+    startup_profiler.report()
     yield
 
     # --- Shutdown ---
     logger.info("🛑 Shutting down API Gateway...")
+    await app.state.llm_client.aclose()
+    await app.state.db_engine.dispose()
     # await sso_client.close()
 
 
@@ -75,6 +89,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Трасса запроса (traceparent, Server-Timing, лог этапов) — поверх CORS
+app.add_middleware(tracing.TracingMiddleware)
+# Внешним слоем: время запроса включает CORS и отдачу потока целиком
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Подключение роутеров
 # 1. Auth (gRPC)
@@ -90,6 +108,28 @@ async def health_check():
     return {"status": "ok", "service": "api-gateway"}
 
 
+@app.get("/health/db")
+async def db_pool_health():
+    """Загрузка пула соединений к БД пользователей."""
+    return pool_stats(app.state.db_engine)
+
+
+@app.get("/health/auth")
+async def auth_cache_health():
+    """Доля запросов, токен которых взят из кэша проверенных JWT."""
+    return token_cache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Метрики Prometheus: задержки gateway и прокси, кэши, пул БД."""
+    pool = pool_stats(app.state.db_engine)
+    metrics.DB_POOL_CHECKED_OUT.set(pool["checked_out"])
+    metrics.DB_POOL_OVERFLOW.set(pool["overflow"])
+    metrics.AUTH_CACHE_HIT_RATE.set(token_cache.stats()["hit_rate"])
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
     import uvicorn
     # Исправление: указываем полный путь от корня проекта
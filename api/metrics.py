@@ -0,0 +1,52 @@
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REQUEST_LATENCY = Histogram(
+    "api_gateway_request_duration_seconds",
+    "Полное время обработки запроса gateway (до последнего байта ответа)",
+    ["route", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge("api_gateway_requests_in_flight", "Запросы в обработке")
+PROXY_UPSTREAM_LATENCY = Histogram(
+    "api_gateway_proxy_upstream_seconds",
+    "Время от отправки запроса в llm_service до получения заголовков ответа",
+    ["endpoint", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+PROXY_CACHE = Counter("api_gateway_proxy_cache_total", "Запросы к кэшу ответов gateway", ["result"])
+DB_POOL_CHECKED_OUT = Gauge("api_gateway_db_pool_checked_out", "Занятые соединения пула БД пользователей")
+DB_POOL_OVERFLOW = Gauge("api_gateway_db_pool_overflow", "Соединения пула БД сверх pool_size")
+AUTH_CACHE_HIT_RATE = Gauge("api_gateway_auth_token_cache_hit_rate", "Доля проверок JWT из кэша")
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: время запроса с учетом потоковой отдачи и число запросов в обработке."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # Шаблон маршрута, а не сырой путь: у прокси это /api/v1/ai/{path:path}
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_LATENCY.labels(route, scope["method"], str(status)).observe(time.perf_counter() - started)
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: dict[str, str]
+    chunks: list[bytes]
+    body_hash: str  # Хэш тела запроса: для Idempotency-Key проверяем, что запрос тот же
+    etag: str
+    expires_at: float
+    size: int = field(init=False)
+
+    def __post_init__(self):
+        self.size = sum(len(chunk) for chunk in self.chunks)
+
+
+class ProxyCache:
+    """
+    LRU-кэш ответов llm_service в памяти gateway с TTL.
+    Ключ — пользователь, маршрут, query и хэш тела (или Idempotency-Key),
+    поэтому повторы одинаковых запросов не выходят за пределы процесса.
+    """
+
+    def __init__(self, max_items: int, max_bytes: int, ttl_seconds: int):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(user_id: str, route: str, query: str, request_id: str) -> str:
+        payload = json.dumps([user_id, route, query, request_id], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def new_etag() -> str:
+        # Версия записи: известна до получения тела, поэтому отдается уже с первым ответом
+        return f'"{uuid.uuid4().hex}"'
+
+    def get(self, key: str) -> CachedResponse | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.time():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, status_code: int, headers: dict[str, str], chunks: list[bytes],
+            body_hash: str, etag: str):
+        entry = CachedResponse(
+            status_code=status_code,
+            headers=headers,
+            chunks=chunks,
+            body_hash=body_hash,
+            etag=etag,
+            expires_at=time.time() + self.ttl_seconds,
+        )
+        if entry.size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while len(self._entries) > self.max_items or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        self._bytes -= self._entries.pop(key).size
+
+    def stats(self) -> dict:
+        return {"items": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
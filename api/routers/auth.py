@@ -3,7 +3,9 @@ from ..db import manager
 from ..settings import settings
 from fastapi import APIRouter, HTTPException, Depends, status, Request
 from ..schemas import RegisterSchema, LoginSchema, TokenUpdateSchema
+from ..db.exceptions import UserAlreadyExistsException, UserNotFoundException
 from ..db.manager import Manager
+from ..deps import get_manager
 from datetime import datetime, timedelta
 from ..tokens import create_access_token, verify_token_and_get_user_id
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -12,32 +14,27 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 @router.post("/register", status_code=status.HTTP_201_CREATED)
 async def register(
     new_user: RegisterSchema,
+    manager: Manager = Depends(get_manager),
 ):
     try:
-        manager = Manager(settings.DB_USERS_URL)
-        # Проверка на существование
-        if await manager.user_exists_by_login(new_user.login):
-            raise HTTPException(
-                status_code=400,
-                detail="Пользователь с таким именем уже существует"
-            )
-
         # Хеширование пароля
         hashed_password = get_password_hash(new_user.password)
 
-        # Сохранение в "БД"
+        # Сохранение в "БД"; занятый логин/email отсекает уникальный индекс
         new_user = await manager.create_user(login=new_user.login, password_hash=hashed_password, email=new_user.email, full_name=new_user.full_name)
 
         # Генерация токена сразу после регистрации
         access_token_expires = timedelta(
             minutes=settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
-        # В токен кладем ID, а не username, как вы просили
+        # В токен кладем ID, а не username, как вы просили (sub в JWT — строка)
         access_token = create_access_token(
-            data={"sub": new_user.id},
+            data={"sub": str(new_user.id)},
             expires_delta=access_token_expires
         )
 
         return {"access_token": access_token, "token_type": "bearer"}
+    except UserAlreadyExistsException as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Обработка ошибок
         raise HTTPException(status_code=500, detail=str(e))
@@ -46,11 +43,14 @@ async def register(
 @router.post("/login")
 async def login(
     user_data: LoginSchema,
+    manager: Manager = Depends(get_manager),
 ):
     try:
-        manager = Manager(settings.DB_USERS_URL)
-        # Ищем пользователя
-        user = await manager.get_user_by_login(user_data.username)
+        # Ищем пользователя; хэш пароля читается из БД, а не из кэша пользователей
+        try:
+            user = await manager.get_user_for_login(user_data.login)
+        except UserNotFoundException:
+            user = None
 
         # Проверяем пароль
         if not user or not verify_password(user_data.password, user.password_hash):
@@ -64,14 +64,16 @@ async def login(
         access_token_expires = timedelta(
             minutes=settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.id},
+            data={"sub": str(user.id)},
             expires_delta=access_token_expires
         )
 
         return {"access_token": access_token, "token_type": "bearer"}
+    except HTTPException:
+        raise
     except Exception as e:
         # Обработка ошибок
-        raise HTTPException(status_code=500, detail=e)
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/refresh")
@@ -82,9 +84,9 @@ async def refresh_token(
         refresh_token = data.refresh_token
         access_token_expires = timedelta(
             minutes=settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
-        user_id = verify_token_and_get_user_id(refresh_token)
+        user_id = await verify_token_and_get_user_id(refresh_token)
         access_token = create_access_token(
-            data={"sub": user_id},
+            data={"sub": str(user_id)},
             expires_delta=access_token_expires
         )
 
@@ -1,52 +1,290 @@
+import hashlib
+import time
+from typing import Callable
 import httpx
 from fastapi import APIRouter, Depends, Request, Response, HTTPException
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from ..settings import settings
-# from deps import get_current_user
+from ..deps import get_current_user
+from ..proxy_cache import CachedResponse, ProxyCache
+from .. import metrics
+from ..tracing import outgoing_headers, record_span
 
 router = APIRouter(prefix="/ai", tags=["AI Copilot"])
 
+# Hop-by-hop заголовки не пересылаются ни в одну сторону (RFC 9110, 7.6.1)
+_HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+}
+# traceparent клиента заменяется продолжением трассы gateway
+_EXCLUDED_REQUEST_HEADERS = _HOP_BY_HOP_HEADERS | {"host", "x-user-id", "traceparent"}
+# Длину тела ответа считает сам сервер: ответ отдается потоком (chunked)
+_EXCLUDED_RESPONSE_HEADERS = _HOP_BY_HOP_HEADERS | {"content-length"}
+# Тайминги и trace-id относятся к исходному запросу, а не к повтору из кэша
+_UNCACHED_RESPONSE_HEADERS = {"server-timing", "x-trace-id"}
+
+
+def create_llm_client() -> httpx.AsyncClient:
+    """
+    Общий на процесс клиент к llm_service с пулом keep-alive соединений.
+    Создается в lifespan gateway и закрывается при остановке.
+    """
+    return httpx.AsyncClient(
+        base_url=settings.LLM_URL,
+        http2=settings.LLM_HTTP2,
+        # По http CA-бандл не нужен (его загрузка ~200 мс на старте); для https проверка TLS остается
+        verify=not settings.LLM_URL.startswith("http://"),
+        limits=httpx.Limits(
+            max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_POOL_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.LLM_READ_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+    )
+
+
+def get_llm_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.llm_client
+
+
+def get_proxy_cache(request: Request) -> ProxyCache | None:
+    return request.app.state.proxy_cache
+
+
+def _route_timeout(path: str) -> httpx.Timeout:
+    # read-таймаут считается между чанками, поэтому длинная генерация
+    # в потоковом режиме не обрывается, пока модель отдает токены
+    path = path.strip("/")
+    read = settings.LLM_ROUTE_TIMEOUTS.get(path) or settings.LLM_ROUTE_TIMEOUTS.get(
+        path.split("/", 1)[0], settings.LLM_READ_TIMEOUT
+    )
+    return httpx.Timeout(read, connect=settings.LLM_CONNECT_TIMEOUT)
+
+
+async def _stream_response(
+        response: httpx.Response,
+        on_complete: Callable[[list[bytes]], None] | None = None,
+        max_record: int = 0
+):
+    """
+    Отдает тело ответа upstream по мере поступления. Если задан on_complete,
+    чанки (до max_record байт) записываются и передаются ему после полной отдачи.
+    """
+    chunks: list[bytes] = []
+    size = 0
+    # Соединение возвращается в пул и при обрыве клиента посреди потока
+    try:
+        async for chunk in response.aiter_raw():
+            if on_complete is not None:
+                size += len(chunk)
+                if size > max_record:
+                    on_complete, chunks = None, []
+                else:
+                    chunks.append(chunk)
+            yield chunk
+        if on_complete is not None:
+            on_complete(chunks)
+    finally:
+        await response.aclose()
+
+
+# --- Кэш ответов ---
+class _HashingBody:
+    """Поток тела запроса, попутно считающий его хэш — без буферизации в памяти."""
+
+    def __init__(self, request: Request):
+        self._stream = request.stream()
+        self._sha = hashlib.sha256()
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._sha.update(chunk)
+            yield chunk
+
+    async def consume(self):
+        async for _ in self:
+            pass
+
+    def hexdigest(self) -> str:
+        return self._sha.hexdigest()
+
+
+def _cache_policy(request: Request) -> str | None:
+    """
+    None — запрос идет в обход кэша, "use" — ответ можно взять из кэша,
+    "refresh" — клиент просит свежий ответ (no-cache / X-Cache-Bypass), но его можно сохранить.
+    """
+    cache_control = request.headers.get("cache-control", "").lower()
+    if request.method != "POST" or "no-store" in cache_control:
+        return None
+    # Отправка фоновой задачи всегда создает новую задачу
+    if request.query_params.get("job", "").lower() in ("1", "true"):
+        return None
+    if "idempotency-key" not in request.headers:
+        length = request.headers.get("content-length")
+        if length is None or not length.isdigit() or int(length) > settings.GATEWAY_CACHE_MAX_BODY_BYTES:
+            return None
+    if "no-cache" in cache_control or request.headers.get("x-cache-bypass", "").lower() in ("1", "true"):
+        return "refresh"
+    return "use"
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+async def _replay_chunks(chunks: list[bytes]):
+    for chunk in chunks:
+        yield chunk
+
+
+def _replay(entry: CachedResponse, request: Request) -> Response:
+    """Отдает сохраненный ответ тем же потоком чанков (или 304 по If-None-Match)."""
+    headers = {"etag": entry.etag, "x-cache": "HIT"}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return StreamingResponse(
+        _replay_chunks(entry.chunks),
+        status_code=entry.status_code,
+        headers={**entry.headers, **headers},
+    )
+
+
+def _is_complete(response: httpx.Response, chunks: list[bytes]) -> bool:
+    # SSE-ответ с ошибкой посреди генерации тоже приходит со статусом 200
+    if response.headers.get("content-type", "").startswith("text/event-stream"):
+        return b"event: done" in b"".join(chunks[-4:])
+    return True
+
 
 async def _proxy_request(
         request: Request,
         path: str,
-        user: dict
+        user: dict,
+        client: httpx.AsyncClient,
+        cache: ProxyCache | None = None
 ):
     """
     Внутренняя функция проксирования.
     Пересылает запрос в llm_service, добавляя информацию о пользователе.
+    Тело запроса (в т.ч. загрузка спецификации) и ответ (в т.ч. SSE при ?stream=true)
+    передаются потоком, без буферизации в памяти gateway.
+    Повторы POST-запросов (тот же пользователь, маршрут, query и тело либо
+    Idempotency-Key) отдаются из кэша gateway, с ETag и поддержкой If-None-Match.
     """
-    url = f"{settings.LLM_URL}/api/v1/ai/{path}"
-
-    # Заголовки (пробрасываем auth, но можем добавить user_id)
-    headers = dict(request.headers)
-    headers.pop("host", None)  # Host header не пересылаем
-    headers["x-user-id"] = str(user.get("user_id", ""))
-
-    async with httpx.AsyncClient() as client:
-        try:
-            # Читаем тело запроса
-            body = await request.body()
-
-            # Отправляем запрос в микросервис
-            proxy_req = client.build_request(
-                request.method,
-                url,
-                headers=headers,
-                content=body,
-                params=request.query_params,
-                timeout=60.0  # LLM может думать долго
-            )
-
-            response = await client.send(proxy_req, stream=True)
-
-            # Возвращаем потоковый ответ обратно клиенту
-            return StreamingResponse(
-                response.aiter_raw(),
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                background=None
-            )
-        except httpx.RequestError as exc:
-            raise HTTPException(
-                status_code=503, detail=f"LLM Service unavailable: {exc}")
+    user_id = str(user.get("sub", ""))
+    headers = {k: v for k, v in request.headers.items()
+               if k.lower() not in _EXCLUDED_REQUEST_HEADERS}
+    headers["x-user-id"] = user_id
+    headers.update(outgoing_headers())
+
+    content = request.stream()
+    policy = _cache_policy(request) if cache is not None else None
+    cache_key = body_hash = etag = hashing_body = None
+    if not policy:
+        metrics.PROXY_CACHE.labels("bypass").inc()
+    else:
+        idempotency_key = request.headers.get("idempotency-key")
+        if idempotency_key:
+            # Ключ известен без тела: загрузка идет потоком, хэш считается по пути
+            content = hashing_body = _HashingBody(request)
+            request_key = f"idempotency:{idempotency_key}"
+        else:
+            content = await request.body()
+            body_hash = request_key = hashlib.sha256(content).hexdigest()
+        cache_key = ProxyCache.make_key(user_id, path, str(request.query_params), request_key)
+
+        entry = cache.get(cache_key) if policy == "use" else None
+        if entry is not None:
+            if hashing_body is not None:
+                await hashing_body.consume()
+                body_hash = hashing_body.hexdigest()
+            if entry.body_hash != body_hash:
+                raise HTTPException(
+                    status_code=422, detail="Idempotency-Key was already used with a different request body")
+            metrics.PROXY_CACHE.labels("hit").inc()
+            return _replay(entry, request)
+        metrics.PROXY_CACHE.labels("miss" if policy == "use" else "refresh").inc()
+        etag = ProxyCache.new_etag()
+
+    proxy_req = client.build_request(
+        request.method,
+        f"/api/v1/ai/{path}",
+        headers=headers,
+        # Чанки тела читаются у клиента по мере отправки в upstream (backpressure)
+        content=content,
+        params=request.query_params,
+        timeout=_route_timeout(path),
+    )
+    started = time.perf_counter()
+    try:
+        response = await client.send(proxy_req, stream=True)
+    except httpx.TimeoutException as exc:
+        raise HTTPException(
+            status_code=504, detail=f"LLM Service timeout: {exc!r}")
+    except httpx.RequestError as exc:
+        raise HTTPException(
+            status_code=503, detail=f"LLM Service unavailable: {exc}")
+    elapsed = time.perf_counter() - started
+    # Ошибочный путь не должен плодить новые значения метки
+    endpoint = "unknown" if response.status_code == 404 else path.strip("/").split("/", 1)[0]
+    metrics.PROXY_UPSTREAM_LATENCY.labels(endpoint, str(response.status_code)).observe(elapsed)
+    record_span("proxy", started, elapsed)
+
+    response_headers = {k: v for k, v in response.headers.items()
+                        if k.lower() not in _EXCLUDED_RESPONSE_HEADERS}
+    store = None
+    if (cache_key and response.status_code == 200
+            and "no-store" not in response.headers.get("cache-control", "").lower()):
+        stored_headers = {k: v for k, v in response_headers.items()
+                          if k.lower() not in _UNCACHED_RESPONSE_HEADERS}
+
+        def _store(chunks: list[bytes]):
+            if _is_complete(response, chunks):
+                cache.set(cache_key, response.status_code, stored_headers, chunks,
+                          body_hash or hashing_body.hexdigest(), etag)
+
+        store = _store
+        response_headers.update({"etag": etag, "x-cache": "MISS"})
+
+    # Возвращаем потоковый ответ обратно клиенту
+    return StreamingResponse(
+        _stream_response(response, store, cache.max_bytes if cache else 0),
+        status_code=response.status_code,
+        headers=response_headers,
+        background=BackgroundTask(response.aclose)
+    )
+
+
+@router.get("/health")
+async def ai_health(client: httpx.AsyncClient = Depends(get_llm_client)):
+    """
+    Доступность llm_service без токена: на него смотрят health-check nginx и бейдж фронтенда.
+    Объявлен до общего маршрута, поэтому под авторизацию /ai/* не попадает.
+    """
+    try:
+        response = await client.get("/health", timeout=settings.LLM_CONNECT_TIMEOUT)
+    except httpx.RequestError as exc:
+        raise HTTPException(
+            status_code=503, detail=f"LLM Service unavailable: {exc}")
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=503, detail=f"LLM Service unhealthy: HTTP {response.status_code}")
+    return {"status": "ok", "service": "llm_service"}
+
+
+@router.api_route("/{path:path}", methods=["GET", "POST", "DELETE"])
+async def proxy_ai(
+        path: str,
+        request: Request,
+        user: dict = Depends(get_current_user),
+        client: httpx.AsyncClient = Depends(get_llm_client),
+        cache: ProxyCache | None = Depends(get_proxy_cache)
+):
+    """Проксирует все запросы /api/v1/ai/* в llm_service (требует токен)."""
+    return await _proxy_request(request, path, user, client, cache)
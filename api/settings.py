@@ -14,12 +14,49 @@ class Settings(BaseSettings):
     # LLM Service (Target for proxy)
     LLM_SERVICE_HOST: str = "llm_service"
     LLM_SERVICE_PORT: int = 8082
+    # Пул соединений прокси к llm_service
+    LLM_POOL_MAX_CONNECTIONS: int = 100
+    LLM_POOL_MAX_KEEPALIVE: int = 20
+    LLM_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_HTTP2: bool = False  # HTTP/2 без TLS (prior knowledge) — только если upstream его поддерживает
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    # Таймаут чтения (между чанками ответа), сек; для отдельных эндпоинтов — LLM_ROUTE_TIMEOUTS
+    LLM_READ_TIMEOUT: float = 60.0
+    # JSON вида {"generate-code-pytest": 300}: ключ — путь после /ai/ или его первый сегмент
+    LLM_ROUTE_TIMEOUTS: dict[str, float] = {
+        "generate-code-pytest": 300.0, "generate-api-tests": 300.0, "generate-ui-tests/batch": 300.0
+    }
+
+    # Кэш ответов AI в памяти gateway (LRU + TTL)
+    GATEWAY_CACHE_ENABLED: bool = True
+    GATEWAY_CACHE_ITEMS: int = 512
+    GATEWAY_CACHE_MAX_MB: int = 64
+    GATEWAY_CACHE_TTL_SECONDS: int = 600
+    # Тела больше лимита не буферизуются для хэша и идут в обход кэша (кроме запросов с Idempotency-Key)
+    GATEWAY_CACHE_MAX_BODY_BYTES: int = 1024 * 1024
 
     # Auth
     JWT_SECRET_KEY: str  # Должен совпадать с ключом в SSO сервисе
     JWT_ALGORITHM: str = "HS256"
     DB_USERS_URL: str
+    # Пул соединений к БД пользователей
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 256
+    # Кэш пользователей по ID/логину (0 — выключен)
+    USER_CACHE_ITEMS: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 300
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Кэш проверенных токенов (0 — выключен); токены без exp живут в кэше не дольше MAX_TTL, сек
+    AUTH_TOKEN_CACHE_ITEMS: int = 10000
+    AUTH_TOKEN_CACHE_MAX_TTL: int = 900
+
+    # Профилирование запуска: время импорта модулей и шагов lifespan
+    STARTUP_PROFILE: bool = False
+    # Лог трассы каждого запроса (JSON-строка с этапами и trace-id)
+    TRACE_LOG: bool = True
 
     @property
     def LLM_URL(self) -> str:
@@ -0,0 +1,6 @@
+import os
+
+# Настройки gateway читаются при импорте api.settings — задаем их до импорта приложения
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("DB_USERS_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("TRACE_LOG", "false")
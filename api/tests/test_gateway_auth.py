@@ -0,0 +1,110 @@
+from datetime import datetime
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from api.db.exceptions import UserAlreadyExistsException, UserNotFoundException
+from api.deps import get_manager
+from api.domain.user import User
+from api.main import app
+from api.routers.proxy import get_llm_client, get_proxy_cache
+
+
+class _MemoryManager:
+    """Пользователи в памяти вместо БД — тот же интерфейс, что у Manager в роутере auth."""
+
+    def __init__(self):
+        self.users: dict[str, User] = {}
+
+    async def create_user(self, login: str, email: str, full_name: str, password_hash: str) -> User:
+        if login in self.users:
+            raise UserAlreadyExistsException(login=login)
+        now = datetime.now()
+        user = User(id=len(self.users) + 1, login=login, email=email, full_name=full_name,
+                    password_hash=password_hash, created_on=now, updated_on=now)
+        self.users[login] = user
+        return user
+
+    async def get_user_for_login(self, login: str) -> User:
+        if login not in self.users:
+            raise UserNotFoundException(login=login)
+        return self.users[login]
+
+
+class _Body(httpx.AsyncByteStream):
+    """Тело ответа upstream, которое читается потоком, как от настоящего llm_service."""
+
+    def __init__(self, content: bytes):
+        self._content = content
+
+    async def __aiter__(self):
+        yield self._content
+
+
+def _upstream_response(content: bytes) -> httpx.Response:
+    return httpx.Response(200, headers={"content-type": "application/json"}, stream=_Body(content))
+
+
+@pytest.fixture
+def upstream_requests():
+    return []
+
+
+@pytest.fixture
+def client(upstream_requests):
+    def upstream(request: httpx.Request) -> httpx.Response:
+        upstream_requests.append(request)
+        return _upstream_response(b'{"status": "ok"}')
+
+    manager = _MemoryManager()
+    llm_client = httpx.AsyncClient(base_url="http://llm", transport=httpx.MockTransport(upstream))
+    app.dependency_overrides[get_manager] = lambda: manager
+    app.dependency_overrides[get_llm_client] = lambda: llm_client
+    app.dependency_overrides[get_proxy_cache] = lambda: None
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def _register(client: TestClient) -> str:
+    response = client.post("/api/v1/auth/register", json={
+        "login": "tester", "email": "tester@example.com", "full_name": "Test User", "password": "secret",
+    })
+    assert response.status_code == 201
+    return response.json()["access_token"]
+
+
+def test_register_token_passes_gateway(client, upstream_requests):
+    token = _register(client)
+
+    response = client.post("/api/v1/ai/optimize-tests", json={"modules": "Auth", "test_cases": "| ID |"},
+                           headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert upstream_requests[-1].url.path == "/api/v1/ai/optimize-tests"
+    assert upstream_requests[-1].headers["x-user-id"] == "1"
+
+
+def test_login_token_passes_gateway(client, upstream_requests):
+    _register(client)
+    token = client.post("/api/v1/auth/login", json={"login": "tester", "password": "secret"}).json()["access_token"]
+
+    response = client.post("/api/v1/ai/review-code", json={"code_snippet": "x = 1", "rules": ""},
+                           headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert upstream_requests[-1].headers["x-user-id"] == "1"
+
+
+def test_ai_routes_require_token(client, upstream_requests):
+    response = client.post("/api/v1/ai/optimize-tests", json={"modules": "Auth", "test_cases": "| ID |"})
+
+    assert response.status_code == 401
+    assert not upstream_requests
+
+
+def test_health_is_open(client):
+    response = client.get("/api/v1/ai/health")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
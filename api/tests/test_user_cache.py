@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from api.db.user_cache import UserCache
+from api.domain.user import User
+
+
+def _user() -> User:
+    now = datetime.now()
+    return User(id=7, login="tester", email="tester@example.com", full_name="Test User",
+                password_hash="$2b$12$hash", created_on=now, updated_on=now)
+
+
+def test_cache_does_not_keep_password_hash():
+    cache = UserCache(max_items=10, ttl_seconds=300)
+    user = _user()
+
+    cache.put(user)
+
+    assert cache.get_by_id(7).password_hash == ""
+    assert cache.get_by_login("tester").email == "tester@example.com"
+    assert user.password_hash == "$2b$12$hash"  # Объект вызывающего не меняется
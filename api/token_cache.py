@@ -0,0 +1,61 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from jose import jwt
+
+from .settings import settings
+
+
+class VerifiedTokenCache:
+    """
+    Кэш claims уже проверенных JWT. Ключ — SHA-256 токена, запись живет до exp токена
+    (для токенов без exp — не дольше max_ttl). Невалидные токены не кэшируются и
+    проверяются каждый раз, поэтому отказы остаются ровно такими же, как без кэша.
+    """
+
+    def __init__(self, max_items: int, max_ttl: int):
+        self.max_items = max_items
+        self.max_ttl = max_ttl
+        self._entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def decode(self, token: str) -> dict:
+        """Claims токена; JWTError — как у jwt.decode, если токен невалиден."""
+        key = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, claims = entry
+            if now < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(claims)
+            del self._entries[key]
+
+        self.misses += 1
+        claims = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+        expires_at = now + self.max_ttl
+        if isinstance(claims.get("exp"), (int, float)):
+            expires_at = min(expires_at, claims["exp"])
+        if self.max_items > 0:
+            self._entries[key] = (expires_at, claims)
+            if len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+        return dict(claims)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "items": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+token_cache = VerifiedTokenCache(
+    max_items=settings.AUTH_TOKEN_CACHE_ITEMS,
+    max_ttl=settings.AUTH_TOKEN_CACHE_MAX_TTL,
+)
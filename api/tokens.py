@@ -1,14 +1,13 @@
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
 from jose import JWTError, jwt
 from .settings import settings
+from .token_cache import token_cache
 
 # --- JWT Auth Setup ---
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 SECRET_KEY = settings.JWT_SECRET_KEY
 ALGORITHM = settings.JWT_ALGORITHM
@@ -16,14 +15,6 @@ ALGORITHM = settings.JWT_ALGORITHM
 # --- Utility Functions ---
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     if expires_delta:
@@ -45,7 +36,7 @@ async def verify_token_and_get_user_id(token: Annotated[str, Depends(oauth2_sche
     )
     try:
         # Декодируем токен
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = token_cache.decode(token)
 
         # Извлекаем ID (который мы положили в поле 'sub' при логине)
         user_id = payload.get("sub")
@@ -0,0 +1,448 @@
+"""
+Нагрузочный бенчмарк пайплайна без реальной модели.
+
+Поднимает заглушку OpenAI-совместимой модели (stub_llm.py) с заданной задержкой и скоростью
+генерации, llm_service с AI_MODEL_URL на заглушку и gateway перед ним. Страница для UI-тестов
+и спецификация для API-тестов берутся из fixtures, а не из интернета. Каждый эндпоинт
+ai_handler прогоняется напрямую в llm_service и через gateway, обычным ответом и потоком SSE,
+на нескольких уровнях параллельности; печатаются пропускная способность и p50/p95/p99.
+
+Запуск из корня репозитория:
+    python -m benchmarks.load.run                                # все эндпоинты, обе цели
+    python -m benchmarks.load.run --endpoints ui,review --concurrency 1,16 --requests 100
+    python -m benchmarks.load.run --save-baseline                # записать baseline.json
+    python -m benchmarks.load.run --ttft 2 --token-rate 40       # «медленная» модель
+
+Если рядом лежит baseline (--baseline, по умолчанию benchmarks/load/baseline.json), результаты
+сравниваются с ним: рост p50/p95 или падение пропускной способности больше --tolerance
+отмечается как регрессия, и процесс завершается с кодом 1.
+
+Gateway хранит пользователей в DB_USERS_URL; если переменная не задана, используется
+временная SQLite-база (нужен пакет aiosqlite).
+
+Уже запущенные сервисы: --stub-url, --llm-url, --gateway-url (для gateway нужен
+--jwt-secret, совпадающий с JWT_SECRET_KEY; llm_service должен смотреть на заглушку).
+Каждый параллельный клиент — отдельный пользователь: лимиты планировщика на пользователя
+не превращают бенчмарк в замер отказов 429. Кэш ответов в запущенных бенчмарком сервисах
+выключен, а тексты запросов уникальны, поэтому каждый запрос доходит до модели.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[2]
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+TEST_PLAN = (
+    "| ID | Название | Шаги | Ожидаемый результат |\n|---|---|---|---|\n"
+    + "".join(f"| TC-{i} | Вход с корректными данными {i} | Ввести email и пароль | Открыт кабинет |\n"
+              for i in range(1, 21))
+)
+
+
+# --- Сервисы ---
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Service:
+    """Процесс uvicorn, поднятый бенчмарком; вывод пишется в лог во временной папке."""
+
+    def __init__(self, name: str, app: str, cwd: Path, env: dict[str, str], health_path: str, log_dir: Path):
+        self.name = name
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.health_url = self.url + health_path
+        self.log_path = log_dir / f"{name}.log"
+        self._args = [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1",
+                      "--port", str(self.port), "--no-access-log"]
+        self._cwd = cwd
+        self._env = {**os.environ, **env}
+        self._process: subprocess.Popen | None = None
+
+    def start(self):
+        log = open(self.log_path, "wb")
+        self._process = subprocess.Popen(self._args, cwd=self._cwd, env=self._env, stdout=log, stderr=log)
+
+    async def wait_ready(self, timeout: float = 60):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                if self._process.poll() is not None:
+                    break
+                try:
+                    if (await client.get(self.health_url)).status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.2)
+        raise RuntimeError(f"{self.name} did not start, see {self.log_path}")
+
+    def stop(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+
+
+# --- Сценарии ---
+@dataclass
+class Scenario:
+    name: str
+    path: str
+    build: Callable[[int], dict[str, Any]]  # Номер запроса -> аргументы httpx (json / files / data)
+    job: bool = False  # Отправка фоновой задачей (?job=true) с ожиданием результата
+
+
+def make_scenarios(fixtures_url: str) -> dict[str, Scenario]:
+    spec = (FIXTURES_DIR / "shop_openapi.yaml").read_bytes()
+    page_url = f"{fixtures_url}/shop.html"
+    scenarios = [
+        Scenario("ui", "generate-ui-tests", lambda i: {"json": {
+            "url": page_url, "general_description": f"Интернет-магазин, прогон {i}",
+            "modules": "Вход, регистрация, корзина"}}),
+        Scenario("api", "generate-api-tests", lambda i: {
+            "files": {"file": ("shop_openapi.yaml", spec, "application/yaml")},
+            "data": {"general_description": f"Shop API, прогон {i}", "modules": "pets, orders"}}),
+        Scenario("redact", "redact-content", lambda i: {"json": {
+            "original_content": TEST_PLAN, "edit_instructions": f"Добавь негативный кейс №{i}"}}),
+        Scenario("codegen", "generate-code-pytest", lambda i: {"json": {
+            "url": page_url, "general_description": f"Интернет-магазин, прогон {i}",
+            "approved_test_plan": TEST_PLAN}}),
+        Scenario("optimize", "optimize-tests", lambda i: {"json": {
+            "modules": f"Вход, прогон {i}", "test_cases": TEST_PLAN}}),
+        Scenario("review", "review-code", lambda i: {"json": {
+            "code_snippet": f"def test_login_{i}(client):\n    r = client.post('/login')\n    assert r.status_code == 200\n"}}),
+        Scenario("job", "optimize-tests", lambda i: {"json": {
+            "modules": f"Фоновая задача, прогон {i}", "test_cases": TEST_PLAN}}, job=True),
+    ]
+    return {scenario.name: scenario for scenario in scenarios}
+
+
+@dataclass
+class Target:
+    name: str
+    base_url: str
+    headers: Callable[[int], dict[str, str]]  # Номер клиента -> заголовки его пользователя
+
+
+def direct_target(llm_url: str) -> Target:
+    # Напрямую llm_service видит пользователя по X-User-Id, как за gateway
+    return Target("direct", f"{llm_url}/api/v1/ai", lambda worker: {"x-user-id": f"bench-{worker}"})
+
+
+def gateway_target(gateway_url: str, jwt_secret: str) -> Target:
+    from jose import jwt
+
+    exp = int(time.time()) + 24 * 3600
+    tokens: dict[int, str] = {}
+
+    def headers(worker: int) -> dict[str, str]:
+        if worker not in tokens:
+            tokens[worker] = jwt.encode({"sub": f"bench-{worker}", "exp": exp}, jwt_secret, algorithm="HS256")
+        return {"authorization": f"Bearer {tokens[worker]}"}
+
+    return Target("gateway", f"{gateway_url}/api/v1/ai", headers)
+
+
+# --- Замер ---
+@dataclass
+class Sample:
+    latency: float
+    ttfb: float | None  # До первого фрагмента ответа (только поток)
+    ok: bool
+
+
+async def _call_json(client: httpx.AsyncClient, url: str, headers: dict, kwargs: dict) -> Sample:
+    started = time.perf_counter()
+    response = await client.post(url, headers=headers, **kwargs)
+    return Sample(time.perf_counter() - started, None, response.status_code == 200)
+
+
+async def _call_stream(client: httpx.AsyncClient, url: str, headers: dict, kwargs: dict) -> Sample:
+    started = time.perf_counter()
+    ttfb = None
+    done = False
+    async with client.stream("POST", url, params={"stream": "true"}, headers=headers, **kwargs) as response:
+        async for line in response.aiter_lines():
+            if ttfb is None and line.startswith("data:"):
+                ttfb = time.perf_counter() - started
+            elif line == "event: done":
+                done = True
+    return Sample(time.perf_counter() - started, ttfb, response.status_code == 200 and done)
+
+
+async def _call_job(client: httpx.AsyncClient, url: str, headers: dict, kwargs: dict) -> Sample:
+    started = time.perf_counter()
+    response = await client.post(url, params={"job": "true"}, headers=headers, **kwargs)
+    if response.status_code != 202:
+        return Sample(time.perf_counter() - started, None, False)
+    result_url = f"{url.rsplit('/', 1)[0]}/jobs/{response.json()['job_id']}/result"
+    while True:
+        response = await client.get(result_url, headers=headers)
+        if response.status_code != 409:
+            return Sample(time.perf_counter() - started, None, response.status_code == 200)
+        await asyncio.sleep(0.02)
+
+
+def _percentile(values: list[float], q: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def summarize(samples: list[Sample], wall: float) -> dict[str, float]:
+    ok = [s for s in samples if s.ok]
+    latencies = [s.latency * 1000 for s in ok]
+    ttfbs = [s.ttfb * 1000 for s in ok if s.ttfb is not None]
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "throughput": round(len(ok) / wall, 2) if wall else 0.0,
+        "p50": round(_percentile(latencies, 50), 1),
+        "p95": round(_percentile(latencies, 95), 1),
+        "p99": round(_percentile(latencies, 99), 1),
+        "ttfb_p50": round(_percentile(ttfbs, 50), 1) if ttfbs else None,
+    }
+
+
+async def run_cell(target: Target, scenario: Scenario, mode: str, concurrency: int, requests: int,
+                   timeout: float, first_id: int = 0) -> dict[str, float]:
+    """Отправляет requests запросов в concurrency параллельных клиентов."""
+    call = _call_job if scenario.job else _call_stream if mode == "stream" else _call_json
+    url = f"{target.base_url}/{scenario.path}"
+    numbers = iter(range(first_id, first_id + requests))
+    samples: list[Sample] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        async def worker(worker_id: int):
+            # no-store: повтор из кэша gateway не должен подменять замер пайплайна
+            headers = {**target.headers(worker_id), "cache-control": "no-store"}
+            for number in numbers:
+                try:
+                    samples.append(await call(client, url, headers, scenario.build(number)))
+                except httpx.HTTPError:
+                    samples.append(Sample(0.0, None, False))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+        wall = time.perf_counter() - started
+    return summarize(samples, wall)
+
+
+# --- Отчет и baseline ---
+def _cell_key(target: str, scenario: str, mode: str, concurrency: int) -> str:
+    return f"{target}/{scenario}/{mode}/c{concurrency}"
+
+
+def _delta(current: float, base: float) -> float:
+    return (current - base) / base if base else 0.0
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> dict[str, list[str]]:
+    """Регрессии по ячейкам: рост p50/p95 или падение пропускной способности больше tolerance."""
+    regressions: dict[str, list[str]] = {}
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        reasons = [f"{metric} {_delta(current[metric], base[metric]):+.0%}"
+                   for metric in ("p50", "p95") if _delta(current[metric], base[metric]) > tolerance]
+        if _delta(current["throughput"], base["throughput"]) < -tolerance:
+            reasons.append(f"rps {_delta(current['throughput'], base['throughput']):+.0%}")
+        if current["errors"] > base["errors"]:
+            reasons.append(f"errors {base['errors']} -> {current['errors']}")
+        if reasons:
+            regressions[key] = reasons
+    return regressions
+
+
+def print_report(results: dict, baseline: dict | None, regressions: dict[str, list[str]]):
+    header = f"{'target':<8} {'endpoint':<9} {'mode':<7} {'c':>4} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} " \
+             f"{'p99 ms':>9} {'ttfb p50':>9} {'err':>4}"
+    if baseline is not None:
+        header += f" {'vs baseline p95':>16}"
+    print(header)
+    print("-" * len(header))
+    for key, r in results.items():
+        target, scenario, mode, concurrency = key.split("/")
+        ttfb = f"{r['ttfb_p50']:.1f}" if r["ttfb_p50"] is not None else "-"
+        line = (f"{target:<8} {scenario:<9} {mode:<7} {concurrency[1:]:>4} {r['throughput']:>8.2f} "
+                f"{r['p50']:>9.1f} {r['p95']:>9.1f} {r['p99']:>9.1f} {ttfb:>9} {r['errors']:>4}")
+        if baseline is not None:
+            base = baseline.get(key)
+            line += f" {_delta(r['p95'], base['p95']):>+16.0%}" if base else f" {'new':>16}"
+            if key in regressions:
+                line += "  REGRESSION: " + ", ".join(regressions[key])
+        print(line)
+
+
+def load_baseline(path: Path, stub: dict) -> dict | None:
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data["meta"].get("stub") != stub:
+        print(f"⚠️ Baseline recorded with another stub model: {data['meta'].get('stub')}, now {stub}")
+    return data["results"]
+
+
+def save_baseline(path: Path, results: dict, stub: dict, args: argparse.Namespace):
+    meta = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "requests": args.requests,
+        "stub": stub,
+    }
+    path.write_text(json.dumps({"meta": meta, "results": results}, ensure_ascii=False, indent=2) + "\n",
+                    encoding="utf-8")
+    print(f"💾 Baseline saved to {path}")
+
+
+# --- Запуск ---
+def _csv(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test of llm_service and gateway against a stub LLM")
+    parser.add_argument("--targets", type=_csv, default=["direct", "gateway"])
+    parser.add_argument("--endpoints", type=_csv,
+                        default=["ui", "api", "redact", "codegen", "optimize", "review", "job"])
+    parser.add_argument("--modes", type=_csv, default=["json", "stream"])
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in _csv(v)], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=40, help="Requests per endpoint/mode/concurrency cell")
+    parser.add_argument("--timeout", type=float, default=120)
+    # Заглушка модели
+    parser.add_argument("--ttft", type=float, default=0.05, help="Stub time to first token, s")
+    parser.add_argument("--token-rate", type=float, default=2000, help="Stub generation speed, tokens/s")
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    # Уже запущенные сервисы
+    parser.add_argument("--stub-url")
+    parser.add_argument("--llm-url")
+    parser.add_argument("--gateway-url")
+    parser.add_argument("--jwt-secret", default=os.getenv("JWT_SECRET_KEY"))
+    # Baseline
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace) -> dict:
+    stub = {"ttft": args.ttft, "token_rate": args.token_rate, "completion_tokens": args.completion_tokens}
+    log_dir = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    services: list[Service] = []
+
+    def spawn(service: Service) -> Service:
+        service.start()
+        services.append(service)
+        return service
+
+    try:
+        stub_url = args.stub_url
+        if stub_url is None:
+            stub_service = spawn(Service("stub_llm", "benchmarks.load.stub_llm:app", ROOT, {
+                "STUB_TTFT": str(args.ttft),
+                "STUB_TOKEN_RATE": str(args.token_rate),
+                "STUB_COMPLETION_TOKENS": str(args.completion_tokens),
+            }, "/health", log_dir))
+            await stub_service.wait_ready()
+            stub_url = stub_service.url
+
+        llm_url = args.llm_url
+        if llm_url is None:
+            llm_service = spawn(Service("llm_service", "main:app", ROOT / "llm_service", {
+                "AI_MODEL_URL": f"{stub_url}/v1",
+                "AI_MODEL_KEY": "stub",
+                "CACHE_ENABLED": "false",
+                "TRACE_LOG": "false",
+            }, "/api/v1/ping", log_dir))
+            await llm_service.wait_ready()
+            llm_url = llm_service.url
+
+        targets: list[Target] = []
+        if "direct" in args.targets:
+            targets.append(direct_target(llm_url))
+        if "gateway" in args.targets:
+            gateway_url, jwt_secret = args.gateway_url, args.jwt_secret
+            if gateway_url is None:
+                jwt_secret = "load-test-secret"
+                gateway = spawn(Service("gateway", "api.main:app", ROOT, {
+                    "LLM_SERVICE_HOST": "127.0.0.1",
+                    "LLM_SERVICE_PORT": llm_url.rsplit(":", 1)[1],
+                    "JWT_SECRET_KEY": jwt_secret,
+                    "DB_USERS_URL": os.getenv("DB_USERS_URL", f"sqlite+aiosqlite:///{log_dir / 'users.db'}"),
+                    "GATEWAY_CACHE_ENABLED": "false",
+                    "TRACE_LOG": "false",
+                }, "/health", log_dir))
+                await gateway.wait_ready()
+                gateway_url = gateway.url
+            elif not jwt_secret:
+                raise SystemExit("--jwt-secret (or JWT_SECRET_KEY) is required for an external gateway")
+            targets.append(gateway_target(gateway_url, jwt_secret))
+
+        scenarios = make_scenarios(f"{stub_url}/fixtures")
+        print(f"Stub model: {stub}; logs: {log_dir}")
+        results: dict[str, dict] = {}
+        request_id = 0
+        for target in targets:
+            for name in args.endpoints:
+                scenario = scenarios[name]
+                # Фоновая задача всегда отдает результат целиком: потоковый режим у нее один
+                modes = ["json"] if scenario.job else args.modes
+                for mode in modes:
+                    # Прогрев: импорт клиента модели, пулы соединений, кэш разобранной страницы
+                    await run_cell(target, scenario, mode, 1, 2, args.timeout, request_id)
+                    request_id += 2
+                    for concurrency in args.concurrency:
+                        key = _cell_key(target.name, name, mode, concurrency)
+                        results[key] = await run_cell(
+                            target, scenario, mode, concurrency, args.requests, args.timeout, request_id)
+                        request_id += args.requests
+                        print(f"  {key}: {results[key]['throughput']} rps, p95 {results[key]['p95']} ms",
+                              flush=True)
+        return results
+    finally:
+        for service in reversed(services):
+            service.stop()
+
+
+def main():
+    args = parse_args()
+    stub = {"ttft": args.ttft, "token_rate": args.token_rate, "completion_tokens": args.completion_tokens}
+    results = asyncio.run(run(args))
+    baseline = None if args.save_baseline else load_baseline(args.baseline, stub)
+    regressions = compare(results, baseline, args.tolerance) if baseline is not None else {}
+    print()
+    print_report(results, baseline, regressions)
+    if args.save_baseline:
+        save_baseline(args.baseline, results, stub, args)
+    elif regressions:
+        print(f"\n❌ {len(regressions)} regression(s) above {args.tolerance:.0%} vs {args.baseline}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
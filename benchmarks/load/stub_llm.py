@@ -0,0 +1,128 @@
+"""
+Заглушка OpenAI-совместимой модели и локальные фикстуры для нагрузочного бенчмарка.
+
+Отвечает на POST /v1/chat/completions (обычный и потоковый режим) с заданной задержкой
+до первого токена и скоростью генерации, а вместо интернета отдает страницы и
+спецификации из папки fixtures (GET /fixtures/<имя>, с ETag/Last-Modified).
+
+Запускается бенчмарком (python -m benchmarks.load.run), но можно и отдельно:
+    STUB_TTFT=0.5 STUB_TOKEN_RATE=50 python -m uvicorn benchmarks.load.stub_llm:app --port 9100
+
+Параметры (переменные окружения):
+    STUB_TTFT               задержка до первого токена, сек (по умолчанию 0.05)
+    STUB_TOKEN_RATE         скорость генерации, токенов/сек (по умолчанию 2000)
+    STUB_COMPLETION_TOKENS  длина ответа в токенах (по умолчанию 200)
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+TTFT = float(os.getenv("STUB_TTFT", 0.05))
+TOKEN_RATE = float(os.getenv("STUB_TOKEN_RATE", 2000))
+COMPLETION_TOKENS = int(os.getenv("STUB_COMPLETION_TOKENS", 200))
+# Токены отдаются пачками: чанк на каждый токен при высокой скорости мерил бы заглушку, а не сервис
+CHUNK_INTERVAL = 0.02
+
+app = FastAPI(title="Stub LLM")
+
+
+def _code_tokens(prompt: str) -> list[str]:
+    """Ответ на промпт генерации кода: pytest-модуль с тестом на каждый ID плана."""
+    tokens = ["```python\n", "import allure\n", "import pytest\n\n\n"]
+    for row_id in dict.fromkeys(re.findall(r"\|\s*(TC-\d+)\s*\|", prompt)):
+        suffix = row_id.lower().replace("-", "_")
+        tokens += [f'@allure.title("{row_id}: Проверка")\n', f"def test_{suffix}(page):\n",
+                   "    page.goto('/')\n", "    assert page.url\n\n\n"]
+    return tokens + ["```"]
+
+
+def _completion_tokens(body: dict) -> list[str]:
+    """Ответ в формате, который разбирают use case'ы: код для codegen, иначе markdown-таблица тест-кейсов."""
+    prompt = "".join(m.get("content") or "" for m in body.get("messages", []))
+    if "Senior SDET" in prompt:
+        return _code_tokens(prompt)
+    tokens = ["| ID | Название | Шаги | Ожидаемый результат |\n", "|---|---|---|---|\n"]
+    row = 1
+    while len(tokens) < COMPLETION_TOKENS:
+        tokens += [f"| TC-{row} ", "| Проверка ", f"сценария {row} ", "| Открыть ", "страницу ",
+                   "| Страница ", "открыта |\n"]
+        row += 1
+    return tokens[:COMPLETION_TOKENS]
+
+
+def _prompt_tokens(body: dict) -> int:
+    # Оценка по символам: точный токенизатор заглушке не нужен
+    return sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4
+
+
+def _chunk(completion_id: str, model: str, content: str | None = None, usage: dict | None = None) -> bytes:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [] if content is None else [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+    }
+    if usage is not None:
+        payload["usage"] = usage
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode()
+
+
+async def _stream(body: dict, usage: dict):
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    model = body.get("model", "stub")
+    tokens = _completion_tokens(body)
+    await asyncio.sleep(TTFT)
+    per_chunk = max(1, round(TOKEN_RATE * CHUNK_INTERVAL))
+    for start in range(0, len(tokens), per_chunk):
+        batch = tokens[start:start + per_chunk]
+        yield _chunk(completion_id, model, "".join(batch))
+        if start + per_chunk < len(tokens):
+            await asyncio.sleep(len(batch) / TOKEN_RATE)
+    if (body.get("stream_options") or {}).get("include_usage"):
+        yield _chunk(completion_id, model, usage=usage)
+    yield b"data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    tokens = _completion_tokens(body)
+    prompt_tokens = _prompt_tokens(body)
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+             "total_tokens": prompt_tokens + len(tokens)}
+    if body.get("stream"):
+        return StreamingResponse(_stream(body, usage), media_type="text/event-stream")
+
+    await asyncio.sleep(TTFT + len(tokens) / TOKEN_RATE)
+    return JSONResponse({
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                     "finish_reason": "stop"}],
+        "usage": usage,
+    })
+
+
+@app.get("/fixtures/{name}")
+async def fixture(name: str):
+    path = FIXTURES_DIR / name
+    if path.parent != FIXTURES_DIR or not path.is_file():
+        raise HTTPException(status_code=404, detail="Fixture not found")
+    return FileResponse(path)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "ttft": TTFT, "token_rate": TOKEN_RATE, "completion_tokens": COMPLETION_TOKENS}
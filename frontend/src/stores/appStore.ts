@@ -96,6 +96,21 @@ export const useAppStore = defineStore('app', () => {
         saveChatHistory()
       }
     }
+    return newMessage.id
+  }
+
+  // Обновление текста сообщения (потоковая генерация); persist=false — без записи в localStorage
+  const updateMessage = (id: string, content: string, persist = true) => {
+    messages.value = messages.value.map(m => (m.id === id ? { ...m, content } : m))
+
+    if (currentChatId.value) {
+      const chat = chatHistories.value.find(c => c.id === currentChatId.value)
+      if (chat) {
+        chat.messages = [...messages.value]
+        chat.updatedAt = Date.now()
+        if (persist) saveChatHistory()
+      }
+    }
   }
 
   const clearMessages = () => { messages.value = [] }
@@ -167,6 +182,7 @@ export const useAppStore = defineStore('app', () => {
     initializeChatHistory,
     toggleTheme,
     addMessage,
+    updateMessage,
     clearMessages,
     createNewChat,
     addChatHistory,
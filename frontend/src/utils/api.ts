@@ -1,6 +1,29 @@
 import { Notify } from 'quasar'
 
 const API_BASE = import.meta.env.VITE_API_BASE || 'http://localhost:8080/api/v1/ai'
+// Эндпоинты /ai/* gateway требуют JWT; токен выдают /auth/login и /auth/register
+const AUTH_BASE = API_BASE.replace(/\/ai\/?$/, '/auth')
+const TOKEN_KEY = 'access_token'
+
+export function getToken(): string | null {
+  return localStorage.getItem(TOKEN_KEY) || import.meta.env.VITE_API_TOKEN || null
+}
+
+export function setToken(token: string | null) {
+  if (token) localStorage.setItem(TOKEN_KEY, token)
+  else localStorage.removeItem(TOKEN_KEY)
+}
+
+export async function login(loginName: string, password: string): Promise<string> {
+  const response = await safeFetch(`${AUTH_BASE}/login`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ login: loginName, password }),
+  })
+  const json = JSON.parse(await handleResponse(response))
+  setToken(json.access_token)
+  return json.access_token
+}
 
 async function handleResponse(response: Response): Promise<string> {
   let text: string
@@ -43,9 +66,78 @@ async function handleResponse(response: Response): Promise<string> {
   }
 }
 
+async function handleStream(
+  response: Response,
+  onDelta: (text: string) => void,
+): Promise<string> {
+  // Ошибки до начала стрима приходят обычным JSON-ответом
+  if (!response.ok || !response.body) {
+    return handleResponse(response)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  let result = ''
+
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    // События SSE разделены пустой строкой
+    let separator = buffer.indexOf('\n\n')
+    while (separator !== -1) {
+      const rawEvent = buffer.slice(0, separator)
+      buffer = buffer.slice(separator + 2)
+      separator = buffer.indexOf('\n\n')
+
+      let event = 'message'
+      let data = ''
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) data += line.slice(5).trim()
+      }
+      if (!data) continue
+
+      const payload = JSON.parse(data)
+      if (event === 'error') {
+        const message = payload.detail || 'Ошибка генерации'
+        Notify.create({
+          type: 'negative',
+          message: 'Ошибка генерации',
+          caption: message,
+          position: 'top-right',
+          timeout: 5000,
+          icon: 'error',
+        })
+        throw new Error(message)
+      }
+      if (event === 'done') return result
+      if (payload.delta) {
+        result += payload.delta
+        onDelta(result)
+      }
+    }
+  }
+  return result
+}
+
+function endpoint(path: string, onDelta?: (text: string) => void): string {
+  return onDelta ? `${API_BASE}/${path}?stream=true` : `${API_BASE}/${path}`
+}
+
+function withAuth(options: RequestInit): RequestInit {
+  const token = getToken()
+  if (!token) return options
+  const headers = new Headers(options.headers)
+  headers.set('Authorization', `Bearer ${token}`)
+  return { ...options, headers }
+}
+
 async function safeFetch(url: string, options: RequestInit): Promise<Response> {
   try {
-    return await fetch(url, options)
+    return await fetch(url, withAuth(options))
   } catch (error) {
     if (error instanceof TypeError) {
       const msg = 'Сервер недоступен. Проверьте подключение к API.'
@@ -69,85 +161,86 @@ export async function generateUiTests(body: {
   modules: string
   buttons_description: string
   special_scenarios: string
-}): Promise<string> {
-  const response = await safeFetch(`${API_BASE}/generate-ui-tests`, {
+}, onDelta?: (text: string) => void): Promise<string> {
+  const response = await safeFetch(endpoint('generate-ui-tests', onDelta), {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(body),
   })
-  return handleResponse(response)
+  return onDelta ? handleStream(response, onDelta) : handleResponse(response)
 }
 
 export async function generateApiTests(body: {
   file: File
   general_description?: string
   modules?: string
-}): Promise<string> {
+}, onDelta?: (text: string) => void): Promise<string> {
   const formData = new FormData()
   formData.append('file', body.file)
   formData.append('general_description', body.general_description || 'API спецификация')
   formData.append('modules', body.modules || 'Auto-detected')
 
-  const response = await safeFetch(`${API_BASE}/generate-api-tests`, {
+  const response = await safeFetch(endpoint('generate-api-tests', onDelta), {
     method: 'POST',
     body: formData,
   })
-  return handleResponse(response)
+  return onDelta ? handleStream(response, onDelta) : handleResponse(response)
 }
 
 export async function redactContent(body: {
   original_content: string
   edit_instructions: string
-}): Promise<string> {
-  const response = await safeFetch(`${API_BASE}/redact-content`, {
+}, onDelta?: (text: string) => void): Promise<string> {
+  const response = await safeFetch(endpoint('redact-content', onDelta), {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(body),
   })
-  return handleResponse(response)
+  return onDelta ? handleStream(response, onDelta) : handleResponse(response)
 }
 
 export async function optimizeTests(body: {
   modules: string
   test_cases: string
-}): Promise<string> {
-  const response = await safeFetch(`${API_BASE}/optimize-tests`, {
+}, onDelta?: (text: string) => void): Promise<string> {
+  const response = await safeFetch(endpoint('optimize-tests', onDelta), {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(body),
   })
-  return handleResponse(response)
+  return onDelta ? handleStream(response, onDelta) : handleResponse(response)
 }
 
 export async function generateCodePytest(body: {
   url: string
   general_description: string
   approved_test_plan: string
-}): Promise<string> {
-  const response = await safeFetch(`${API_BASE}/generate-code-pytest`, {
+}, onDelta?: (text: string) => void): Promise<string> {
+  const response = await safeFetch(endpoint('generate-code-pytest', onDelta), {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(body),
   })
-  return handleResponse(response)
+  return onDelta ? handleStream(response, onDelta) : handleResponse(response)
 }
 
 export async function reviewCode(body: {
   code_snippet: string
   rules: string
-}): Promise<string> {
-  const response = await safeFetch(`${API_BASE}/review-code`, {
+}, onDelta?: (text: string) => void): Promise<string> {
+  const response = await safeFetch(endpoint('review-code', onDelta), {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(body),
   })
-  return handleResponse(response)
+  return onDelta ? handleStream(response, onDelta) : handleResponse(response)
 }
 
 export async function checkHealth(): Promise<boolean> {
   try {
+    // /ai/health открыт без токена и отвечает 503, если llm_service недоступен
     const response = await fetch(`${API_BASE}/health`, { method: 'GET' })
-    return Boolean(response)
+    return response.ok
   } catch (error) {
     console.warn('Health check failed:', error)
     return false
@@ -9,12 +9,89 @@ class Settings:
     # Базовая директория проекта
     BASE_DIR: Path = Path(__file__).resolve().parent.parent
     RESOURCES_DIR: Path = BASE_DIR / "resources"
+    # Как часто (сек) проверять mtime шаблонов промптов для горячей перезагрузки
+    PROMPT_RELOAD_INTERVAL: float = float(os.getenv("PROMPT_RELOAD_INTERVAL", 2))
 
     # AI Настройки
     AI_MODEL_KEY: str = os.getenv("AI_MODEL_KEY", "")
     AI_MODEL_URL: str = os.getenv("AI_MODEL_URL", "")
     AI_MODEL_NAME: str = os.getenv("AI_MODEL_NAME", "Qwen/Qwen3-Coder-480B-A35B-Instruct")
 
+    # Бюджет токенов: окно контекста модели и резерв под ответ
+    AI_CONTEXT_WINDOW: int = int(os.getenv("AI_CONTEXT_WINDOW", 65536))
+    AI_MAX_TOKENS: int = int(os.getenv("AI_MAX_TOKENS", 8192))
+    AI_CONTEXT_SAFETY_MARGIN: int = int(os.getenv("AI_CONTEXT_SAFETY_MARGIN", 512))
+    # Токенизатор для точного подсчета (tokenizer.json или id на HF); пусто — оценка по символам
+    AI_TOKENIZER: str = os.getenv("AI_TOKENIZER", "")
+
+    # Пул соединений общего клиента LLM
+    AI_POOL_MAX_CONNECTIONS: int = int(os.getenv("AI_POOL_MAX_CONNECTIONS", 100))
+    AI_POOL_MAX_KEEPALIVE: int = int(os.getenv("AI_POOL_MAX_KEEPALIVE", 20))
+    AI_POOL_KEEPALIVE_EXPIRY: float = float(os.getenv("AI_POOL_KEEPALIVE_EXPIRY", 60))
+    AI_HTTP2: bool = os.getenv("AI_HTTP2", "true").lower() == "true"
+    AI_REQUEST_TIMEOUT: float = float(os.getenv("AI_REQUEST_TIMEOUT", 600))
+
+    # Кэш ответов LLM (память + SQLite)
+    CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    CACHE_DB_PATH: Path = Path(os.getenv("CACHE_DB_PATH", str(BASE_DIR / ".cache" / "llm_responses.sqlite3")))
+    CACHE_MEMORY_ITEMS: int = int(os.getenv("CACHE_MEMORY_ITEMS", 256))
+    CACHE_TTL_SECONDS: int = int(os.getenv("CACHE_TTL_SECONDS", 24 * 3600))
+    CACHE_MAX_DB_MB: int = int(os.getenv("CACHE_MAX_DB_MB", 256))
+
+    # Генерация API-тестов по большим спецификациям (map-reduce по фрагментам)
+    API_SPEC_CHUNK_TOKENS: int = int(os.getenv("API_SPEC_CHUNK_TOKENS", 12000))
+    API_SPEC_MAX_PARALLEL: int = int(os.getenv("API_SPEC_MAX_PARALLEL", 4))
+
+    # Бюджет (символы) структурированной сводки страницы для UI-тестов
+    HTML_MAX_CHARS: int = int(os.getenv("HTML_MAX_CHARS", 30000))
+    # Загрузка страниц: общий пул, лимит тела ответа и кэш с ревалидацией
+    HTML_POOL_SIZE: int = int(os.getenv("HTML_POOL_SIZE", 20))
+    HTML_FETCH_TIMEOUT: float = float(os.getenv("HTML_FETCH_TIMEOUT", 20))
+    HTML_MAX_BODY_BYTES: int = int(os.getenv("HTML_MAX_BODY_BYTES", 5 * 1024 * 1024))
+    HTML_CACHE_ITEMS: int = int(os.getenv("HTML_CACHE_ITEMS", 128))
+
+    # Редактор в режиме patch: с какого размера таблицы (строк) он включается в режиме auto
+    # и сколько строк, близких к правке, отправляется модели
+    REDACT_PATCH_MIN_ROWS: int = int(os.getenv("REDACT_PATCH_MIN_ROWS", 20))
+    REDACT_PATCH_CONTEXT_ROWS: int = int(os.getenv("REDACT_PATCH_CONTEXT_ROWS", 20))
+
+    # Ревью тест-плана: порог сходства (Жаккар по шинглам шагов и ожидаемого результата) для дубликатов
+    OPTIMIZE_DUPLICATE_THRESHOLD: float = float(os.getenv("OPTIMIZE_DUPLICATE_THRESHOLD", 0.8))
+
+    # Генерация кода по большим тест-планам: строк плана в одной части и частей, генерируемых параллельно
+    CODEGEN_CHUNK_ROWS: int = int(os.getenv("CODEGEN_CHUNK_ROWS", 10))
+    CODEGEN_MAX_PARALLEL: int = int(os.getenv("CODEGEN_MAX_PARALLEL", 4))
+
+    # Ревью кода: бюджет фрагмента модуля (токены) и число фрагментов, проверяемых параллельно
+    REVIEW_CHUNK_TOKENS: int = int(os.getenv("REVIEW_CHUNK_TOKENS", 6000))
+    REVIEW_MAX_PARALLEL: int = int(os.getenv("REVIEW_MAX_PARALLEL", 4))
+
+    # Пакетная генерация UI-тестов: лимит страниц в запросе, параллельных загрузок и вызовов LLM
+    UI_BATCH_MAX_ITEMS: int = int(os.getenv("UI_BATCH_MAX_ITEMS", 100))
+    UI_BATCH_FETCH_CONCURRENCY: int = int(os.getenv("UI_BATCH_FETCH_CONCURRENCY", 8))
+    UI_BATCH_LLM_CONCURRENCY: int = int(os.getenv("UI_BATCH_LLM_CONCURRENCY", 4))
+    # Как часто (сек) отдавать строку progress, пока ни одна страница пакета не готова
+    UI_BATCH_PROGRESS_INTERVAL: float = float(os.getenv("UI_BATCH_PROGRESS_INTERVAL", 15))
+
+    # Планировщик вызовов LLM: общий лимит, лимит на пользователя и размеры очередей
+    SCHED_MAX_IN_FLIGHT: int = int(os.getenv("SCHED_MAX_IN_FLIGHT", 16))
+    SCHED_MAX_USER_IN_FLIGHT: int = int(os.getenv("SCHED_MAX_USER_IN_FLIGHT", 4))
+    SCHED_MAX_QUEUE: int = int(os.getenv("SCHED_MAX_QUEUE", 200))
+    SCHED_MAX_USER_QUEUE: int = int(os.getenv("SCHED_MAX_USER_QUEUE", 20))
+
+    # Фоновые задачи (?job=true): число воркеров, лимит очереди и срок хранения результата
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", 4))
+    JOB_MAX_QUEUE: int = int(os.getenv("JOB_MAX_QUEUE", 100))
+    JOB_RESULT_TTL_SECONDS: int = int(os.getenv("JOB_RESULT_TTL_SECONDS", 3600))
+
+    # Профилирование запуска: время импорта модулей и шагов lifespan
+    STARTUP_PROFILE: bool = os.getenv("STARTUP_PROFILE", "false").lower() == "true"
+    # Импорт openai/aiohttp и загрузка токенизатора в фоне сразу после старта
+    STARTUP_WARMUP: bool = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+
+    # Лог трассы каждого запроса (JSON-строка с этапами и trace-id)
+    TRACE_LOG: bool = os.getenv("TRACE_LOG", "true").lower() == "true"
+
     # App Settings
     HOST: str = os.getenv("LLM_SERVICE_HOST", "0.0.0.0")
     PORT: int = int(os.getenv("LLM_SERVICE_PORT", 8080))
@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic import BaseModel, Field
 from dataclasses import dataclass
 
@@ -14,6 +15,9 @@ class GenerateUiTestsRequest(BaseTestRequest):
     url: str = Field(..., description="URL веб-интерфейса")
     buttons_description: str | None = None
 
+class GenerateUiTestsBatchRequest(BaseModel):
+    items: list[GenerateUiTestsRequest] = Field(..., min_length=1, description="Страницы для генерации")
+
 # --- API Testing DTOs ---
 class GenerateApiTestsRequest(BaseTestRequest):
     url: str = Field(..., description="URL Swagger/OpenAPI спецификации (json или yaml)")
@@ -22,6 +26,9 @@ class GenerateApiTestsRequest(BaseTestRequest):
 class RedactRequest(BaseModel):
     original_content: str
     edit_instructions: str
+    mode: Literal["auto", "full", "patch"] = Field(
+        "auto", description="full — переписать документ целиком, patch — правки строк таблицы, "
+                            "auto — patch для больших таблиц")
 
 class GenerateAutoTestsRequest(GenerateUiTestsRequest):
     approved_test_plan: str
@@ -58,6 +65,7 @@ class ApiTestContext:
 class RedactContext:
     original_content: str
     edit_instructions: str
+    mode: str = "auto"
 
 @dataclass
 class AutoTestContext:
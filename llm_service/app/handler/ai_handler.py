@@ -1,16 +1,29 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile
 from fastapi.params import File, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing_extensions import Annotated
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
-from typing import Annotated
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, Request
+from typing import Annotated, Any, AsyncIterator
+import asyncio
+import contextlib
+import json
+import logging
 
 # ... импорты моделей и use cases ...
+from app.config import settings
+from app.services.cache_service import ResponseCache
+from app.services.html_service import HTMLService
+from app.services.job_service import FINISHED, Job, JobQueueFullError, JobStatus, job_manager
+from app.services.llm_service import LLMService
+from app.services.metrics import current_endpoint, track_stage
+from app.services.tracing import current_trace
+from app.services.scheduler import Client, Priority, QueueFullError, current_client, scheduler
+from app.services.token_budget import TokenUsage, request_usage
 from app.services.openapi_service import OpenAPIService # Нам понадобится сервис прямо в хендлере для парсинга
 
 # Models
 from app.domain.models import (
-    GenerateUiTestsRequest, UiTestContext,
+    GenerateUiTestsRequest, GenerateUiTestsBatchRequest, UiTestContext,
     GenerateApiTestsRequest, ApiTestContext,
     RedactRequest, RedactContext,
     GenerateAutoTestsRequest, AutoTestContext,
@@ -26,22 +39,126 @@ from app.use_cases.codegen import AutoTestGeneratorUseCase
 from app.use_cases.optimization import OptimizationUseCase
 from app.use_cases.review import ReviewUseCase
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # --- Dependency Injection Factory ---
-def get_ui_gen() -> UiTestGeneratorUseCase: return UiTestGeneratorUseCase() # <--- Обновили тип
-def get_api_gen() -> ApiTestGeneratorUseCase: return ApiTestGeneratorUseCase()
-def get_redactor() -> RedactorUseCase: return RedactorUseCase()
-def get_auto_gen() -> AutoTestGeneratorUseCase: return AutoTestGeneratorUseCase()
-def get_optimizer() -> OptimizationUseCase: return OptimizationUseCase()
-def get_reviewer() -> ReviewUseCase: return ReviewUseCase()
+# LLMService (и его пул соединений) один на процесс, создается в lifespan
+def get_llm_service(request: Request) -> LLMService: return request.app.state.llm_service
+
+def get_response_cache(request: Request) -> ResponseCache | None:
+    """Общий кэш ответов; None, если он выключен или клиент прислал X-Cache-Bypass."""
+    if request.headers.get("x-cache-bypass", "").lower() in ("1", "true"):
+        return None
+    return request.app.state.response_cache
+
+LLM = Annotated[LLMService, Depends(get_llm_service)]
+Cache = Annotated[ResponseCache | None, Depends(get_response_cache)]
+
+def get_html_service(request: Request) -> HTMLService: return request.app.state.html_service
+
+def get_ui_gen(llm: LLM, cache: Cache, html: HTMLService = Depends(get_html_service)) -> UiTestGeneratorUseCase: return UiTestGeneratorUseCase(llm, html, cache) # <--- Обновили тип
+def get_api_gen(llm: LLM, cache: Cache) -> ApiTestGeneratorUseCase: return ApiTestGeneratorUseCase(llm, cache)
+def get_redactor(llm: LLM, cache: Cache) -> RedactorUseCase: return RedactorUseCase(llm, cache)
+def get_auto_gen(llm: LLM, cache: Cache) -> AutoTestGeneratorUseCase: return AutoTestGeneratorUseCase(llm, cache)
+def get_optimizer(llm: LLM, cache: Cache) -> OptimizationUseCase: return OptimizationUseCase(llm, cache)
+def get_reviewer(llm: LLM, cache: Cache) -> ReviewUseCase: return ReviewUseCase(llm, cache)
 def get_openapi_service() -> OpenAPIService: return OpenAPIService()
 
+def admit(priority: Priority):
+    """
+    Зависимость допуска запроса в планировщик LLM: определяет пользователя
+    (x-user-id от gateway) и класс эндпоинта, при переполнении очередей — 429.
+    """
+    async def dependency(request: Request):
+        user_id = request.headers.get("x-user-id") or (request.client.host if request.client else "anonymous")
+        client = Client(user_id=user_id, priority=priority)
+        try:
+            scheduler.admit(client)
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        current_client.set(client)
+        current_endpoint.set(request.scope["route"].path)
+        try:
+            yield
+        finally:
+            scheduler.release(client)
+    return Depends(dependency)
+
+# Режим потоковой отдачи (?stream=true) доступен на всех эндпоинтах
+StreamFlag = Annotated[bool, Query(description="Отдавать ответ потоком (Server-Sent Events)")]
+# Фоновая задача (?job=true): сразу возвращается id, результат — через /jobs/{id}/result
+JobFlag = Annotated[bool, Query(description="Выполнить как фоновую задачу")]
+
+
+def _sse_event(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _sse_stream(chunks: AsyncIterator[str], usage: TokenUsage) -> AsyncIterator[str]:
+    """
+    Оборачивает поток фрагментов ответа LLM в SSE:
+    `data: {"delta": "..."}` на каждый фрагмент и `event: done` с usage и этапами в конце.
+    Ошибка после начала стриминга передается событием `event: error`.
+    """
+    # Генератор исполняется уже после выхода из хендлера — учет токенов включаем здесь
+    request_usage.set(usage)
+    try:
+        async for chunk in chunks:
+            yield _sse_event({"delta": chunk})
+    except Exception as e:
+        yield _sse_event({"detail": str(e)}, event="error")
+        return
+    logger.info("Token usage: %s", usage.as_dict())
+    # Заголовок Server-Timing уходит до генерации: полная разбивка по этапам — в событии done
+    trace = current_trace.get()
+    timings = {"timings": trace.timings()} if trace is not None else {}
+    yield _sse_event({"usage": usage.as_dict(), **timings}, event="done")
+
+
+async def _run_use_case(use_case: Any, context: Any, stream: bool, job: bool = False):
+    """
+    Выполняет use case и отдает результат одним JSON или потоком SSE.
+    В ответ добавляются фактические токены промпта/ответа по всем вызовам LLM.
+    В режиме job use case ставится в очередь фоновых задач, ответ — 202 с id задачи.
+    """
+    if job:
+        try:
+            submitted = job_manager.submit(type(use_case).__name__, lambda: use_case.execute(context), current_client.get())
+        except JobQueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+        return JSONResponse(
+            status_code=202,
+            content=submitted.as_dict(),
+            headers={"Location": f"/api/v1/ai/jobs/{submitted.id}"},
+        )
+
+    usage = TokenUsage()
+    request_usage.set(usage)
+    if stream:
+        chunks = await use_case.stream(context)
+        return StreamingResponse(
+            _sse_stream(chunks, usage),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                # Отключаем буферизацию ответа в nginx
+                "X-Accel-Buffering": "no",
+            },
+        )
+    result = await use_case.execute(context)
+    logger.info("Token usage: %s", usage.as_dict())
+    with track_stage("serialize"):
+        return JSONResponse(content={"message": result, "usage": usage.as_dict()})
+
 
-@router.post('/generate-ui-tests')
+@router.post('/generate-ui-tests', dependencies=[admit(Priority.GENERATION)])
 async def generate_ui_tests(
     request: GenerateUiTestsRequest,
-    use_case: UiTestGeneratorUseCase = Depends(get_ui_gen) # <--- Обновили тип
+    use_case: UiTestGeneratorUseCase = Depends(get_ui_gen), # <--- Обновили тип
+    stream: StreamFlag = False,
+    job: JobFlag = False
 ):
     """
     Генерация тестов для UI (анализ HTML страницы).
@@ -49,12 +166,88 @@ async def generate_ui_tests(
     try:
         # Pydantic dump -> Dataclass creation
         context = UiTestContext(**request.model_dump(exclude_none=True))
-        result = await use_case.execute(context)
-        return JSONResponse(content={"message": result})
+        return await _run_use_case(use_case, context, stream, job)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"UI Generation Failed: {str(e)}")
 
-@router.post('/generate-api-tests')
+def _ndjson(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+
+async def _ndjson_batch(
+        use_case: UiTestGeneratorUseCase, contexts: list[UiTestContext], usage: TokenUsage
+) -> AsyncIterator[str]:
+    """
+    Строка NDJSON на каждую страницу по мере готовности плана:
+    `{"type": "result", "index", "url", "message", "usage"}` или `{"type": "error", "index", "url", "detail"}`.
+    Пока страницы генерируются, раз в UI_BATCH_PROGRESS_INTERVAL сек идет `{"type": "progress", "done", "total"}`:
+    без него поток молчит до первого плана и gateway обрывает его по таймауту чтения.
+    Последняя строка — `{"type": "summary"}` с числом готовых/ошибочных страниц и суммарным usage.
+    """
+    failed = finished = 0
+    results = use_case.execute_batch(
+        contexts, settings.UI_BATCH_FETCH_CONCURRENCY, settings.UI_BATCH_LLM_CONCURRENCY
+    )
+    next_item = asyncio.ensure_future(anext(results))
+    try:
+        while True:
+            ready, _ = await asyncio.wait({next_item}, timeout=settings.UI_BATCH_PROGRESS_INTERVAL)
+            if not ready:
+                yield _ndjson({"type": "progress", "done": finished, "total": len(contexts)})
+                continue
+            try:
+                index, result, item_usage, error = next_item.result()
+            except StopAsyncIteration:
+                break
+            next_item = asyncio.ensure_future(anext(results))
+            finished += 1
+            url = contexts[index].url
+            if error is not None:
+                failed += 1
+                logger.warning("Batch item %s (%s) failed: %s", index, url, error)
+                yield _ndjson({"type": "error", "index": index, "url": url, "detail": str(error)})
+                continue
+            usage.merge(item_usage)
+            yield _ndjson({"type": "result", "index": index, "url": url, "message": result,
+                           "usage": item_usage.as_dict()})
+    finally:
+        # Клиент отключился: прерываем ожидание следующей страницы, генератор отменит остальные
+        if not next_item.done():
+            next_item.cancel()
+            with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+                await next_item
+        await results.aclose()
+    logger.info("Batch of %s pages, %s failed, token usage: %s", len(contexts), failed, usage.as_dict())
+    yield _ndjson({"type": "summary", "total": len(contexts), "done": len(contexts) - failed,
+                   "failed": failed, "usage": usage.as_dict()})
+
+
+@router.post('/generate-ui-tests/batch', dependencies=[admit(Priority.GENERATION)])
+async def generate_ui_tests_batch(
+    request: GenerateUiTestsBatchRequest,
+    use_case: UiTestGeneratorUseCase = Depends(get_ui_gen)
+):
+    """
+    Пакетная генерация UI-тестов по многим страницам. Страницы загружаются и очищаются
+    параллельно, вызовы LLM идут параллельно под общим лимитом; планы отдаются
+    потоком NDJSON по мере готовности. Ошибка одной страницы не прерывает пакет.
+    """
+    if len(request.items) > settings.UI_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"Batch is limited to {settings.UI_BATCH_MAX_ITEMS} pages")
+    contexts = [UiTestContext(**item.model_dump(exclude_none=True)) for item in request.items]
+    return StreamingResponse(
+        _ndjson_batch(use_case, contexts, TokenUsage()),
+        media_type="application/x-ndjson",
+        headers={
+            # Частично неудачный пакет не должен повторяться из кэша gateway
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+@router.post('/generate-api-tests', dependencies=[admit(Priority.GENERATION)])
 async def generate_api_tests(
         # Файл обязателен
         file: Annotated[UploadFile, File(description="Файл спецификации (json/yaml)")],
@@ -66,17 +259,20 @@ async def generate_api_tests(
 
         # Сервисы
         use_case: ApiTestGeneratorUseCase = Depends(get_api_gen),
-        openapi_service: OpenAPIService = Depends(get_openapi_service)
+        openapi_service: OpenAPIService = Depends(get_openapi_service),
+        stream: StreamFlag = False,
+        job: JobFlag = False
 ):
     """
     Генерация тестов для API на основе загруженного файла (Swagger/OpenAPI).
     """
     try:
-        # 1. Читаем байты файла
-        file_content = await file.read()
+        with track_stage("preprocess"):
+            # 1. Читаем байты файла
+            file_content = await file.read()
 
-        # 2. Валидируем и парсим файл через сервис
-        parsed_spec = openapi_service.validate_and_parse_file(file_content, file.filename)
+            # 2. Валидируем и парсим файл через сервис
+            parsed_spec = openapi_service.validate_and_parse_file(file_content, file.filename)
 
         if parsed_spec.startswith("Error"):
             raise HTTPException(status_code=400, detail=parsed_spec)
@@ -92,9 +288,7 @@ async def generate_api_tests(
         )
 
         # 4. Запускаем Use Case
-        result = await use_case.execute(context)
-
-        return JSONResponse(content={"message": result})
+        return await _run_use_case(use_case, context, stream, job)
 
     except HTTPException as he:
         raise he
@@ -102,23 +296,28 @@ async def generate_api_tests(
         raise HTTPException(status_code=500, detail=f"API Generation Failed: {str(e)}")
 
 
-@router.post('/redact-content')
+@router.post('/redact-content', dependencies=[admit(Priority.INTERACTIVE)])
 async def redact_content(
     request: RedactRequest,
-    use_case: RedactorUseCase = Depends(get_redactor)
+    use_case: RedactorUseCase = Depends(get_redactor),
+    stream: StreamFlag = False,
+    job: JobFlag = False
 ):
     try:
         context = RedactContext(**request.model_dump())
-        result = await use_case.execute(context)
-        return JSONResponse(content={"message": result})
+        return await _run_use_case(use_case, context, stream, job)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post('/generate-code-pytest')
+@router.post('/generate-code-pytest', dependencies=[admit(Priority.GENERATION)])
 async def generate_code_pytest(
     request: GenerateAutoTestsRequest,
-    use_case: AutoTestGeneratorUseCase = Depends(get_auto_gen)
+    use_case: AutoTestGeneratorUseCase = Depends(get_auto_gen),
+    stream: StreamFlag = False,
+    job: JobFlag = False
 ):
     try:
         context = AutoTestContext(
@@ -126,33 +325,74 @@ async def generate_code_pytest(
             general_description=request.general_description,
             test_plan=request.approved_test_plan
         )
-        result = await use_case.execute(context)
-        return JSONResponse(content={"message": result})
+        return await _run_use_case(use_case, context, stream, job)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post('/optimize-tests')
+@router.post('/optimize-tests', dependencies=[admit(Priority.ANALYSIS)])
 async def optimize_tests(
     request: OptimizationRequest,
-    use_case: OptimizationUseCase = Depends(get_optimizer)
+    use_case: OptimizationUseCase = Depends(get_optimizer),
+    stream: StreamFlag = False,
+    job: JobFlag = False
 ):
     try:
         context = OptimizationContext(**request.model_dump())
-        result = await use_case.execute(context)
-        return JSONResponse(content={"message": result})
+        return await _run_use_case(use_case, context, stream, job)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post('/review-code')
+@router.post('/review-code', dependencies=[admit(Priority.INTERACTIVE)])
 async def review_code(
     request: ReviewRequest,
-    use_case: ReviewUseCase = Depends(get_reviewer)
+    use_case: ReviewUseCase = Depends(get_reviewer),
+    stream: StreamFlag = False,
+    job: JobFlag = False
 ):
     try:
         context = ReviewContext(**request.model_dump())
-        result = await use_case.execute(context)
-        return JSONResponse(content={"message": result})
+        return await _run_use_case(use_case, context, stream, job)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# --- Фоновые задачи ---
+def get_job(job_id: str, request: Request) -> Job:
+    """Задача текущего пользователя; чужие и истекшие задачи — 404."""
+    job = job_manager.get(job_id)
+    user_id = request.headers.get("x-user-id") or (request.client.host if request.client else "anonymous")
+    if job is None or job.user_id not in (None, user_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get('/jobs/{job_id}')
+async def job_status(job: Job = Depends(get_job)):
+    """Статус фоновой задачи."""
+    return job.as_dict()
+
+
+@router.get('/jobs/{job_id}/result')
+async def job_result(job: Job = Depends(get_job)):
+    """Результат задачи в том же формате, что и синхронный ответ эндпоинта."""
+    if job.status == JobStatus.DONE:
+        return {"message": job.result, "usage": job.usage.as_dict()}
+    if job.status == JobStatus.FAILED:
+        raise HTTPException(status_code=500, detail=job.error)
+    raise HTTPException(status_code=409, detail=f"Job is {job.status.value}")
+
+
+@router.delete('/jobs/{job_id}')
+async def cancel_job(job: Job = Depends(get_job)):
+    """Отмена задачи: из очереди снимается сразу, выполняющаяся — прерывается."""
+    if job.status not in FINISHED:
+        job_manager.cancel(job)
+    return job.as_dict()
@@ -1,7 +1,36 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from app.services.job_service import job_manager
+from app.services.scheduler import scheduler
+from app.services.single_flight import single_flight
 
 router = APIRouter()
 
 @router.get('/ping')
 async def ping():
-    return {"message": "pong"}
\ No newline at end of file
+    return {"message": "pong"}
+
+@router.get('/cache/stats')
+async def cache_stats(request: Request):
+    """Счетчики попаданий/промахов кэша ответов LLM."""
+    cache = request.app.state.response_cache
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+@router.get('/coalescing/stats')
+async def coalescing_stats():
+    """Сколько одинаковых запросов к LLM было склеено в один вызов."""
+    return single_flight.stats()
+
+
+@router.get('/scheduler/stats')
+async def scheduler_stats():
+    """Глубина очередей к LLM, занятые слоты и время ожидания слота."""
+    return scheduler.stats()
+
+
+@router.get('/jobs/stats')
+async def jobs_stats():
+    """Очередь и статусы фоновых задач."""
+    return job_manager.stats()
@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+
+class ResponseCache:
+    """
+    Двухуровневый кэш ответов LLM: LRU в памяти + SQLite на диске.
+    Ключ — хэш шаблона, заполненного промпта, модели и параметров сэмплирования,
+    поэтому одинаковые запросы отдаются без обращения к модели.
+    """
+
+    def __init__(self, db_path: Path, memory_items: int, ttl_seconds: int, max_db_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.memory_items = memory_items
+        self.max_db_bytes = max_db_bytes
+
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._hits = {"memory": 0, "disk": 0}
+        self._misses = 0
+
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Соединение используется из потоков asyncio.to_thread, доступ сериализуем локом
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(template_name: str, prompt: str, model: str, params: dict[str, Any]) -> str:
+        payload = json.dumps(
+            {"template": template_name, "prompt": prompt, "model": model, "params": params},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> str | None:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self._hits["memory"] += 1
+                return value
+            del self._memory[key]
+
+        value = await asyncio.to_thread(self._db_get, key, now)
+        if value is None:
+            self._misses += 1
+            return None
+
+        self._hits["disk"] += 1
+        self._remember(key, value, now + self.ttl_seconds)
+        return value
+
+    async def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        await asyncio.to_thread(self._db_set, key, value, expires_at)
+
+    def stats(self) -> dict[str, Any]:
+        hits = self._hits["memory"] + self._hits["disk"]
+        total = hits + self._misses
+        return {
+            "hits_memory": self._hits["memory"],
+            "hits_disk": self._hits["disk"],
+            "misses": self._misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "memory_items": len(self._memory),
+        }
+
+    def close(self):
+        with self._db_lock:
+            self._db.close()
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _db_get(self, key: str, now: float) -> str | None:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return row[0]
+
+    def _db_set(self, key: str, value: str, expires_at: float):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, expires_at, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float):
+        """Удаляет просроченные записи, затем самые давно читаемые — до лимита по размеру."""
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_db_bytes:
+            return
+
+        stale_keys = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if total <= self.max_db_bytes:
+                break
+            stale_keys.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
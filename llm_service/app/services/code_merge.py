@@ -0,0 +1,275 @@
+import ast
+import io
+import re
+import textwrap
+import tokenize
+
+_CODE_BLOCK = re.compile(r"```(?:python|py)?[ \t]*\n(.*?)```", re.DOTALL)
+_OPEN_BLOCK = re.compile(r"```(?:python|py)?[ \t]*\n(.*)", re.DOTALL)
+
+
+def extract_code(answer: str) -> tuple[str, bool]:
+    """
+    Код из ответа модели (содержимое блоков ```python) и признак, что ответ не оборван:
+    незакрытый блок означает, что генерация уперлась в лимит токенов.
+    """
+    blocks = [match.group(1) for match in _CODE_BLOCK.finditer(answer)]
+    last_end = max((match.end() for match in _CODE_BLOCK.finditer(answer)), default=0)
+    # Блок, открытый после последнего закрытого, — оборванный хвост ответа
+    opened = _OPEN_BLOCK.search(answer, last_end)
+    if opened:
+        blocks.append(opened.group(1))
+    if not blocks:
+        return answer.strip("\n"), True
+    return "\n\n".join(block.strip("\n") for block in blocks), opened is None
+
+
+def _is_test(node: ast.stmt) -> bool:
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return node.name.startswith("test")
+    return isinstance(node, ast.ClassDef) and node.name.startswith("Test")
+
+
+def _is_fixture(node: ast.stmt) -> bool:
+    decorators = [d.func if isinstance(d, ast.Call) else d for d in getattr(node, "decorator_list", [])]
+    return any(isinstance(d, (ast.Attribute, ast.Name)) and getattr(d, "attr", getattr(d, "id", "")) == "fixture"
+               for d in decorators)
+
+
+def _assigned_names(node: ast.stmt) -> tuple[str, ...] | None:
+    """Имена простого присваивания `BASE_URL = ...`; None для прочих конструкций."""
+    targets = node.targets if isinstance(node, ast.Assign) else [node.target] if isinstance(node, ast.AnnAssign) else []
+    names = tuple(t.id for t in targets if isinstance(t, ast.Name))
+    return names if names and len(names) == len(targets) else None
+
+
+def _segment(lines: list[str], node: ast.stmt) -> str:
+    """Исходный текст узла вместе с декораторами и комментариями прямо над ним."""
+    start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])]) - 1
+    while start > 0 and lines[start - 1].lstrip().startswith("#"):
+        start -= 1
+    return textwrap.dedent("\n".join(lines[start:node.end_lineno]))
+
+
+def _defined_name(node: ast.stmt) -> str | None:
+    """Имя, которое определяет узел верхнего уровня (функция, класс, `NAME = ...`)."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return node.name
+    names = _assigned_names(node)
+    return names[0] if names and len(names) == 1 else None
+
+
+def _methods(node: ast.ClassDef) -> dict[str, ast.stmt]:
+    return {m.name: m for m in node.body if isinstance(m, (ast.FunctionDef, ast.AsyncFunctionDef))}
+
+
+def _class_shape(node: ast.ClassDef) -> str:
+    """Класс без методов: базы, декораторы и атрибуты — должны совпасть, чтобы классы слить."""
+    shape = ast.ClassDef(name=node.name, bases=node.bases, keywords=node.keywords, decorator_list=node.decorator_list,
+                         body=[m for m in node.body if m not in _methods(node).values()])
+    return ast.dump(shape)
+
+
+def rename_names(source: str, renames: dict[str, str]) -> str:
+    """
+    Переименовывает имена в исходнике одной части: определения, ссылки, параметры-фикстуры
+    и подстановки в f-строках. Атрибуты (`obj.name`) и именованные аргументы вызовов
+    (`f(name=...)`) не трогаются, как и обычные функции, где имя — их собственный параметр.
+    """
+    # Параметр обычной функции с тем же именем — локальная переменная, а не ссылка на определение;
+    # у тестов и фикстур параметр — это ссылка на фикстуру, ее переименовываем
+    shadowed = [
+        (node.lineno, node.end_lineno, arg.arg)
+        for node in ast.walk(ast.parse(source))
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and not _is_test(node) and not _is_fixture(node)
+        for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+        if arg.arg in renames
+    ]
+    tokens = list(tokenize.generate_tokens(io.StringIO(source).readline))
+    skip = {tokenize.NL, tokenize.NEWLINE, tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT}
+    significant = [t for t in tokens if t.type not in skip]
+    placeholder = re.compile(r"\{[^{}]*\}")
+    replacements = []  # (строка, начало, конец, новый текст)
+    brackets: list[bool] = []  # True — скобки параметров `def name(...)`
+    for i, token in enumerate(significant):
+        previous = significant[i - 1].string if i else ""
+        following = significant[i + 1].string if i + 1 < len(significant) else ""
+        if token.string in "([{" and token.type == tokenize.OP:
+            brackets.append(token.string == "(" and i >= 2 and significant[i - 2].string == "def")
+        elif token.string in ")]}" and token.type == tokenize.OP and brackets:
+            brackets.pop()
+        elif token.type == tokenize.NAME and token.string in renames and previous != ".":
+            keyword_argument = following == "=" and brackets and not brackets[-1]
+            local = any(start <= token.start[0] <= end and name == token.string for start, end, name in shadowed)
+            if not keyword_argument and not local:
+                replacements.append((*token.start, token.end[1], renames[token.string]))
+        elif token.type == tokenize.STRING and re.match(r"^[rbuRBU]*[fF]", token.string) and token.start[0] == token.end[0]:
+            names = "|".join(re.escape(name) for name in renames)
+            text = placeholder.sub(lambda m: re.sub(rf"(?<![\w.])({names})\b", lambda n: renames[n.group(1)], m.group()),
+                                   token.string)
+            if text != token.string:
+                replacements.append((*token.start, token.end[1], text))
+
+    lines = source.splitlines(keepends=True)
+    for row, start, end, text in sorted(replacements, reverse=True):
+        line = lines[row - 1]
+        lines[row - 1] = line[:start] + text + line[end:]
+    return "".join(lines)
+
+
+class PytestModuleMerger:
+    """
+    Собирает один модуль из модулей, сгенерированных по частям тест-плана:
+    импорты объединяются, одинаковые (по AST) константы, фикстуры, хелперы и page object'ы
+    остаются в одном экземпляре, у классов добавляются недостающие методы. Определение
+    с тем же именем, но другим телом переименовывается в своей части вместе со ссылками
+    на него (фикстура `user` -> `user_2`). Тесты с совпавшими именами тоже переименовываются.
+    Порядок: импорты -> остальное -> тесты.
+    """
+
+    def __init__(self):
+        self._docstring: str | None = None
+        self._imports: dict[str, None] = {}  # `import x` — упорядоченное множество
+        self._from_imports: dict[tuple[int, str], dict[tuple[str, str | None], None]] = {}
+        # Ключ -> исходник; у классов — исходник и добавленные из других частей методы
+        self._definitions: dict[str, str | list[str]] = {}
+        self._dumps: dict[str, str] = {}  # Ключ определения -> ast.dump первого определения
+        self._classes: dict[str, tuple[str, dict[str, str], str]] = {}  # Класс -> (форма, методы, отступ тела)
+        self._names: set[str] = set()
+        self._tests: dict[str, str] = {}
+        self._test_sources: set[str] = set()
+
+    def add(self, source: str):
+        """Добавляет модуль одной части; SyntaxError, если он не разбирается (например, обрезан)."""
+        tree = ast.parse(source)
+        # Переименование меняет и определения, которые ссылались на переименованное, —
+        # повторяем, пока конфликтов не останется
+        renames = self._conflicts(tree)
+        while renames:
+            source = rename_names(source, renames)
+            tree = ast.parse(source)
+            renames = self._conflicts(tree)
+
+        lines = source.splitlines()
+        body = tree.body
+        if body and isinstance(body[0], ast.Expr) and isinstance(getattr(body[0], "value", None), ast.Constant) \
+                and isinstance(body[0].value.value, str):
+            if self._docstring is None:
+                self._docstring = _segment(lines, body[0])
+            body = body[1:]
+
+        for node in body:
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    self._imports[ast.unparse(ast.Import(names=[alias]))] = None
+                    self._names.add(alias.asname or alias.name.split(".")[0])
+            elif isinstance(node, ast.ImportFrom):
+                names = self._from_imports.setdefault((node.level, node.module or ""), {})
+                for alias in node.names:
+                    names[(alias.name, alias.asname)] = None
+                    self._names.add(alias.asname or alias.name)
+            elif _is_test(node):
+                self._add_test(node, _segment(lines, node))
+            elif isinstance(node, ast.ClassDef):
+                self._add_class(node, lines)
+            else:
+                self._add_definition(node, _segment(lines, node))
+
+    @staticmethod
+    def _key(node: ast.stmt) -> str:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            return node.name
+        if isinstance(node, ast.ClassDef):
+            return f"class {node.name}"
+        names = _assigned_names(node)
+        return "=".join(names) if names else ast.unparse(node)
+
+    def _conflicts(self, tree: ast.Module) -> dict[str, str]:
+        """Имена части, уже определенные в модуле по-другому, -> новые свободные имена."""
+        taken = self._names | {name for node in tree.body if (name := _defined_name(node))}
+        renames = {}
+        for node in tree.body:
+            name = _defined_name(node)
+            if name is None or _is_test(node) or isinstance(node, (ast.Import, ast.ImportFrom)):
+                continue
+            if isinstance(node, ast.ClassDef):
+                known = self._classes.get(node.name)
+                conflict = known is not None and (
+                    known[0] != _class_shape(node)
+                    or any(known[1].get(m, dump) != dump for m, dump in
+                           ((m, ast.dump(method)) for m, method in _methods(node).items()))
+                )
+            else:
+                known_dump = self._dumps.get(self._key(node))
+                conflict = known_dump is not None and known_dump != ast.dump(node)
+            if conflict:
+                suffix = 2
+                while f"{name}_{suffix}" in taken:
+                    suffix += 1
+                renames[name] = f"{name}_{suffix}"
+                taken.add(renames[name])
+        return renames
+
+    def _add_definition(self, node: ast.stmt, segment: str):
+        key = self._key(node)
+        if key in self._definitions:
+            return  # То же определение из другой части (отличающиеся переименованы в add)
+        self._definitions[key] = segment
+        self._dumps[key] = ast.dump(node)
+        if (name := _defined_name(node)) is not None:
+            self._names.add(name)
+
+    def _add_class(self, node: ast.ClassDef, lines: list[str]):
+        methods = _methods(node)
+        key = f"class {node.name}"
+        if node.name not in self._classes:
+            self._definitions[key] = [_segment(lines, node)]
+            body_line = lines[node.body[0].lineno - 1]
+            indent = body_line[:len(body_line) - len(body_line.lstrip())]
+            self._classes[node.name] = _class_shape(node), {m: ast.dump(f) for m, f in methods.items()}, indent
+            self._names.add(node.name)
+            return
+        _, known, indent = self._classes[node.name]
+        for name, method in methods.items():
+            if name not in known:
+                known[name] = ast.dump(method)
+                self._definitions[key].append(textwrap.indent(_segment(lines, method), indent))
+
+    def _add_test(self, node: ast.stmt, segment: str):
+        if segment in self._test_sources:
+            return
+        self._test_sources.add(segment)
+        name, suffix = node.name, 2
+        while name in self._tests:
+            name, suffix = f"{node.name}_{suffix}", suffix + 1
+        if name != node.name:
+            keyword = "class" if isinstance(node, ast.ClassDef) else "def"
+            segment = re.sub(rf"^((?:async\s+)?{keyword}\s+){re.escape(node.name)}\b", rf"\g<1>{name}",
+                             segment, count=1, flags=re.MULTILINE)
+        self._tests[name] = segment
+        self._names.add(name)
+
+    def _render_imports(self) -> list[str]:
+        future = self._from_imports.get((0, "__future__"), {})
+        lines = [self._render_from(0, "__future__", future)] if future else []
+        lines.extend(self._imports)
+        for (level, module), names in self._from_imports.items():
+            if (level, module) != (0, "__future__"):
+                lines.append(self._render_from(level, module, names))
+        return lines
+
+    @staticmethod
+    def _render_from(level: int, module: str, names: dict[tuple[str, str | None], None]) -> str:
+        aliases = [ast.alias(name=name, asname=asname) for name, asname in names]
+        return ast.unparse(ast.ImportFrom(module=module or None, names=aliases, level=level))
+
+    def render(self) -> str:
+        header = [self._docstring] if self._docstring else []
+        imports = self._render_imports()
+        if imports:
+            header.append("\n".join(imports))
+        blocks = ["\n\n".join(header)] if header else []
+        for segment in self._definitions.values():
+            blocks.append(segment if isinstance(segment, str) else "\n\n".join(segment))
+        blocks.extend(self._tests.values())
+        return "\n\n\n".join(blocks) + "\n"
@@ -0,0 +1,292 @@
+import ast
+import re
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+from app.services.markdown_table import MarkdownTable
+
+# Правила из prompt_review.txt, которые проверяются локально
+RULE_AAA = "1. AAA"
+RULE_ALLURE = "2. Allure"
+RULE_HARDCODE = "3. Hardcode & Stability"
+RULE_NAMING = "4. Naming"
+
+LOCAL = "статический анализ"
+MODEL = "модель"
+
+REPORT_HEADER = ["Строка", "Правило", "Замечание", "Рекомендация", "Источник"]
+
+_ABSOLUTE_PATH = re.compile(r"^(?:[A-Za-z]:[\\/]|/home/|/Users/|~/)")
+_URL = re.compile(r"^https?://", re.IGNORECASE)
+_LINE_NUMBER = re.compile(r"\d+")
+# Шапка модуля: импорты, докстринг и константы — отдельно не ревьюятся
+_HEADER_NODES = (ast.Import, ast.ImportFrom, ast.Assign, ast.AnnAssign, ast.Expr)
+
+
+@dataclass
+class Finding:
+    line: int
+    rule: str
+    message: str
+    recommendation: str = ""
+    source: str = LOCAL
+
+
+@dataclass
+class CodeChunk:
+    """Фрагмент модуля для отдельного ревью: строки с start (с 1)."""
+    start: int
+    lines: list[str]
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.lines) - 1
+
+    def numbered(self) -> str:
+        # Номера строк — от начала фрагмента: ответ модели не зависит от сдвига фрагмента в файле,
+        # и кэш переживает правки выше по модулю
+        width = len(str(len(self.lines)))
+        return "\n".join(f"{i:>{width}} | {line}" for i, line in enumerate(self.lines, start=1))
+
+
+def _dotted(node: ast.AST) -> str:
+    """`allure.step(...)` -> "allure.step", `sleep` -> "sleep"; для прочих выражений — ""."""
+    if isinstance(node, ast.Call):
+        node = node.func
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return ""
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def _first_line(node: ast.AST) -> int:
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+def _is_test(node: ast.AST) -> bool:
+    return isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test")
+
+
+def _tests(tree: ast.Module) -> Iterator[tuple[ast.FunctionDef, ast.ClassDef | None]]:
+    """Тесты pytest: функции test* модуля и методы test* классов Test*."""
+    for node in tree.body:
+        if _is_test(node):
+            yield node, None
+        elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+            for member in node.body:
+                if _is_test(member):
+                    yield member, node
+
+
+def _has_check(test: ast.AST) -> bool:
+    for node in ast.walk(test):
+        if isinstance(node, ast.Assert):
+            return True
+        if isinstance(node, ast.Call):
+            name = _dotted(node).rsplit(".", 1)[-1]
+            if name.startswith(("assert", "expect")) or name == "raises":
+                return True
+    return False
+
+
+def _asserts_outside_step(node: ast.AST, in_step: bool = False) -> Iterator[ast.Assert]:
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, ast.Assert):
+            if not in_step:
+                yield child
+        elif isinstance(child, (ast.With, ast.AsyncWith)):
+            step = any(_dotted(item.context_expr) == "allure.step" for item in child.items)
+            yield from _asserts_outside_step(child, in_step or step)
+        else:
+            yield from _asserts_outside_step(child, in_step)
+
+
+def _vague_name(name: str) -> bool:
+    # test_01, test_a, test_1_2: в имени нет ни одного осмысленного слова
+    words = [w for w in name[len("test"):].split("_") if w and not w.isdigit()]
+    return sum(len(w) for w in words) < 4
+
+
+def _check_test(test: ast.FunctionDef, owner: ast.ClassDef | None) -> Iterator[Finding]:
+    line = _first_line(test)
+    if not _has_check(test):
+        yield Finding(test.lineno, RULE_AAA, f"В тесте `{test.name}` нет ни одной проверки (assert)",
+                      "Добавить блок Assert с проверкой результата действия")
+
+    decorators = {_dotted(d) for d in test.decorator_list}
+    if owner is not None:
+        decorators |= {_dotted(d) for d in owner.decorator_list}
+    missing = [name for name in ("allure.feature", "allure.story") if name not in decorators]
+    if missing:
+        yield Finding(line, RULE_ALLURE, f"У теста `{test.name}` нет декораторов " + ", ".join(f"`@{m}`" for m in missing),
+                      "Добавить декораторы на тест или на класс")
+    outside = list(_asserts_outside_step(test))
+    if outside:
+        yield Finding(outside[0].lineno, RULE_ALLURE,
+                      f"Проверок вне `with allure.step(...)` в `{test.name}`: {len(outside)}",
+                      "Обернуть каждую проверку в шаг с описанием на русском")
+
+    for node in ast.walk(test):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and _URL.match(node.value):
+            yield Finding(node.lineno, RULE_HARDCODE, f"URL `{node.value}` захардкожен в тесте",
+                          "Вынести адрес в конфигурацию или фикстуру (base_url)")
+
+    if test.name != test.name.lower() or not test.name.startswith("test_"):
+        yield Finding(test.lineno, RULE_NAMING, f"Имя `{test.name}` не в snake_case с префиксом `test_`",
+                      "Переименовать в `test_<что_проверяется>`")
+    elif _vague_name(test.name):
+        yield Finding(test.lineno, RULE_NAMING, f"Имя `{test.name}` не отражает суть проверки",
+                      "Назвать тест по проверяемому поведению, например `test_login_with_valid_data`")
+
+
+def static_findings(tree: ast.Module) -> list[Finding]:
+    """
+    Нарушения правил ревью, которые находятся по AST без модели: тесты без проверок,
+    без allure-декораторов и шагов, `time.sleep`, жесткие пути и URL, неговорящие имена.
+    """
+    findings = []
+    for test, owner in _tests(tree):
+        findings.extend(_check_test(test, owner))
+
+    sleep_imported = any(
+        isinstance(node, ast.ImportFrom) and node.module == "time" and any(a.name == "sleep" for a in node.names)
+        for node in ast.walk(tree)
+    )
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            name = _dotted(node)
+            if name == "time.sleep" or (name == "sleep" and sleep_imported):
+                delay = ast.unparse(node.args[0]) if node.args else ""
+                findings.append(Finding(node.lineno, RULE_HARDCODE, f"`time.sleep({delay})` — жесткое ожидание",
+                                        "Заменить на ожидание условия (wait_for / expect)"))
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str) and _ABSOLUTE_PATH.match(node.value):
+            findings.append(Finding(node.lineno, RULE_HARDCODE, f"Жесткий путь `{node.value}`",
+                                    "Строить путь от корня проекта или tmp_path"))
+
+    unique = {(f.line, f.rule, f.message): f for f in findings}
+    return sorted(unique.values(), key=lambda f: f.line)
+
+
+def _child_statements(node: ast.AST) -> list[ast.stmt]:
+    children = [child for name in ("body", "handlers", "orelse", "finalbody")
+                for child in getattr(node, name, []) if isinstance(child, (ast.stmt, ast.excepthandler))]
+    return sorted(children, key=lambda child: child.lineno)
+
+
+def _unit_ends(node: ast.AST, lines: list[str], budget: int, count: Callable[[str], int]) -> list[int]:
+    """
+    Последние строки единиц, на которые делится узел: целиком, если он укладывается в бюджет,
+    иначе — по вложенным инструкциям (методы класса, инструкции тела теста, блоки with/for/try).
+    Заголовок узла (декораторы, `def ...:`) уходит в первую единицу.
+    """
+    children = _child_statements(node)
+    if not children or count("\n".join(lines[_first_line(node) - 1:node.end_lineno])) <= budget:
+        return [node.end_lineno]
+    ends = [end for child in children for end in _unit_ends(child, lines, budget, count)]
+    if ends[-1] < node.end_lineno:
+        ends.append(node.end_lineno)
+    return ends
+
+
+def split_chunks(source: str, tree: ast.Module, budget: int, count: Callable[[str], int]) -> list[CodeChunk]:
+    """
+    Делит модуль на фрагменты не больше budget токенов по границам верхнеуровневых
+    конструкций: соседние тесты и классы упаковываются вместе, конструкция больше бюджета
+    делится по вложенным инструкциям. Импорты и константы в начале модуля не ревьюятся
+    отдельно, а идут вместе с первым тестом. Комментарии и пустые строки уходят в следующий фрагмент.
+    """
+    lines = source.splitlines()
+    # Конец шапки модуля: импорты, докстринг и константы до первого определения
+    header_end = 0
+    for node in tree.body:
+        if not isinstance(node, _HEADER_NODES):
+            break
+        header_end = node.end_lineno
+
+    # Границы единиц: номер последней строки каждой единицы
+    ends: list[int] = []
+    for node in tree.body:
+        ends.extend(_unit_ends(node, lines, budget, count))
+    if not ends or ends[-1] < len(lines):
+        ends.append(len(lines))
+
+    chunks: list[CodeChunk] = []
+    start, size = 1, 0
+    previous = 0
+    for end in ends:
+        unit = "\n".join(lines[previous:end])
+        unit_size = count(unit)
+        if size and size + unit_size > budget and previous > header_end:
+            chunks.append(CodeChunk(start, lines[start - 1:previous]))
+            start, size = previous + 1, 0
+        size += unit_size
+        previous = end
+    if previous >= start:
+        chunks.append(CodeChunk(start, lines[start - 1:previous]))
+    return chunks
+
+
+def findings_for_prompt(findings: list[Finding], chunk: CodeChunk) -> str:
+    """Локальные находки фрагмента (строки — от начала фрагмента) для промпта."""
+    local = [f for f in findings if chunk.start <= f.line <= chunk.end]
+    if not local:
+        return "Нет."
+    return "\n".join(f"- строка {f.line - chunk.start + 1}: [{f.rule}] {f.message}" for f in local)
+
+
+def parse_findings(markdown: str, chunk: CodeChunk) -> list[Finding] | None:
+    """
+    Замечания модели из таблицы `| Строка | Правило | Замечание | Рекомендация |`
+    с переводом номеров строк фрагмента в номера строк модуля. None — ответ не таблица.
+    """
+    table = MarkdownTable.parse(markdown)
+    if table is None:
+        return None
+    line_col, rule_col, message_col, advice_col = (table.column(name) for name in REPORT_HEADER[:4])
+    if line_col is None or message_col is None:
+        return None
+
+    def cell(cells: list[str], position: int | None) -> str:
+        return cells[position] if position is not None and position < len(cells) else ""
+
+    findings = []
+    for cells in table.rows:
+        message = cell(cells, message_col)
+        if not message:
+            continue
+        number = _LINE_NUMBER.search(cell(cells, line_col))
+        relative = int(number.group()) if number else 1
+        line = chunk.start + min(max(relative, 1), len(chunk.lines)) - 1
+        findings.append(Finding(line, cell(cells, rule_col), message, cell(cells, advice_col), MODEL))
+    return findings
+
+
+def merge_findings(local: list[Finding], model: list[Finding]) -> list[Finding]:
+    """Общий список по номеру строки; замечания модели, повторяющие локальные (строка и правило), отбрасываются."""
+    seen = {(f.line, f.rule.split(".", 1)[0]) for f in local}
+    extra = [f for f in model if (f.line, f.rule.split(".", 1)[0]) not in seen]
+    # Сортировка устойчивая: на одной строке локальные находки идут первыми
+    return sorted(local + extra, key=lambda f: f.line)
+
+
+def render_report(findings: list[Finding], chunks: int, notes: list[str]) -> str:
+    local = sum(f.source == LOCAL for f in findings)
+    summary = (f"**Итог:** замечаний {len(findings)} (статический анализ: {local}, модель: {len(findings) - local}); "
+               f"фрагментов кода на ревью: {chunks}.")
+    parts = [summary]
+    if findings:
+        table = MarkdownTable(header=list(REPORT_HEADER), rows=[
+            [str(f.line), f.rule, f.message.replace("|", "\\|"), f.recommendation.replace("|", "\\|"), f.source]
+            for f in findings
+        ])
+        parts.append(table.render())
+    else:
+        parts.append("Замечаний не найдено.")
+    # Ответы модели не в виде таблицы — как есть, чтобы не потерять замечания
+    parts.extend(notes)
+    return "\n\n".join(parts)
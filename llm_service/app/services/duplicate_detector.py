@@ -0,0 +1,136 @@
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+from app.services.markdown_table import MarkdownTable
+
+_NON_WORD = re.compile(r"[\W_]+")
+# Тестовые данные: числа и значения в кавычках. Строки с разными данными — разные проверки
+# (граничные значения «8 символов» и «9 символов»), даже если текст почти совпадает
+_LITERAL = re.compile(r"\d+(?:[.,]\d+)*|\"[^\"]*\"|«[^»]*»|'[^']*'|`[^`]*`")
+# Символьные шинглы: опечатка или другое тестовое значение меняет лишь несколько шинглов
+SHINGLE_SIZE = 4
+# Колонки, по которым сравниваются сценарии (подстроки названий, без учета регистра)
+_STEP_COLUMNS = ("шаг", "step")
+_RESULT_COLUMNS = ("ожидаем", "expected", "результат", "result")
+_ID_COLUMNS = ("id", "№", "#")
+
+
+@dataclass
+class DuplicateGroup:
+    """Сценарий, который остается в плане, и его дубликаты — каждый похож именно на него."""
+    keep: int  # Строка, которая остается в плане (первая по порядку)
+    duplicates: list[int] = field(default_factory=list)
+    similarity: dict[int, float] = field(default_factory=dict)  # Сходство дубликата с оставленной строкой
+    exact: set[int] = field(default_factory=set)  # Дубликаты, совпадающие с оставленной строкой дословно
+
+
+def _normalize(text: str) -> str:
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def _shingles(text: str) -> set[str]:
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def _literals(text: str) -> tuple[str, ...]:
+    return tuple(sorted(match.lower() for match in _LITERAL.findall(text)))
+
+
+def _jaccard(a: set, b: set) -> float:
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+def compared_columns(table: MarkdownTable) -> list[int]:
+    """Колонки шагов и ожидаемого результата; если их нет — все, кроме ID."""
+    def matching(names: tuple[str, ...]) -> list[int]:
+        return [i for i, title in enumerate(table.header) if any(name in title.lower() for name in names)]
+
+    columns = sorted(set(matching(_STEP_COLUMNS) + matching(_RESULT_COLUMNS)))
+    if columns:
+        return columns
+    return [i for i, title in enumerate(table.header) if title.strip().lower() not in _ID_COLUMNS]
+
+
+def similar_pairs(sets: list[set[str]], threshold: float) -> list[tuple[int, int, float]]:
+    """
+    Все пары (i, j, сходство) с коэффициентом Жаккара не ниже threshold.
+    Точный join с префиксной фильтрацией: шинглы упорядочены от редких к частым, и пары
+    с нужным сходством обязаны пересечься в префиксе длины |x| - ceil(threshold * |x|) + 1,
+    поэтому сравниваются только такие кандидаты, а не все n² пар.
+    """
+    frequency = Counter(shingle for shingles in sets for shingle in shingles)
+    # Шингл -> ранг от редких к частым: сортировка и пересечения идут по int, а не по строкам
+    rank = {shingle: i for i, (shingle, _) in enumerate(
+        sorted(frequency.items(), key=lambda item: (item[1], item[0])))}
+    ranked = [{rank[shingle] for shingle in shingles} for shingles in sets]
+
+    index: dict[int, list[int]] = defaultdict(list)
+    pairs = []
+    for i, shingles in enumerate(ranked):
+        if not shingles:
+            continue
+        ordered = sorted(shingles)
+        prefix = ordered[:len(ordered) - math.ceil(threshold * len(ordered)) + 1]
+        candidates = {j for shingle in prefix for j in index[shingle]}
+        for j in sorted(candidates):
+            other = ranked[j]
+            if min(len(shingles), len(other)) < threshold * max(len(shingles), len(other)):
+                continue  # Разница в размере уже не дает нужного сходства
+            similarity = _jaccard(shingles, other)
+            if similarity >= threshold:
+                pairs.append((j, i, similarity))
+        for shingle in prefix:
+            index[shingle].append(i)
+    return pairs
+
+
+def find_duplicates(table: MarkdownTable, threshold: float) -> list[DuplicateGroup]:
+    """
+    Точные и почти-дубликаты сценариев по шагам и ожидаемому результату.
+    Сравниваются только строки с одинаковыми тестовыми данными (числа, значения в кавычках).
+    Группы не транзитивны: строка становится дубликатом самой ранней оставленной строки,
+    на которую она похожа, поэтому каждый дубликат сравнен именно с оставленной строкой.
+    """
+    columns = compared_columns(table)
+    raw = [" ".join(row[i] for i in columns if i < len(row)) for row in table.rows]
+    texts = [_normalize(text) for text in raw]
+    sets = [_shingles(text) for text in texts]
+
+    by_literals: dict[tuple[str, ...], list[int]] = defaultdict(list)
+    for i, text in enumerate(raw):
+        by_literals[_literals(text)].append(i)
+
+    # Для каждой строки — более ранние похожие строки с теми же данными
+    similar: dict[int, dict[int, float]] = defaultdict(dict)
+    for rows in by_literals.values():
+        if len(rows) < 2:
+            continue
+        for a, b, similarity in similar_pairs([sets[i] for i in rows], threshold):
+            earlier, later = sorted((rows[a], rows[b]))
+            similar[later][earlier] = similarity
+
+    groups: dict[int, DuplicateGroup] = {}
+    kept: set[int] = set()
+    for row in range(len(sets)):
+        keep = min((j for j in similar[row] if j in kept), default=None)
+        if keep is None:
+            kept.add(row)
+            continue
+        group = groups.setdefault(keep, DuplicateGroup(keep=keep))
+        group.duplicates.append(row)
+        group.similarity[row] = round(similar[row][keep], 2)
+        if texts[row] == texts[keep]:
+            group.exact.add(row)
+    return [groups[keep] for keep in sorted(groups)]
+
+
+def drop_duplicates(table: MarkdownTable, groups: list[DuplicateGroup]) -> MarkdownTable:
+    """Таблица, в которой от каждой группы дубликатов осталась только первая строка."""
+    dropped = {row for group in groups for row in group.duplicates}
+    return MarkdownTable(header=list(table.header),
+                         rows=[row for i, row in enumerate(table.rows) if i not in dropped])
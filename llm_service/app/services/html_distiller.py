@@ -0,0 +1,280 @@
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+
+# Содержимое этих тегов не несет информации для тест-дизайна
+_SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "object", "canvas"}
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+              "param", "source", "track", "wbr"}
+_HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+_LANDMARKS = {"nav", "header", "footer", "aside"}
+_INTERACTIVE_ROLES = {"button", "link", "tab", "menuitem", "checkbox", "radio", "switch", "combobox",
+                      "textbox", "searchbox", "slider", "spinbutton", "option", "listbox", "menu", "tablist"}
+_DIALOG_ROLES = {"dialog", "alertdialog"}
+# Атрибуты, полезные для локаторов и проверок в автотестах
+_KEPT_ATTRS = ("id", "name", "type", "role", "placeholder", "aria-label", "value", "href", "action",
+               "method", "data-testid", "data-test", "data-qa", "pattern", "minlength", "maxlength",
+               "min", "max", "autocomplete")
+_FLAG_ATTRS = ("required", "disabled", "readonly", "checked", "multiple", "aria-expanded", "aria-modal")
+_MAX_OPTIONS = 10
+# Секции, где повторы — одно и то же меню в шапке и подвале; поля форм не схлопываются:
+# одинаковые поля в разных формах — разная структура страницы
+_DEDUPED_SECTIONS = {"## NAVIGATION CONTROLS", "## LINKS", "## NAVIGATION LINKS"}
+_WS = re.compile(r"\s+")
+
+
+def _squash(text: str, limit: int = 120) -> str:
+    text = _WS.sub(" ", text).strip()
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+@dataclass
+class _Node:
+    """Интересный для тестирования элемент страницы."""
+    tag: str
+    attrs: dict[str, str]
+    form: int | None = None
+    landmark: str | None = None
+    text: list[str] = field(default_factory=list)
+    options: list[str] = field(default_factory=list)
+    label: "_Node | None" = None
+
+    def describe(self, labels_by_id: dict[str, "_Node"], with_text: bool = True) -> str:
+        parts = [self.tag]
+        for name in _KEPT_ATTRS:
+            value = self.attrs.get(name)
+            if value:
+                parts.append(f'{name}="{_squash(value, 60)}"')
+        parts += [name for name in _FLAG_ATTRS if name in self.attrs]
+        line = "[" + " ".join(parts) + "]"
+        if not with_text:
+            return line
+
+        text = _squash(" ".join(self.text))
+        if text:
+            line += f' "{text}"'
+        label = self.label or labels_by_id.get(self.attrs.get("id", ""))
+        if label is not None and label is not self:
+            label_text = _squash(" ".join(label.text))
+            if label_text:
+                line += f' label="{label_text}"'
+        if self.options:
+            line += " options=" + " | ".join(self.options)
+        return line
+
+
+class _DistillParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title: list[str] = []
+        self.forms: list[_Node] = []
+        self.controls: list[_Node] = []
+        self.dialogs: list[_Node] = []
+        self.headings: list[_Node] = []
+        self.links: list[_Node] = []
+        self.labels_by_id: dict[str, _Node] = {}
+        self.text: list[str] = []
+
+        self._skip_depth = 0
+        self._in_title = False
+        # Сколько элементов с данным тегом сейчас открыто: по этому счетчику
+        # закрываются вложенные одноименные контейнеры (div в div)
+        self._open: dict[str, int] = {}
+        self._form_stack: list[int] = []
+        self._landmark_stack: list[tuple[str, str, int]] = []
+        self._label_stack: list[_Node] = []
+        # Открытые элементы, которые собирают свой текст: (tag, глубина, node)
+        self._capturing: list[tuple[str, int, _Node]] = []
+        self._select: _Node | None = None
+        self._option: list[str] | None = None
+
+    # --- helpers ---
+    def _node(self, tag: str, attrs: dict[str, str]) -> _Node:
+        return _Node(
+            tag=tag,
+            attrs=attrs,
+            form=self._form_stack[-1] if self._form_stack else None,
+            landmark=self._landmark_stack[-1][1] if self._landmark_stack else None,
+            label=self._label_stack[-1] if self._label_stack else None,
+        )
+
+    def _capture(self, tag: str, node: _Node):
+        if tag not in _VOID_TAGS:
+            self._capturing.append((tag, self._open.get(tag, 0), node))
+
+    # --- HTMLParser callbacks ---
+    def handle_starttag(self, tag, attrs):
+        if self._skip_depth:
+            if tag in _SKIP_TAGS:
+                self._skip_depth += 1
+            return
+        if tag == "title":
+            self._in_title = True
+            return
+        if tag in _SKIP_TAGS:
+            self._skip_depth = 1
+            return
+
+        attrs = {k: (v or "") for k, v in attrs}
+        role = attrs.get("role", "")
+        if tag not in _VOID_TAGS:
+            self._open[tag] = self._open.get(tag, 0) + 1
+
+        if tag in _LANDMARKS or role == "navigation":
+            self._landmark_stack.append((tag, "nav" if role == "navigation" else tag, self._open[tag]))
+        if tag == "form":
+            self.forms.append(self._node(tag, attrs))
+            self._form_stack.append(len(self.forms) - 1)
+        elif tag == "label":
+            node = self._node(tag, attrs)
+            if attrs.get("for"):
+                self.labels_by_id[attrs["for"]] = node
+            self._label_stack.append(node)
+            self._capture(tag, node)
+        elif tag in ("input", "textarea", "button", "select") or role in _INTERACTIVE_ROLES:
+            node = self._node(tag, attrs)
+            if attrs.get("type") == "hidden":
+                return
+            self.controls.append(node)
+            if tag == "select":
+                self._select = node
+            self._capture(tag, node)
+        elif tag == "option" and self._select is not None:
+            self._option = []
+        elif tag == "dialog" or role in _DIALOG_ROLES:
+            node = self._node(tag, attrs)
+            self.dialogs.append(node)
+        elif tag in _HEADINGS or tag == "legend":
+            node = self._node(tag, attrs)
+            self.headings.append(node)
+            self._capture(tag, node)
+        elif tag == "a":
+            node = self._node(tag, attrs)
+            self.links.append(node)
+            self._capture(tag, node)
+        elif tag == "img" and attrs.get("alt"):
+            self.text.append(f"[IMG: {attrs['alt']}]")
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self._skip_depth:
+            if tag in _SKIP_TAGS:
+                self._skip_depth -= 1
+            return
+        if tag == "title":
+            self._in_title = False
+            return
+        depth = self._open.get(tag, 0)
+        if depth:
+            self._open[tag] = depth - 1
+        if self._landmark_stack and self._landmark_stack[-1][0] == tag and depth <= self._landmark_stack[-1][2]:
+            self._landmark_stack.pop()
+        if tag == "option" and self._option is not None:
+            if self._select is not None and len(self._select.options) < _MAX_OPTIONS:
+                self._select.options.append(_squash(" ".join(self._option), 40))
+            self._option = None
+        if tag == "select":
+            self._select = None
+        if tag == "form" and self._form_stack:
+            self._form_stack.pop()
+        if tag == "label" and self._label_stack:
+            self._label_stack.pop()
+
+        # Закрываем элемент, открытый на этой же глубине (HTML бывает невалидным)
+        for i in range(len(self._capturing) - 1, -1, -1):
+            open_tag, open_depth, _ = self._capturing[i]
+            if open_tag == tag and open_depth >= depth:
+                del self._capturing[i:]
+                break
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._in_title:
+            self.title.append(data)
+            return
+        if not data.strip():
+            return
+        if self._option is not None:
+            self._option.append(data)
+            return
+        if self._capturing:
+            for _, _, node in self._capturing:
+                node.text.append(data)
+            return
+        self.text.append(data)
+
+
+class HTMLDistiller:
+    """
+    Потоковый (без построения DOM) дистиллятор HTML для генерации UI-тестов.
+    Вместо плоского текста страницы отдает компактную структурированную сводку:
+    формы и их поля, кнопки, селекты, диалоги, ARIA-роли и подписи,
+    ужатую до бюджета символов по приоритету секций.
+    """
+
+    def distill(self, html: str, max_chars: int) -> str:
+        if not html:
+            return ""
+        parser = _DistillParser()
+        parser.feed(html)
+        parser.close()
+        return self._render(parser, max_chars)
+
+    @staticmethod
+    def _render(p: _DistillParser, max_chars: int) -> str:
+        labels = p.labels_by_id
+        sections: list[tuple[str, list[str]]] = []
+
+        for index, form in enumerate(p.forms):
+            fields_ = [c.describe(labels) for c in p.controls if c.form == index]
+            title = f"## FORM {index + 1} {form.describe(labels, with_text=False)}"
+            sections.append((title, [f"- {line}" for line in fields_]))
+
+        main_controls = [c for c in p.controls if c.form is None and c.landmark is None]
+        if main_controls:
+            sections.append(("## CONTROLS", [f"- {c.describe(labels)}" for c in main_controls]))
+        if p.dialogs:
+            sections.append(("## DIALOGS", [f"- {d.describe(labels)}" for d in p.dialogs]))
+        if p.headings:
+            sections.append(("## HEADINGS", [f"- {h.tag}: {_squash(' '.join(h.text))}" for h in p.headings
+                                             if ''.join(h.text).strip()]))
+
+        landmark_controls = [c for c in p.controls if c.form is None and c.landmark is not None]
+        if landmark_controls:
+            sections.append(("## NAVIGATION CONTROLS",
+                             [f"- ({c.landmark}) {c.describe(labels)}" for c in landmark_controls]))
+        main_links = [a for a in p.links if a.landmark is None and ''.join(a.text).strip()]
+        if main_links:
+            sections.append(("## LINKS", [f"- {_squash(' '.join(a.text), 60)}" for a in main_links]))
+        nav_links = [a for a in p.links if a.landmark is not None and ''.join(a.text).strip()]
+        if nav_links:
+            sections.append(("## NAVIGATION LINKS",
+                             [f"- ({a.landmark}) {_squash(' '.join(a.text), 60)}" for a in nav_links]))
+        text = [_squash(t, 200) for t in p.text if t.strip()]
+        if text:
+            sections.append(("## TEXT", text))
+
+        out = [f"# PAGE: {_squash(''.join(p.title))}"] if ''.join(p.title).strip() else []
+        used = sum(len(line) + 1 for line in out)
+        # Секции идут по убыванию важности: при нехватке бюджета обрезаются последние
+        for title, lines in sections:
+            if used + len(title) + 1 > max_chars:
+                break
+            out.append(title)
+            used += len(title) + 1
+            seen: set[str] = set()
+            for line in lines:
+                if title in _DEDUPED_SECTIONS:
+                    if line in seen:
+                        continue  # Повторяющиеся ссылки (меню в шапке и подвале) — один раз
+                    seen.add(line)
+                if used + len(line) + 1 > max_chars:
+                    return "\n".join(out)
+                out.append(line)
+                used += len(line) + 1
+        return "\n".join(out)
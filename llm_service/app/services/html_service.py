@@ -1,15 +1,68 @@
-import aiohttp
+from __future__ import annotations
+
 import asyncio
-from bs4 import BeautifulSoup
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from app.config import settings
+from app.services.html_distiller import HTMLDistiller
+from app.services.tracing import span
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+@dataclass
+class _CachedPage:
+    content: str
+    etag: str | None
+    last_modified: str | None
 
 
 class HTMLService:
+    """
+    Загрузка и разбор страниц для UI-тестов.
+    Один экземпляр на процесс: общий пул соединений aiohttp и LRU-кэш
+    уже разобранных страниц, который ревалидируется условным GET (ETag/Last-Modified).
+    """
+
+    def __init__(self, session: aiohttp.ClientSession | None = None):
+        self.distiller = HTMLDistiller()
+        self._session = session
+        self._pages: OrderedDict[str, _CachedPage] = OrderedDict()
+
+    @staticmethod
+    def create_session() -> aiohttp.ClientSession:
+        # aiohttp импортируется при первой загрузке страницы, а не на старте сервиса
+        import aiohttp
+
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=settings.HTML_POOL_SIZE, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=settings.HTML_FETCH_TIMEOUT),
+            headers={'User-Agent': 'QA-Bot/1.0'},
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = self.create_session()
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
     @staticmethod
     def _clean_structure(html_content: str) -> str:
-        """Синхронная очистка DOM (CPU-bound операция)."""
+        """
+        Прежняя очистка DOM в плоский текст через BeautifulSoup.
+        В сервисе заменена HTMLDistiller, оставлена как эталон для бенчмарка.
+        """
         if not html_content:
             return ""
 
+        from bs4 import BeautifulSoup
+
         soup = BeautifulSoup(html_content, 'html.parser')
 
         # Удаление мусора
@@ -28,22 +81,64 @@ class HTMLService:
         # Получаем текст, но сохраняем структуру блоков
         return soup.get_text(separator='\n', strip=True)
 
+    @staticmethod
+    async def _read_body(response: aiohttp.ClientResponse) -> str:
+        """Потоковое чтение тела с лимитом HTML_MAX_BODY_BYTES: остаток страницы отбрасывается."""
+        limit = settings.HTML_MAX_BODY_BYTES
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= limit:
+                print(f"⚠️ [HTMLService] Страница больше {limit} байт, читаем только начало")
+                break
+        body = b"".join(chunks)[:limit]
+        return body.decode(response.charset or "utf-8", errors="replace")
+
+    def _remember(self, url: str, page: _CachedPage):
+        self._pages[url] = page
+        self._pages.move_to_end(url)
+        while len(self._pages) > settings.HTML_CACHE_ITEMS:
+            self._pages.popitem(last=False)
+
     async def fetch_page(self, url: str) -> str:
         """Асинхронная загрузка и очистка страницы."""
-        headers = {'User-Agent': 'QA-Bot/1.0'}
         print(f"🌐 [HTMLService] Загрузка: {url}")
 
+        # Страница уже разбиралась: спрашиваем сервер, изменилась ли она
+        cached = self._pages.get(url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, timeout=20) as response:
+            with span("fetch"):
+                async with self.session.get(url, headers=headers) as response:
+                    if response.status == 304 and cached is not None:
+                        self._pages.move_to_end(url)
+                        return cached.content
                     if response.status != 200:
                         print(f"❌ Ошибка статуса: {response.status}")
                         return ""
-                    html_text = await response.text()
+                    html_text = await self._read_body(response)
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
 
-                    # Запускаем очистку в отдельном потоке, чтобы не блочить Event Loop
-                    clean_text = await asyncio.to_thread(self._clean_structure, html_text)
-                    return clean_text
+            # Запускаем разбор в отдельном потоке, чтобы не блочить Event Loop
+            with span("clean"):
+                clean_text = await asyncio.to_thread(
+                    self.distiller.distill, html_text, settings.HTML_MAX_CHARS
+                )
+            # Без валидаторов ревалидировать нечем — такие страницы не кэшируем
+            if etag or last_modified:
+                self._remember(url, _CachedPage(clean_text, etag, last_modified))
+            else:
+                self._pages.pop(url, None)
+            return clean_text
         except Exception as e:
             print(f"❌ Ошибка сети: {e}")
-            return ""
\ No newline at end of file
+            return ""
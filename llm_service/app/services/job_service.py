@@ -0,0 +1,185 @@
+import asyncio
+import contextvars
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Awaitable, Callable
+
+from app.config import settings
+from app.services.scheduler import Client
+from app.services.token_budget import TokenUsage, request_usage
+from app.services.tracing import Trace, current_trace
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+FINISHED = (JobStatus.DONE, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    client: Client | None
+    run: Callable[[], Awaitable[str]] | None
+    # Контекст отправившего запроса: клиент планировщика, эндпоинт для метрик и т.п.
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
+    status: JobStatus = JobStatus.QUEUED
+    usage: TokenUsage = field(default_factory=TokenUsage)
+    result: str | None = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    task: asyncio.Task | None = None
+
+    @property
+    def user_id(self) -> str | None:
+        return self.client.user_id if self.client else None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status.value,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "usage": self.usage.as_dict(),
+        }
+
+
+class JobManager:
+    """
+    Фоновое выполнение долгих генераций: запрос сразу получает id задачи,
+    use case выполняет ограниченный пул воркеров. Результат хранится
+    JOB_RESULT_TTL_SECONDS после завершения и забирается отдельным запросом.
+    Вызовы LLM внутри задачи по-прежнему проходят через планировщик от имени
+    пользователя, отправившего задачу.
+    """
+
+    def __init__(self, workers: int, max_queue: int, result_ttl: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self._jobs: dict[str, Job] = {}
+        self._queue: asyncio.Queue[Job] | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self):
+        # Очередь и задачи создаются уже внутри event loop приложения
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # --- API задач ---
+    def submit(self, kind: str, run: Callable[[], Awaitable[str]], client: Client | None = None) -> Job:
+        if self._queue is None:
+            raise RuntimeError("JobManager is not started")
+        if self._queue.qsize() >= self.max_queue:
+            raise JobQueueFullError("Job queue is full")
+        job = Job(id=uuid.uuid4().hex, kind=kind, client=client, run=run)
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job: Job):
+        if job.status == JobStatus.QUEUED:
+            # Воркер пропустит задачу, когда дойдет до нее
+            self._finish(job, JobStatus.CANCELLED)
+        elif job.status == JobStatus.RUNNING and job.task:
+            job.task.cancel()
+
+    def stats(self) -> dict:
+        by_status = {s.value: 0 for s in JobStatus}
+        for job in self._jobs.values():
+            by_status[job.status.value] += 1
+        return {"workers": self.workers, "queued": self._queue.qsize() if self._queue else 0, "jobs": by_status}
+
+    # --- Воркеры ---
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            if job.status != JobStatus.QUEUED:
+                continue
+            job.task = asyncio.create_task(self._execute(job), context=job.context)
+            try:
+                await job.task
+            except asyncio.CancelledError:
+                # Отмена самой задачи — штатная; отмена воркера (shutdown) — нет
+                if not job.task.cancelled():
+                    raise
+                self._finish(job, JobStatus.CANCELLED)
+
+    async def _execute(self, job: Job):
+        # Задача исполняется в копии контекста отправителя; учет токенов — свой у задачи,
+        # трасса — продолжение трассы отправившего запроса (он уже получил 202)
+        request_usage.set(job.usage)
+        parent = current_trace.get()
+        trace = parent.child() if parent is not None else Trace()
+        current_trace.set(trace)
+        job.status = JobStatus.RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = await job.run()
+        except asyncio.CancelledError:
+            trace.log(job_id=job.id, kind=job.kind, status=JobStatus.CANCELLED.value)
+            raise
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            job.error = str(e)
+            self._finish(job, JobStatus.FAILED)
+            trace.log(job_id=job.id, kind=job.kind, status=job.status.value)
+            return
+        logger.info("Job %s (%s) done, token usage: %s", job.id, job.kind, job.usage.as_dict())
+        self._finish(job, JobStatus.DONE)
+        trace.log(job_id=job.id, kind=job.kind, status=job.status.value)
+
+    def _finish(self, job: Job, status: JobStatus):
+        job.status = status
+        job.finished_at = time.time()
+        job.run = None  # Отпускаем контекст запроса (спецификации, HTML) сразу после завершения
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(min(self.result_ttl, 60))
+            self.purge()
+
+    def purge(self):
+        """Удаляет завершенные задачи, срок хранения результата которых истек."""
+        deadline = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.status in FINISHED and job.finished_at < deadline]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager(
+    workers=settings.JOB_WORKERS,
+    max_queue=settings.JOB_MAX_QUEUE,
+    result_ttl=settings.JOB_RESULT_TTL_SECONDS,
+)
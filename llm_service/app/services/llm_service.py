@@ -1,30 +1,113 @@
-from openai import OpenAI
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, AsyncIterator
 from app.config import settings
+from app.services.token_budget import record_usage
+from app.services.tracing import outgoing_headers, record_span
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 
 class LLMService:
-    def __init__(self):
+    """
+    Обертка над OpenAI-совместимым API.
+    Создается один раз на процесс (в lifespan) и разделяет пул соединений между запросами.
+    Клиент (и тяжелый пакет openai) создается при первом обращении, а не на старте.
+    """
+
+    def __init__(self, client: AsyncOpenAI | None = None):
         if not settings.AI_MODEL_KEY:
             # Можно заменить на warning или оставить ошибку, если это критично
             print("⚠️ WARNING: AI_MODEL_KEY не задан")
 
-        self.client = OpenAI(
-            api_key=settings.AI_MODEL_KEY,
-            base_url=settings.AI_MODEL_URL
-        )
+        self._client = client
         self.model_name = settings.AI_MODEL_NAME
 
-    def send_request(self, prompt: str) -> str:
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    @staticmethod
+    def _create_client() -> AsyncOpenAI:
+        import httpx
+        from openai import AsyncOpenAI
+
+        http_client = httpx.AsyncClient(
+            http2=settings.AI_HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.AI_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AI_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=settings.AI_POOL_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.AI_REQUEST_TIMEOUT, connect=10.0),
+        )
+        return AsyncOpenAI(
+            # Без ключа клиент не создается; локальные vLLM/Ollama принимают любой
+            api_key=settings.AI_MODEL_KEY or "EMPTY",
+            base_url=settings.AI_MODEL_URL,
+            http_client=http_client,
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+
+    @property
+    def sampling_params(self) -> dict:
+        return dict(max_tokens=settings.AI_MAX_TOKENS, temperature=0.4, top_p=0.9)
+
+    def _completion_params(self, prompt: str) -> dict:
+        return dict(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            # traceparent продолжает трассу запроса в upstream LLM
+            extra_headers=outgoing_headers(),
+            **self.sampling_params
+        )
+
+    async def send_request(self, prompt: str) -> tuple[str, str | None]:
+        """Текст ответа и finish_reason ("length" — ответ обрезан по max_tokens)."""
         print(f"🧠 [LLMService] Запрос к {self.model_name}...")
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=8192,
-                temperature=0.4,
-                top_p=0.9
+            response = await self.client.chat.completions.create(**self._completion_params(prompt))
+            usage = response.usage
+            record_usage(usage.prompt_tokens if usage else 0, usage.completion_tokens if usage else 0)
+            choice = response.choices[0]
+            return choice.message.content or "Пустой ответ от модели", choice.finish_reason
+        except Exception as e:
+            print(f"❌ Ошибка LLM: {e}")
+            raise e  # Пробрасываем ошибку выше, чтобы UseCase мог её обработать
+
+    async def stream_request(self, prompt: str) -> AsyncIterator[str]:
+        """Потоковый запрос: отдает текст ответа по мере генерации токенов."""
+        print(f"🧠 [LLMService] Потоковый запрос к {self.model_name}...")
+        try:
+            started = time.perf_counter()
+            stream = await self.client.chat.completions.create(
+                **self._completion_params(prompt),
+                stream=True,
+                # Последний чанк придет с usage (пустой choices)
+                stream_options={"include_usage": True},
             )
-            return response.choices[0].message.content or "Пустой ответ от модели"
+            usage = None
+            first_token = True
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if first_token:
+                        # Время до первого токена (TTFT)
+                        record_span("ttft", started, time.perf_counter() - started)
+                        first_token = False
+                    yield delta
+            record_usage(usage.prompt_tokens if usage else 0, usage.completion_tokens if usage else 0)
         except Exception as e:
             print(f"❌ Ошибка LLM: {e}")
-            raise e  # Пробрасываем ошибку выше, чтобы UseCase мог её обработать
\ No newline at end of file
+            raise e
@@ -0,0 +1,96 @@
+import re
+from dataclasses import dataclass, field
+
+# Разделитель ячеек — `|`, не экранированный обратным слэшем
+_CELL_SPLIT = re.compile(r"(?<!\\)\|")
+_SEPARATOR_CELL = re.compile(r"^:?-{3,}:?$")
+
+
+def split_row(line: str) -> list[str]:
+    """Разбивает строку markdown-таблицы `| a | b |` на ячейки."""
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    return [cell.strip() for cell in _CELL_SPLIT.split(line)]
+
+
+def render_row(cells: list[str]) -> str:
+    return "| " + " | ".join(cells) + " |"
+
+
+def _is_separator(cells: list[str]) -> bool:
+    return bool(cells) and all(_SEPARATOR_CELL.match(c.replace(" ", "")) for c in cells)
+
+
+@dataclass
+class MarkdownTable:
+    """Первая markdown-таблица из текста ответа LLM: заголовок и строки без разделителя."""
+    header: list[str]
+    rows: list[list[str]] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, markdown: str) -> "MarkdownTable | None":
+        header: list[str] | None = None
+        rows: list[list[str]] = []
+        for line in markdown.splitlines():
+            stripped = line.strip()
+            if not stripped.startswith("|"):
+                if rows:
+                    break  # Таблица закончилась
+                header = None  # Одиночная строка с `|` — не таблица
+                continue
+            cells = split_row(stripped)
+            if header is None:
+                header = cells
+            elif _is_separator(cells):
+                continue
+            else:
+                rows.append(cells)
+        if header is None:
+            return None
+        return cls(header=header, rows=rows)
+
+    def column(self, name: str) -> int | None:
+        """Индекс колонки по названию (без учета регистра)."""
+        lowered = name.lower()
+        for i, title in enumerate(self.header):
+            if title.lower() == lowered:
+                return i
+        return None
+
+    def render_header(self) -> str:
+        return render_row(self.header) + "\n" + render_row(["---"] * len(self.header))
+
+    def render(self) -> str:
+        return "\n".join([self.render_header()] + [render_row(r) for r in self.rows])
+
+
+def split_tables(markdown: str) -> list[str | MarkdownTable]:
+    """
+    Документ по порядку: куски текста между таблицами (заголовки разделов, пояснения)
+    и сами таблицы — от двух строк с `|` подряд. Собирается обратно join_tables.
+    """
+    lines = markdown.splitlines()
+    parts: list[str | MarkdownTable] = []
+    start = i = 0
+    while i < len(lines):
+        if lines[i].strip().startswith("|") and i + 1 < len(lines) and lines[i + 1].strip().startswith("|"):
+            end = i
+            while end < len(lines) and lines[end].strip().startswith("|"):
+                end += 1
+            if i > start:
+                parts.append("\n".join(lines[start:i]))
+            parts.append(MarkdownTable.parse("\n".join(lines[i:end])))
+            start = i = end
+        else:
+            i += 1
+    if start < len(lines):
+        parts.append("\n".join(lines[start:]))
+    return parts
+
+
+def join_tables(parts: list[str | MarkdownTable]) -> str:
+    """Обратная к split_tables сборка документа."""
+    return "\n".join(part if isinstance(part, str) else part.render() for part in parts)
@@ -0,0 +1,93 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.services.tracing import record_span
+
+# Длительности от десятков миллисекунд (кэш) до минут (генерация кода)
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+# Шаблон пути эндпоинта, который сейчас обслуживается (выставляется при допуске запроса)
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="unknown")
+
+REQUEST_LATENCY = Histogram(
+    "llm_service_request_duration_seconds",
+    "Полное время обработки HTTP-запроса (до последнего байта ответа)",
+    ["endpoint", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge("llm_service_requests_in_flight", "HTTP-запросы в обработке")
+STAGE_LATENCY = Histogram(
+    "llm_service_stage_duration_seconds",
+    "Время этапа обработки: preprocess (загрузка/очистка HTML, разбор спецификации), "
+    "prompt (сборка промпта), queue (ожидание слота планировщика), llm (вызов модели), serialize",
+    ["endpoint", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter("llm_service_llm_tokens_total", "Токены вызовов upstream LLM", ["endpoint", "kind"])
+LLM_CALLS = Counter(
+    "llm_service_llm_calls_total",
+    "Ответы LLM по источнику: upstream, cache или coalesced (склеен с одинаковым запросом)",
+    ["endpoint", "source"],
+)
+SCHEDULER_QUEUE = Gauge("llm_service_scheduler_queue_depth", "Вызовы LLM в очереди планировщика")
+SCHEDULER_IN_FLIGHT = Gauge("llm_service_scheduler_in_flight", "Вызовы LLM, занявшие слот планировщика")
+JOB_QUEUE = Gauge("llm_service_job_queue_depth", "Фоновые задачи, ожидающие воркера")
+
+
+def observe_stage(stage: str, seconds: float):
+    """Этап попадает и в гистограмму, и в трассу текущего запроса (Server-Timing)."""
+    STAGE_LATENCY.labels(current_endpoint.get(), stage).observe(seconds)
+    record_span(stage, time.perf_counter() - seconds, seconds)
+
+
+@contextmanager
+def track_stage(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def observe_llm_call(source: str, prompt_tokens: int = 0, completion_tokens: int = 0):
+    endpoint = current_endpoint.get()
+    LLM_CALLS.labels(endpoint, source).inc()
+    if prompt_tokens:
+        LLM_TOKENS.labels(endpoint, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(endpoint, "completion").inc(completion_tokens)
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: время запроса до отправки последнего байта (в т.ч. SSE-потока)
+    и число запросов в обработке. Эндпоинт — шаблон пути маршрута, а не сырой URL.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            REQUEST_LATENCY.labels(endpoint, scope["method"], str(status)).observe(time.perf_counter() - started)
@@ -1,10 +1,15 @@
-import aiohttp
-import yaml
 import json
 import logging
+from typing import Any, Callable
 
 logger = logging.getLogger(__name__)
 
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+
+# Верхнеуровневые поля, которые нужны каждому фрагменту спецификации
+_SKELETON_KEYS = ("openapi", "swagger", "info", "servers", "host", "basePath", "schemes",
+                  "security", "securityDefinitions")
+
 
 class OpenAPIService:
     async def fetch_spec(self, url: str) -> str:
@@ -16,6 +21,9 @@ class OpenAPIService:
         """
         Парсит байтовый контент файла (JSON/YAML) в строку.
         """
+        # PyYAML нужен только при загрузке спецификации — не тянем его на старте сервиса
+        import yaml
+
         try:
             # 1. Декодируем байты в строку
             text_content = file_content.decode('utf-8')
@@ -41,4 +49,83 @@ class OpenAPIService:
             return json.dumps(data, ensure_ascii=False)
 
         except (json.JSONDecodeError, yaml.YAMLError) as e:
-            return f"Error parsing file: {str(e)}"
\ No newline at end of file
+            return f"Error parsing file: {str(e)}"
+
+    def resolve_refs(self, node: Any, root: dict, _stack: tuple[str, ...] = ()) -> Any:
+        """
+        Подставляет локальные `$ref` (`#/components/...`, `#/definitions/...`).
+        Рекурсивные ссылки остаются как есть, чтобы не уйти в бесконечный цикл.
+        """
+        if isinstance(node, list):
+            return [self.resolve_refs(item, root, _stack) for item in node]
+        if not isinstance(node, dict):
+            return node
+
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref.startswith("#/"):
+            if ref in _stack:
+                return {"$ref": ref}
+            target = self._resolve_pointer(root, ref)
+            if target is None:
+                logger.warning("Unresolvable $ref: %s", ref)
+                return node
+            return self.resolve_refs(target, root, _stack + (ref,))
+
+        return {key: self.resolve_refs(value, root, _stack) for key, value in node.items()}
+
+    @staticmethod
+    def _resolve_pointer(root: dict, ref: str) -> Any:
+        node: Any = root
+        for part in ref[2:].split("/"):
+            part = part.replace("~1", "/").replace("~0", "~")
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def split_operations(self, spec: dict, max_size: int, measure: Callable[[str], int] = len) -> list[str]:
+        """
+        Делит спецификацию на самодостаточные фрагменты (JSON-строки) размером до max_size,
+        где размер считает measure (по умолчанию — символы, можно передать счетчик токенов).
+        Каждая операция берется с подставленными `$ref`, операции группируются по тегу,
+        чтобы связанные эндпоинты попадали в один фрагмент.
+        Операция, которая сама больше бюджета, уходит отдельным фрагментом.
+        """
+        skeleton = {k: spec[k] for k in _SKELETON_KEYS if k in spec}
+        components = spec.get("components")
+        if isinstance(components, dict) and "securitySchemes" in components:
+            skeleton["components"] = {"securitySchemes": components["securitySchemes"]}
+        budget = max(max_size - measure(json.dumps(skeleton, ensure_ascii=False)), 1)
+
+        operations = []
+        for path, path_item in (spec.get("paths") or {}).items():
+            if not isinstance(path_item, dict):
+                continue
+            shared_params = path_item.get("parameters", [])
+            for method in HTTP_METHODS:
+                operation = path_item.get(method)
+                if not isinstance(operation, dict):
+                    continue
+                if shared_params:
+                    operation = {**operation, "parameters": shared_params + operation.get("parameters", [])}
+                resolved = self.resolve_refs(operation, spec)
+                tag = (operation.get("tags") or [path.strip("/").split("/")[0]])[0]
+                size = measure(json.dumps({path: {method: resolved}}, ensure_ascii=False))
+                operations.append((tag, path, method, resolved, size))
+
+        # Стабильная сортировка по тегу сохраняет исходный порядок путей внутри тега
+        operations.sort(key=lambda op: op[0])
+
+        chunks: list[dict] = []
+        current: dict[str, dict] = {}
+        current_size = 0
+        for _, path, method, resolved, size in operations:
+            if current and current_size + size > budget:
+                chunks.append(current)
+                current, current_size = {}, 0
+            current.setdefault(path, {})[method] = resolved
+            current_size += size
+        if current:
+            chunks.append(current)
+
+        return [json.dumps({**skeleton, "paths": paths}, ensure_ascii=False) for paths in chunks]
@@ -0,0 +1,150 @@
+import logging
+import string
+import time
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any
+
+from app.config import settings
+from app.domain.models import (
+    UiTestContext, ApiTestContext, RedactContext,
+    AutoTestContext, OptimizationContext, ReviewContext
+)
+
+logger = logging.getLogger(__name__)
+
+# Шаблон -> (контекст, дополнительные поля, которые use case добавляет сам)
+TEMPLATE_CONTEXTS: dict[str, tuple[type, set[str]]] = {
+    "prompt_template.txt": (UiTestContext, {"html_content"}),
+    "prompt_api_test.txt": (ApiTestContext, set()),
+    "prompt_redactor.txt": (RedactContext, set()),
+    "prompt_redactor_patch.txt": (RedactContext, {"table_rows", "total_rows"}),
+    "prompt_codegen_pytest.txt": (AutoTestContext, set()),
+    "prompt_optimization.txt": (OptimizationContext, {"duplicates"}),
+    "prompt_review.txt": (ReviewContext, set()),
+    "prompt_review_chunk.txt": (ReviewContext, {"local_findings"}),
+}
+
+_CONVERTERS = {None: lambda v: v, "s": str, "r": repr, "a": ascii}
+
+
+class TemplateError(Exception):
+    """Шаблон промпта не найден или не соответствует своему контексту."""
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """Предразобранный шаблон: список (литерал, поле, формат, конверсия)."""
+    name: str
+    mtime: float
+    parts: tuple[tuple[str, str | None, str, str | None], ...]
+    placeholders: frozenset[str]
+
+    @classmethod
+    def compile(cls, name: str, source: str, mtime: float) -> "PromptTemplate":
+        try:
+            parsed = list(string.Formatter().parse(source))
+        except ValueError as e:
+            raise TemplateError(f"{name}: {e}") from e
+
+        parts = []
+        for literal, field, spec, conversion in parsed:
+            if field is not None and (not field.isidentifier()):
+                raise TemplateError(f"{name}: unsupported placeholder {{{field}}}")
+            parts.append((literal, field, spec or "", conversion))
+        placeholders = frozenset(p[1] for p in parts if p[1] is not None)
+        return cls(name=name, mtime=mtime, parts=tuple(parts), placeholders=placeholders)
+
+    def render(self, data: dict[str, Any]) -> str:
+        """Аналог str.format без повторного разбора шаблона. KeyError — если поля нет."""
+        out = []
+        for literal, field, spec, conversion in self.parts:
+            out.append(literal)
+            if field is not None:
+                out.append(format(_CONVERTERS[conversion](data[field]), spec))
+        return "".join(out)
+
+
+class PromptRegistry:
+    """
+    Реестр шаблонов промптов из resources/.
+    Все prompt_*.txt загружаются и проверяются на старте; файл перечитывается
+    только при изменении mtime (проверка не чаще reload_interval секунд).
+    """
+
+    def __init__(self, resources_dir: Path, reload_interval: float):
+        self.resources_dir = resources_dir
+        self.reload_interval = reload_interval
+        self._templates: dict[str, PromptTemplate] = {}
+        self._checked_at: dict[str, float] = {}
+
+    def load_all(self):
+        """Загружает все шаблоны. Ошибка в любом из них прерывает старт сервиса."""
+        for path in sorted(self.resources_dir.glob("prompt_*.txt")):
+            self._templates[path.name] = self._load(path)
+            self._checked_at[path.name] = time.monotonic()
+        missing = set(TEMPLATE_CONTEXTS) - set(self._templates)
+        if missing:
+            raise TemplateError(f"Templates not found: {', '.join(sorted(missing))}")
+        logger.info("Loaded %d prompt templates", len(self._templates))
+
+    def get(self, name: str) -> PromptTemplate:
+        template = self._templates.get(name)
+        if template is None:
+            path = self.resources_dir / name
+            if not path.exists():
+                raise FileNotFoundError(f"Template not found: {path}")
+            template = self._templates[name] = self._load(path)
+            self._checked_at[name] = time.monotonic()
+            return template
+
+        now = time.monotonic()
+        if now - self._checked_at.get(name, 0.0) >= self.reload_interval:
+            self._checked_at[name] = now
+            template = self._reload_if_changed(template)
+        return template
+
+    def _reload_if_changed(self, template: PromptTemplate) -> PromptTemplate:
+        path = self.resources_dir / template.name
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            logger.error("Template %s was removed, keeping cached version", template.name)
+            return template
+        if mtime == template.mtime:
+            return template
+
+        try:
+            fresh = self._load(path)
+        except TemplateError as e:
+            # Сломанная правка не должна ронять запросы — работаем на прежней версии
+            logger.error("Template reload failed, keeping previous version: %s", e)
+            return template
+        logger.info("Template %s reloaded", template.name)
+        self._templates[template.name] = fresh
+        return fresh
+
+    @staticmethod
+    def _load(path: Path) -> PromptTemplate:
+        mtime = path.stat().st_mtime
+        source = path.read_text(encoding="utf-8")
+        template = PromptTemplate.compile(path.name, source, mtime)
+        PromptRegistry._validate(template)
+        return template
+
+    @staticmethod
+    def _validate(template: PromptTemplate):
+        schema = TEMPLATE_CONTEXTS.get(template.name)
+        if schema is None:
+            logger.warning("Template %s has no context mapping, placeholders not checked", template.name)
+            return
+        context_cls, extra = schema
+        allowed = {f.name for f in fields(context_cls)} | extra
+        unknown = template.placeholders - allowed
+        if unknown:
+            raise TemplateError(
+                f"{template.name}: placeholders {sorted(unknown)} are not fields of {context_cls.__name__}"
+            )
+
+
+prompt_registry = PromptRegistry(settings.RESOURCES_DIR, settings.PROMPT_RELOAD_INTERVAL)
@@ -0,0 +1,188 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import AsyncIterator
+
+from app.config import settings
+
+
+class Priority(IntEnum):
+    """Класс эндпоинта: чем меньше значение, тем раньше обслуживается."""
+    INTERACTIVE = 0  # Правки и ревью — пользователь ждет ответ в чате
+    ANALYSIS = 1     # Оптимизация тест-планов
+    GENERATION = 2   # Тяжелые генерации планов и кода
+
+
+@dataclass(frozen=True)
+class Client:
+    user_id: str
+    priority: Priority
+
+
+# Кто и с каким приоритетом выполняет текущий запрос; выставляется при допуске в хендлере
+current_client: ContextVar[Client | None] = ContextVar("current_client", default=None)
+
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after: int, reason: str):
+        self.retry_after = retry_after
+        super().__init__(reason)
+
+
+class FairScheduler:
+    """
+    Ограничивает число одновременных вызовов upstream LLM.
+    Ожидающие вызовы стоят в очередях по пользователям: внутри класса приоритета
+    слоты раздаются по кругу (round-robin), поэтому один пользователь с пачкой
+    генераций не блокирует остальных. Переполнение очередей отсекается на входе (429).
+    """
+
+    def __init__(self, max_in_flight: int, max_user_in_flight: int, max_queue: int, max_user_queue: int):
+        self.max_in_flight = max_in_flight
+        self.max_user_in_flight = max_user_in_flight
+        self.max_queue = max_queue
+        self.max_user_queue = max_user_queue
+
+        self.in_flight = 0
+        self._user_in_flight: dict[str, int] = {}
+        # Допущенные и еще не завершенные запросы по пользователям
+        self._admitted: dict[str, int] = {}
+        # priority -> user -> очередь ожидающих; порядок ключей — порядок обхода round-robin
+        self._queues: dict[Priority, OrderedDict[str, deque[asyncio.Future]]] = {p: OrderedDict() for p in Priority}
+        self._waits: deque[float] = deque(maxlen=500)
+        self._service_time = 10.0  # EMA длительности вызова, сек — для оценки Retry-After
+        self.rejected = 0
+
+    # --- Допуск запроса ---
+    def queued(self, user_id: str | None = None) -> int:
+        if user_id is None:
+            return sum(len(q) for users in self._queues.values() for q in users.values())
+        return sum(len(users.get(user_id, ())) for users in self._queues.values())
+
+    def admit(self, client: Client):
+        """
+        Допускает запрос до начала работы; при переполнении — QueueFullError.
+        Допущенный запрос нужно завершить вызовом release().
+        """
+        if sum(self._admitted.values()) >= self.max_queue:
+            reason = "LLM queue is full"
+        elif self._admitted.get(client.user_id, 0) >= self.max_user_queue:
+            reason = "Too many concurrent requests for this user"
+        else:
+            self._admitted[client.user_id] = self._admitted.get(client.user_id, 0) + 1
+            return
+        self.rejected += 1
+        raise QueueFullError(self._retry_after(), reason)
+
+    def release(self, client: Client):
+        left = self._admitted.get(client.user_id, 1) - 1
+        if left:
+            self._admitted[client.user_id] = left
+        else:
+            self._admitted.pop(client.user_id, None)
+
+    def _retry_after(self) -> int:
+        waves = sum(self._admitted.values()) / max(self.max_in_flight, 1)
+        return int(min(max(waves * self._service_time, 1), 120))
+
+    # --- Слоты ---
+    def _can_start(self, user_id: str) -> bool:
+        return (self.in_flight < self.max_in_flight
+                and self._user_in_flight.get(user_id, 0) < self.max_user_in_flight)
+
+    def _start(self, user_id: str):
+        self.in_flight += 1
+        self._user_in_flight[user_id] = self._user_in_flight.get(user_id, 0) + 1
+
+    def _finish(self, user_id: str, started: float):
+        self.in_flight -= 1
+        left = self._user_in_flight.get(user_id, 1) - 1
+        if left:
+            self._user_in_flight[user_id] = left
+        else:
+            self._user_in_flight.pop(user_id, None)
+        self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started)
+        self._dispatch()
+
+    def _dispatch(self):
+        """Отдает освободившиеся слоты: сначала старший приоритет, внутри — по кругу пользователей."""
+        for priority in Priority:
+            users = self._queues[priority]
+            for user_id in list(users):
+                if self.in_flight >= self.max_in_flight:
+                    return
+                queue = users[user_id]
+                while queue and queue[0].done():
+                    queue.popleft()  # Отмененные ожидания
+                if not queue:
+                    del users[user_id]
+                    continue
+                if not self._can_start(user_id):
+                    continue
+                self._start(user_id)
+                queue.popleft().set_result(None)
+                # Пользователь обслужен — в конец круга
+                users.move_to_end(user_id)
+                if not queue:
+                    del users[user_id]
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Слот на один вызов upstream для текущего клиента (см. current_client)."""
+        client = current_client.get() or Client(user_id="anonymous", priority=Priority.GENERATION)
+        enqueued = time.monotonic()
+        has_waiters = any(self._queues[p] for p in Priority)
+        if self._can_start(client.user_id) and not has_waiters:
+            self._start(client.user_id)
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._queues[client.priority].setdefault(client.user_id, deque()).append(waiter)
+            self._dispatch()
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Слот уже выдан, но ждать его некому — возвращаем
+                    self._finish(client.user_id, time.monotonic())
+                raise
+
+        started = time.monotonic()
+        self._waits.append(started - enqueued)
+        try:
+            yield
+        finally:
+            self._finish(client.user_id, started)
+
+    def _wait_percentile(self, q: float) -> float:
+        if not self._waits:
+            return 0.0
+        waits = sorted(self._waits)
+        return round(waits[min(int(q * len(waits)), len(waits) - 1)] * 1000, 1)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": self.queued(),
+            "admitted_requests": sum(self._admitted.values()),
+            "queued_by_priority": {p.name.lower(): sum(len(q) for q in self._queues[p].values()) for p in Priority},
+            "queued_by_user": {
+                user: self.queued(user)
+                for user in {u for users in self._queues.values() for u in users}
+            },
+            "wait_ms_p50": self._wait_percentile(0.5),
+            "wait_ms_p95": self._wait_percentile(0.95),
+            "rejected": self.rejected,
+        }
+
+
+scheduler = FairScheduler(
+    max_in_flight=settings.SCHED_MAX_IN_FLIGHT,
+    max_user_in_flight=settings.SCHED_MAX_USER_IN_FLIGHT,
+    max_queue=settings.SCHED_MAX_QUEUE,
+    max_user_queue=settings.SCHED_MAX_USER_QUEUE,
+)
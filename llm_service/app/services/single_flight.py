@@ -0,0 +1,104 @@
+import asyncio
+from typing import AsyncIterator, Callable
+
+
+class _Flight:
+    """
+    Один вызов LLM, на который подписаны все одинаковые запросы.
+    Фрагменты ответа копятся в буфере: подписчик, пришедший позже,
+    сначала получает уже сгенерированное, затем — новые фрагменты.
+    Когда уходит последний подписчик (клиент отключился, задача отменена),
+    вызов отменяется, чтобы не тратить токены на ответ, который никто не ждет.
+    """
+
+    def __init__(self, source_factory: Callable[["_Flight"], AsyncIterator[str]]):
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: BaseException | None = None
+        # Почему модель закончила ответ ("stop", "length"); выставляет источник, если знает
+        self.finish_reason: str | None = None
+        # Все подписчики ушли до конца ответа: вызов отменен, новым запросам он не подходит
+        self.abandoned = False
+        self._subscribers = 0
+        self._changed = asyncio.Event()
+        # Вызов живет отдельной задачей: отключение одного клиента не обрывает остальных
+        self.task = asyncio.create_task(self._pump(source_factory(self)))
+
+    async def _pump(self, source: AsyncIterator[str]):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        position = 0
+        self._subscribers += 1
+        try:
+            while True:
+                while position < len(self.chunks):
+                    yield self.chunks[position]
+                    position += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self._subscribers -= 1
+            if not self._subscribers and not self.done:
+                self.abandoned = True
+                self.task.cancel()
+
+    async def result(self) -> str:
+        return "".join([chunk async for chunk in self.subscribe()])
+
+
+class SingleFlight:
+    """
+    Склеивает одновременные одинаковые запросы к LLM (тот же промпт и параметры)
+    в один вызов upstream. Работает и для потоковых, и для обычных ответов.
+    """
+
+    def __init__(self):
+        self._flights: dict[str, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def join(self, key: str, source_factory: Callable[[_Flight], AsyncIterator[str]]) -> tuple[_Flight, bool]:
+        """
+        Возвращает вызов для ключа и флаг: True — подключились к уже идущему.
+        source_factory получает сам вызов, чтобы записать в него finish_reason.
+        """
+        flight = self._flights.get(key)
+        if flight is not None and not flight.done and not flight.abandoned:
+            self.coalesced += 1
+            return flight, True
+
+        flight = _Flight(source_factory)
+        self._flights[key] = flight
+        flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        self.leaders += 1
+        return flight, False
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+single_flight = SingleFlight()
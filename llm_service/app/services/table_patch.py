@@ -0,0 +1,171 @@
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from app.services.markdown_table import MarkdownTable
+
+_WORD = re.compile(r"\w+")
+# Префикс слова вместо стемминга: «пароль», «пароля», «паролем» совпадают
+_STEM_LENGTH = 5
+
+# Правка добавляет строки: модели нужны образцы формата и последняя строка, а не строки «про нее»
+_INSERT_EDIT = re.compile(r"\b(?:добав|дополн|допиш|созда|add\b|insert|append|create)", re.IGNORECASE)
+# Правка меняет структуру таблицы — операциями над строками она не выражается
+_STRUCTURE_EDIT = re.compile(r"\b(?:колонк|столб|column)", re.IGNORECASE)
+
+ROW_COLUMN = "#"
+OP_COLUMN = "op"
+OPERATIONS = ("insert", "update", "delete")
+
+
+@dataclass
+class TableDocument:
+    """Документ с markdown-таблицей: текст до таблицы, сама таблица и текст после нее."""
+    before: str
+    table: MarkdownTable
+    after: str
+
+    @classmethod
+    def parse(cls, markdown: str) -> "TableDocument | None":
+        lines = markdown.splitlines()
+        start = next((i for i in range(len(lines) - 1)
+                      if lines[i].strip().startswith("|") and lines[i + 1].strip().startswith("|")), None)
+        if start is None:
+            return None
+        end = start
+        while end < len(lines) and lines[end].strip().startswith("|"):
+            end += 1
+        table = MarkdownTable.parse("\n".join(lines[start:end]))
+        return cls("\n".join(lines[:start]), table, "\n".join(lines[end:]))
+
+    def render(self) -> str:
+        # Пустые строки вокруг таблицы сохраняются: они остались в before/after
+        return "\n".join(part for part in (self.before, self.table.render(), self.after) if part)
+
+
+def _terms(text: str) -> set[str]:
+    return {word[:_STEM_LENGTH] for word in _WORD.findall(text.lower()) if len(word) >= 3}
+
+
+def edit_kind(instruction: str) -> str:
+    """Вид правки по инструкции: "structure" (колонки), "insert" (новые строки) или "rows"."""
+    if _STRUCTURE_EDIT.search(instruction):
+        return "structure"
+    if _INSERT_EDIT.search(instruction):
+        return "insert"
+    return "rows"
+
+
+def select_rows(table: MarkdownTable, instruction: str, limit: int, examples: int = 2) -> tuple[list[int], int]:
+    """
+    Номера строк (с 0), которые нужны модели для правки: упомянутые в ней по ID и самые
+    близкие к ее тексту по словам (с весом idf), плюс первые строки как образец формата
+    и последняя — чтобы новые ID продолжали нумерацию. Второе значение — сколько строк
+    вообще связано с правкой: названных в ней по ID, а если таких нет — похожих по словам
+    (0 — правка не про конкретные строки).
+    """
+    total = len(table.rows)
+    id_column = table.column("ID")
+    lowered = instruction.lower()
+    query = _terms(instruction)
+    row_terms = [_terms(" ".join(row)) for row in table.rows]
+    document_frequency = Counter(term for terms in row_terms for term in terms)
+
+    scores: dict[int, float] = {}
+    mentioned = 0
+    for index, terms in enumerate(row_terms):
+        # Слова, которые есть во всех строках («открыть», «проверка»), веса не дают
+        score = sum(math.log(total / document_frequency[term]) for term in query & terms)
+        row = table.rows[index]
+        if id_column is not None and id_column < len(row) and row[id_column]:
+            if re.search(rf"(?<!\w){re.escape(row[id_column].lower())}(?!\w)", lowered):
+                score += 1000
+                mentioned += 1
+        if score > 0:
+            scores[index] = score
+
+    picked = set(sorted(scores, key=scores.get, reverse=True)[:limit])
+    picked.update(range(min(examples, total)))
+    if total:
+        picked.add(total - 1)
+    # Новый текст из правки («исправь результат TC-7 на ...») похож на многие строки, но правка — про TC-7
+    return sorted(picked), mentioned or len(scores)
+
+
+def render_excerpt(table: MarkdownTable, indices: list[int]) -> str:
+    """Заголовок и выбранные строки с колонкой `#` — номером строки в полной таблице (с 1)."""
+    excerpt = MarkdownTable(header=[ROW_COLUMN] + table.header)
+    excerpt.rows = [[str(index + 1)] + table.rows[index] for index in indices]
+    return excerpt.render()
+
+
+@dataclass
+class RowOperation:
+    op: str
+    row: int | None  # insert — после какой строки (0 — в начало), update/delete — какую строку
+    cells: list[str]
+
+
+def parse_operations(markdown: str, header: list[str]) -> list[RowOperation] | None:
+    """
+    Операции из ответа модели — таблицы с колонками `op`, `#` и колонками исходной таблицы.
+    Колонки сопоставляются по названию; None, если ответ не похож на таблицу операций
+    или в нем есть колонки, которых нет в исходной таблице (правка меняет структуру).
+    """
+    answer = MarkdownTable.parse(markdown)
+    if answer is None:
+        return None
+    op_column, row_column = answer.column(OP_COLUMN), answer.column(ROW_COLUMN)
+    if op_column is None or row_column is None:
+        return None
+    known = {name.lower() for name in header} | {OP_COLUMN, ROW_COLUMN}
+    if any(title.lower() not in known for title in answer.header if title):
+        return None
+    positions = [answer.column(name) for name in header]
+
+    operations = []
+    for cells in answer.rows:
+        def cell(position: int | None) -> str:
+            return cells[position] if position is not None and position < len(cells) else ""
+
+        op = cell(op_column).lower()
+        if op not in OPERATIONS:
+            continue
+        row = cell(row_column).lstrip("#")
+        operations.append(RowOperation(op, int(row) if row.isdigit() else None, [cell(p) for p in positions]))
+    return operations
+
+
+def apply_operations(table: MarkdownTable, operations: list[RowOperation]) -> tuple[MarkdownTable, int]:
+    """
+    Применяет операции к копии таблицы; номера строк — по исходной таблице.
+    В update пустые ячейки оставляют прежнее значение. Возвращает таблицу и число
+    пропущенных операций (строки с таким номером нет).
+    """
+    total = len(table.rows)
+    updates: dict[int, list[str]] = {}
+    deletes: set[int] = set()
+    inserts: dict[int, list[list[str]]] = defaultdict(list)
+    skipped = 0
+    for operation in operations:
+        if operation.op == "insert":
+            after = operation.row if operation.row is not None and operation.row <= total else total
+            inserts[after].append(operation.cells)
+        elif operation.row is None or not 1 <= operation.row <= total:
+            skipped += 1
+        elif operation.op == "delete":
+            deletes.add(operation.row)
+        else:
+            original = table.rows[operation.row - 1]
+            updates[operation.row] = [
+                new or (original[i] if i < len(original) else "") for i, new in enumerate(operation.cells)
+            ]
+
+    rows = list(inserts[0])
+    for number, row in enumerate(table.rows, start=1):
+        if number not in deletes:
+            rows.append(updates.get(number, row))
+        rows.extend(inserts[number])
+    return MarkdownTable(header=list(table.header), rows=rows), skipped
+
@@ -0,0 +1,208 @@
+import logging
+import math
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from typing import Any
+
+from app.config import settings
+from app.services.metrics import observe_llm_call
+from app.services.prompt_registry import PromptTemplate
+
+logger = logging.getLogger(__name__)
+
+_TRUNCATION_MARK = "\n…[обрезано по лимиту контекста]"
+
+
+@dataclass
+class TokenUsage:
+    """Токены, потраченные на один входящий запрос (сумма по всем вызовам LLM)."""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    llm_calls: int = 0
+    cached_calls: int = 0
+    coalesced_calls: int = 0
+
+    def merge(self, other: "TokenUsage"):
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.llm_calls += other.llm_calls
+        self.cached_calls += other.cached_calls
+        self.coalesced_calls += other.coalesced_calls
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+# Учет токенов текущего запроса; выставляется в хендлере, пополняется в LLMService
+request_usage: ContextVar[TokenUsage | None] = ContextVar("request_usage", default=None)
+
+
+def record_usage(prompt_tokens: int = 0, completion_tokens: int = 0, cached: bool = False, coalesced: bool = False):
+    observe_llm_call(
+        "cache" if cached else "coalesced" if coalesced else "upstream",
+        prompt_tokens,
+        completion_tokens,
+    )
+    usage = request_usage.get()
+    if usage is None:
+        return
+    if cached:
+        usage.cached_calls += 1
+        return
+    if coalesced:
+        # Токены учтены у запроса, который реально вызвал модель
+        usage.coalesced_calls += 1
+        return
+    usage.llm_calls += 1
+    usage.prompt_tokens += prompt_tokens
+    usage.completion_tokens += completion_tokens
+
+
+class TokenCounter:
+    """
+    Подсчет токенов для AI_MODEL_NAME.
+    Если установлен пакет `tokenizers` и задан AI_TOKENIZER (путь к tokenizer.json
+    или id репозитория HF), используется настоящий токенизатор модели.
+    Иначе — консервативная оценка по символам (с запасом в сторону завышения).
+    """
+
+    # Символов на токен для BPE-словаря Qwen: латиница/код и кириллица/прочее
+    ASCII_CHARS_PER_TOKEN = 3.2
+    OTHER_CHARS_PER_TOKEN = 2.2
+
+    def __init__(self, tokenizer_name: str):
+        self.tokenizer_name = tokenizer_name
+        self._tokenizer = None
+        self._loaded = False
+
+    def _get_tokenizer(self):
+        if self._loaded:
+            return self._tokenizer
+        self._loaded = True
+        if not self.tokenizer_name:
+            return None
+        try:
+            from tokenizers import Tokenizer
+        except ImportError:
+            logger.warning("Package 'tokenizers' is not installed, token counts are estimated")
+            return None
+        try:
+            if self.tokenizer_name.endswith(".json"):
+                self._tokenizer = Tokenizer.from_file(self.tokenizer_name)
+            else:
+                self._tokenizer = Tokenizer.from_pretrained(self.tokenizer_name)
+        except Exception as e:
+            logger.warning("Tokenizer %s is unavailable, token counts are estimated: %s", self.tokenizer_name, e)
+        return self._tokenizer
+
+    def load(self):
+        """Загружает токенизатор заранее (на старте), чтобы не платить за это в первом запросе."""
+        self._get_tokenizer()
+
+    @property
+    def exact(self) -> bool:
+        return self._get_tokenizer() is not None
+
+    def _char_cost(self, char: str) -> float:
+        return 1 / self.ASCII_CHARS_PER_TOKEN if char.isascii() else 1 / self.OTHER_CHARS_PER_TOKEN
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        tokenizer = self._get_tokenizer()
+        if tokenizer is not None:
+            return len(tokenizer.encode(text, add_special_tokens=False).ids)
+        ascii_chars = sum(1 for c in text if c.isascii())
+        other_chars = len(text) - ascii_chars
+        return math.ceil(ascii_chars / self.ASCII_CHARS_PER_TOKEN + other_chars / self.OTHER_CHARS_PER_TOKEN)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Обрезает текст до max_tokens (с учетом пометки об обрезке)."""
+        if self.count(text) <= max_tokens:
+            return text
+        limit = max(max_tokens - self.count(_TRUNCATION_MARK), 0)
+
+        tokenizer = self._get_tokenizer()
+        if tokenizer is not None:
+            ids = tokenizer.encode(text, add_special_tokens=False).ids[:limit]
+            return tokenizer.decode(ids) + _TRUNCATION_MARK
+
+        cost = 0.0
+        for i, char in enumerate(text):
+            cost += self._char_cost(char)
+            if cost > limit:
+                return text[:i] + _TRUNCATION_MARK
+        return text
+
+
+class PromptBudget:
+    """
+    Делит контекстное окно модели между шаблоном, полями контекста и
+    зарезервированными токенами ответа. Поля, которые помещаются в свою долю,
+    идут целиком; освободившееся место перераспределяется между остальными
+    пропорционально весам (weighted max-min fairness), крупные поля обрезаются.
+    """
+
+    def __init__(self, counter: TokenCounter, context_window: int, reserved_output: int, safety_margin: int):
+        self.counter = counter
+        self.context_window = context_window
+        self.reserved_output = reserved_output
+        self.safety_margin = safety_margin
+        self._template_tokens: dict[tuple[str, float], int] = {}
+
+    def template_tokens(self, template: PromptTemplate) -> int:
+        key = (template.name, template.mtime)
+        if key not in self._template_tokens:
+            literal = "".join(part[0] for part in template.parts)
+            self._template_tokens[key] = self.counter.count(literal)
+        return self._template_tokens[key]
+
+    def available(self, template: PromptTemplate) -> int:
+        """Сколько токенов остается на все поля контекста вместе."""
+        return max(
+            self.context_window - self.reserved_output - self.safety_margin - self.template_tokens(template),
+            0,
+        )
+
+    def field_budget(self, template: PromptTemplate, data: dict[str, Any], field: str) -> int:
+        """Бюджет одного поля, если все остальные поля идут целиком."""
+        others = sum(self.counter.count(str(data.get(name, ""))) for name in template.placeholders if name != field)
+        return max(self.available(template) - others, 0)
+
+    def fit(self, template: PromptTemplate, data: dict[str, Any], weights: dict[str, float]) -> dict[str, Any]:
+        sizes = {name: self.counter.count(str(data.get(name, ""))) for name in template.placeholders}
+        remaining = self.available(template)
+        if sum(sizes.values()) <= remaining:
+            return data
+
+        allocation: dict[str, int] = {}
+        pending = set(sizes)
+        while pending:
+            total_weight = sum(weights.get(name, 1.0) for name in pending)
+            fitting = [name for name in pending
+                       if sizes[name] <= remaining * weights.get(name, 1.0) / total_weight]
+            if not fitting:
+                for name in pending:
+                    allocation[name] = int(remaining * weights.get(name, 1.0) / total_weight)
+                break
+            for name in fitting:
+                allocation[name] = sizes[name]
+                remaining -= sizes[name]
+                pending.remove(name)
+
+        fitted = dict(data)
+        for name, tokens in allocation.items():
+            if tokens < sizes[name]:
+                logger.warning("%s: field '%s' truncated from %d to %d tokens",
+                               template.name, name, sizes[name], tokens)
+                fitted[name] = self.counter.truncate(str(data.get(name, "")), tokens)
+        return fitted
+
+
+token_counter = TokenCounter(settings.AI_TOKENIZER)
+prompt_budget = PromptBudget(
+    token_counter,
+    context_window=settings.AI_CONTEXT_WINDOW,
+    reserved_output=settings.AI_MAX_TOKENS,
+    safety_margin=settings.AI_CONTEXT_SAFETY_MARGIN,
+)
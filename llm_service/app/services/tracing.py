@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from app.config import settings
+
+# W3C Trace Context: traceparent = 00-<trace-id, 32 hex>-<parent-id, 16 hex>-<flags>
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+# Служебные пути без лога трассы: Prometheus опрашивает /metrics каждые несколько секунд
+_UNLOGGED_PATHS = {"/metrics"}
+
+
+@dataclass
+class Span:
+    name: str
+    start: float  # Смещение от начала трассы, сек
+    duration: float
+
+
+class Trace:
+    """
+    Трасса одного запроса: trace-id (принятый от gateway или новый), свой span-id
+    и список этапов. Этапы сводятся в заголовок Server-Timing и в JSON-лог запроса.
+    """
+
+    def __init__(self, trace_id: str | None = None, parent_id: str | None = None, flags: str = "01"):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.parent_id = parent_id
+        self.span_id = os.urandom(8).hex()
+        self.flags = flags
+        self.started = time.perf_counter()
+        self.spans: list[Span] = []
+
+    @classmethod
+    def from_traceparent(cls, header: str | None) -> "Trace":
+        match = _TRACEPARENT_RE.match((header or "").strip().lower())
+        if match is None or match[1] == "0" * 32 or match[2] == "0" * 16:
+            return cls()
+        return cls(match[1], match[2], match[3])
+
+    def child(self) -> "Trace":
+        """Трасса продолжения в той же цепочке (например, фоновая задача после ответа 202)."""
+        return Trace(self.trace_id, self.span_id, self.flags)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{self.flags}"
+
+    def add(self, name: str, started: float, duration: float):
+        self.spans.append(Span(name, started - self.started, duration))
+
+    def timings(self) -> dict[str, float]:
+        """Суммарная длительность (мс) по этапам: параллельные чанки складываются."""
+        totals: dict[str, float] = defaultdict(float)
+        for span in self.spans:
+            totals[span.name] += span.duration * 1000
+        return {name: round(total, 1) for name, total in totals.items()}
+
+    def server_timing(self) -> str:
+        counts: dict[str, int] = defaultdict(int)
+        for span in self.spans:
+            counts[span.name] += 1
+        entries = []
+        for name, total in self.timings().items():
+            entry = f"{name};dur={total}"
+            if counts[name] > 1:
+                entry += f';desc="x{counts[name]}"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+    def log(self, **fields):
+        """Структурированный лог трассы: одна JSON-строка на запрос."""
+        if not settings.TRACE_LOG:
+            return
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            **fields,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "spans": [
+                {"name": s.name, "start_ms": round(s.start * 1000, 1), "duration_ms": round(s.duration * 1000, 1)}
+                for s in self.spans
+            ],
+        }
+        print(json.dumps(record, ensure_ascii=False), flush=True)
+
+
+# Трасса запроса, который сейчас обслуживается (None вне HTTP-запроса)
+current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+
+
+def record_span(name: str, started: float, duration: float):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(name, started, duration)
+
+
+@contextmanager
+def span(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, started, time.perf_counter() - started)
+
+
+def outgoing_headers() -> dict[str, str]:
+    """Заголовки для вызова upstream: продолжают трассу текущего запроса."""
+    trace = current_trace.get()
+    return {"traceparent": trace.traceparent} if trace is not None else {}
+
+
+class TracingMiddleware:
+    """
+    ASGI-middleware: принимает traceparent (или начинает новую трассу), отдает
+    X-Trace-Id и Server-Timing с этапами, завершившимися до отправки заголовков,
+    а по окончании ответа (в т.ч. SSE-потока) пишет лог трассы со всеми этапами.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        trace = Trace.from_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        token = current_trace.set(trace)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = list(message.get("headers", []))
+                response_headers.append((b"x-trace-id", trace.trace_id.encode()))
+                if trace.spans:
+                    response_headers.append((b"server-timing", trace.server_timing().encode()))
+                message = {**message, "headers": response_headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_trace.reset(token)
+            if scope["path"] not in _UNLOGGED_PATHS:
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                trace.log(method=scope["method"], route=route, path=scope["path"], status=status)
@@ -0,0 +1,105 @@
+import importlib.abc
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from app.config import settings
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Обертка над загрузчиком модуля: меряет время исполнения модуля."""
+
+    def __init__(self, loader, name: str, profiler: "StartupProfiler"):
+        self._loader = loader
+        self._name = name
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Загрузчик модуля должен остаться исходным: на него смотрят importlib.resources и reload
+        module.__loader__ = module.__spec__.loader = self._loader
+        with self._profiler.timed_import(self._name):
+            self._loader.exec_module(module)
+
+    def __getattr__(self, item):
+        return getattr(self._loader, item)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, fullname, self._profiler)
+        return spec
+
+
+class StartupProfiler:
+    """
+    Режим профилирования запуска (STARTUP_PROFILE=true): собственное время импорта
+    каждого модуля и длительность шагов lifespan. Отчет печатается, когда сервис готов.
+    Выключенный профайлер ничего не перехватывает.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self._imports: dict[str, float] = {}
+        self._stack: list[float] = []  # Время вложенных импортов текущего уровня
+        self._stages: list[tuple[str, float]] = []
+        if enabled:
+            sys.meta_path.insert(0, _TimingFinder(self))
+
+    @contextmanager
+    def timed_import(self, name: str):
+        self._stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self._stack.pop()
+            self._imports[name] = elapsed - nested
+            if self._stack:
+                self._stack[-1] += elapsed
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self._stages.append((name, time.perf_counter() - started))
+
+    def report(self, top: int = 15):
+        if not self.enabled:
+            return
+        sys.meta_path[:] = [finder for finder in sys.meta_path if not isinstance(finder, _TimingFinder)]
+        # Сторонние библиотеки суммируем по пакету верхнего уровня, модули сервиса — по отдельности
+        totals: dict[str, float] = defaultdict(float)
+        for name, own in self._imports.items():
+            key = name if name.split(".")[0] in ("app", "main") else name.split(".")[0]
+            totals[key] += own
+        print(f"⏱️ Startup profile: ready in {(time.perf_counter() - self.started) * 1000:.0f} ms")
+        print(f"   imports: {sum(self._imports.values()) * 1000:.0f} ms, top modules:")
+        for name, own in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]:
+            print(f"   {own * 1000:8.1f} ms  {name}")
+        print("   lifespan:")
+        for name, elapsed in self._stages:
+            print(f"   {elapsed * 1000:8.1f} ms  {name}")
+
+
+startup_profiler = StartupProfiler(settings.STARTUP_PROFILE)
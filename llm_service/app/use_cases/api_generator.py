@@ -1,14 +1,74 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator
+from app.config import settings
 from app.domain.models import ApiTestContext
+from app.services.cache_service import ResponseCache
+from app.services.llm_service import LLMService
+from app.services.markdown_table import MarkdownTable, render_row
+from app.services.metrics import track_stage
 from app.services.openapi_service import OpenAPIService
+from app.services.prompt_registry import prompt_registry
+from app.services.token_budget import prompt_budget, token_counter
 from app.use_cases.base import BaseUseCase
 
+logger = logging.getLogger(__name__)
+
+
+class ApiTableMerger:
+    """
+    Сводит таблицы тест-кейсов из ответов по фрагментам спецификации в одну:
+    заголовок берется из первого ответа, ID перенумеровываются сквозным API_001...,
+    повторяющиеся сценарии (тот же endpoint, метод и название) отбрасываются.
+    Ответы без таблицы не теряются: они идут после таблицы как есть.
+    """
 
-class ApiTestGeneratorUseCase(BaseUseCase):
     def __init__(self):
-        super().__init__("prompt_api_test.txt")
+        self.table: MarkdownTable | None = None
+        self.unparsed: list[str] = []
+        self._seen: set[tuple[str, ...]] = set()
+
+    def add(self, markdown: str) -> str:
+        """Добавляет ответ по фрагменту и возвращает новые строки итоговой таблицы."""
+        part = MarkdownTable.parse(markdown)
+        if part is None or not part.rows:
+            if markdown.strip():
+                self.unparsed.append(markdown.strip())
+            return ""
+
+        lines = []
+        if self.table is None:
+            self.table = MarkdownTable(header=part.header)
+            lines.append(self.table.render_header())
+
+        id_col = self.table.column("ID")
+        key_cols = [c for c in (self.table.column(n) for n in ("Endpoint", "Method", "Scenario Title")) if c is not None]
+        width = len(self.table.header)
+        for row in part.rows:
+            row = (row + [""] * width)[:width]
+            key = tuple(row[c].lower() for c in key_cols) if key_cols else tuple(row)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            if id_col is not None:
+                row[id_col] = f"API_{len(self.table.rows) + 1:03d}"
+            self.table.rows.append(row)
+            lines.append(render_row(row))
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def render(self) -> str:
+        return "\n\n".join(([self.table.render()] if self.table else []) + self.unparsed)
+
+
+class ApiTestGeneratorUseCase(BaseUseCase):
+    FIELD_WEIGHTS = {"spec_content": 4.0}
+
+    def __init__(self, llm_service: LLMService, cache: ResponseCache | None = None):
+        super().__init__("prompt_api_test.txt", llm_service, cache)
         self.openapi_service = OpenAPIService()
 
-    async def execute(self, context: ApiTestContext) -> str:
+    async def _spec_chunks(self, context: ApiTestContext) -> list[str]:
         spec_content = ""
 
         # Вариант 1: Если контент файла уже передан (через загрузку файла)
@@ -20,9 +80,87 @@ class ApiTestGeneratorUseCase(BaseUseCase):
             spec_content = await self.openapi_service.fetch_spec(context.url)
 
         else:
-            return "Error: No specification content or URL provided."
+            raise ValueError("No specification content or URL provided.")
+
+        # Бюджет фрагмента в токенах: не больше того, что остается от окна
+        # контекста после шаблона и остальных полей
+        template = prompt_registry.get(self.template_name)
+        budget = min(
+            settings.API_SPEC_CHUNK_TOKENS,
+            prompt_budget.field_budget(template, context.__dict__, "spec_content"),
+        )
+        if token_counter.count(spec_content) <= budget:
+            return [spec_content]
+        try:
+            spec = json.loads(spec_content)
+        except json.JSONDecodeError:
+            # Не JSON — делить не по чему, поле обрежет бюджет промпта
+            return [spec_content]
+
+        # Большая спецификация: делим по операциям с подстановкой $ref
+        return await asyncio.to_thread(
+            self.openapi_service.split_operations, spec, budget, token_counter.count
+        )
+
+    @staticmethod
+    def _chunk_data(context: ApiTestContext, spec_chunk: str) -> dict[str, Any]:
+        data = context.__dict__.copy()
+        data["spec_content"] = spec_chunk
+        return data
+
+    async def _generate_parts(self, context: ApiTestContext, chunks: list[str]) -> list[asyncio.Task]:
+        semaphore = asyncio.Semaphore(settings.API_SPEC_MAX_PARALLEL)
+
+        async def generate(chunk: str) -> str:
+            async with semaphore:
+                return await self._execute_llm(self._chunk_data(context, chunk))
+
+        return [asyncio.create_task(generate(chunk)) for chunk in chunks]
+
+    async def execute(self, context: ApiTestContext) -> str:
+        with track_stage("preprocess"):
+            chunks = await self._spec_chunks(context)
+        if len(chunks) == 1:
+            return await self._execute_llm(self._chunk_data(context, chunks[0]))
+
+        tasks = await self._generate_parts(context, chunks)
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        merger = ApiTableMerger()
+        for result in results:
+            merger.add(result)
+        self._warn_unparsed(merger, len(results))
+        return merger.render()
+
+    @staticmethod
+    def _warn_unparsed(merger: ApiTableMerger, total: int):
+        if merger.unparsed:
+            logger.warning("API generator: %d of %d chunk answers are not a test case table, returning them as is",
+                           len(merger.unparsed), total)
 
-        # Обновляем контекст финальным контентом (обрезаем для токенов)
-        context.spec_content = spec_content[:45000]  # Чуть увеличили лимит
+    async def stream(self, context: ApiTestContext) -> AsyncIterator[str]:
+        with track_stage("preprocess"):
+            chunks = await self._spec_chunks(context)
+        if len(chunks) == 1:
+            return self._stream_llm(self._chunk_data(context, chunks[0]))
+        return self._stream_parts(context, chunks)
 
-        return await self._execute_llm(context.__dict__)
\ No newline at end of file
+    async def _stream_parts(self, context: ApiTestContext, chunks: list[str]) -> AsyncIterator[str]:
+        """Отдает строки сводной таблицы по мере готовности фрагментов."""
+        tasks = await self._generate_parts(context, chunks)
+        merger = ApiTableMerger()
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                lines = merger.add(await next_done)
+                if lines:
+                    yield lines
+            self._warn_unparsed(merger, len(tasks))
+            if merger.unparsed:
+                yield ("\n" if merger.table else "") + "\n\n".join(merger.unparsed)
+        finally:
+            for task in tasks:
+                task.cancel()
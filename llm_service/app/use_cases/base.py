@@ -1,27 +1,130 @@
-import asyncio
-from typing import Any
+import time
+from typing import Any, AsyncIterator
+from app.services.cache_service import ResponseCache
 from app.services.llm_service import LLMService
-from app.config import settings
+from app.services.metrics import observe_stage, track_stage
+from app.services.prompt_registry import prompt_registry
+from app.services.scheduler import scheduler
+from app.services.single_flight import single_flight
+from app.services.token_budget import prompt_budget, record_usage
 
 
 class BaseUseCase:
-    def __init__(self, template_name: str):
-        self.llm_service = LLMService()
-        self.template_path = settings.RESOURCES_DIR / template_name
+    # Веса полей контекста при дележе окна контекста (по умолчанию 1.0)
+    FIELD_WEIGHTS: dict[str, float] = {}
 
-    def _load_prompt_template(self) -> str:
-        if not self.template_path.exists():
-            raise FileNotFoundError(f"Template not found: {self.template_path}")
-        with open(self.template_path, "r", encoding="utf-8") as f:
-            return f.read()
+    def __init__(self, template_name: str, llm_service: LLMService, cache: ResponseCache | None = None):
+        self.llm_service = llm_service
+        # None — кэш выключен или запрошен обход (заголовок X-Cache-Bypass)
+        self.cache = cache
+        self.template_name = template_name
+
+    async def _prepare(self, context: Any) -> dict[str, Any]:
+        """Данные для подстановки в шаблон. Переопределяется, если нужна предобработка."""
+        return context.__dict__
+
+    async def execute(self, context: Any) -> str:
+        with track_stage("preprocess"):
+            data = await self._prepare(context)
+        return await self._execute_llm(data)
+
+    async def stream(self, context: Any) -> AsyncIterator[str]:
+        """
+        Подготавливает контекст и возвращает поток фрагментов ответа.
+        Ошибки подготовки выбрасываются здесь, до начала стриминга.
+        """
+        with track_stage("preprocess"):
+            data = await self._prepare(context)
+        return self._stream_llm(data)
+
+    def _fill_prompt(self, context_data: dict[str, Any]) -> str:
+        """Ужимает поля под бюджет токенов и подставляет их в предразобранный шаблон."""
+        with track_stage("prompt"):
+            template = prompt_registry.get(self.template_name)
+            fitted = prompt_budget.fit(template, context_data, self.FIELD_WEIGHTS)
+            return template.render(fitted)
+
+    def _cache_key(self, filled_prompt: str) -> str:
+        return ResponseCache.make_key(
+            self.template_name,
+            filled_prompt,
+            self.llm_service.model_name,
+            self.llm_service.sampling_params,
+        )
+
+    async def _upstream(self, filled_prompt: str, cache_key: str, stream: bool, flight) -> AsyncIterator[str]:
+        """Источник ответа для single-flight: один реальный вызов LLM и запись в кэш."""
+        # Слот планировщика держится все время вызова, включая чтение потока
+        queued = time.perf_counter()
+        async with scheduler.slot():
+            observe_stage("queue", time.perf_counter() - queued)
+            with track_stage("llm"):
+                if stream:
+                    parts = []
+                    async for chunk in self.llm_service.stream_request(filled_prompt):
+                        parts.append(chunk)
+                        yield chunk
+                    result = "".join(parts)
+                else:
+                    result, flight.finish_reason = await self.llm_service.send_request(filled_prompt)
+                    yield result
+
+        # В кэш попадает только полностью полученный ответ, не обрезанный по max_tokens
+        if self.cache and flight.finish_reason != "length":
+            await self.cache.set(cache_key, result)
+
+    async def _cached(self, cache_key: str) -> str | None:
+        if not self.cache:
+            return None
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            record_usage(cached=True)
+        return cached
+
+    def _join_flight(self, filled_prompt: str, cache_key: str, stream: bool):
+        # Одинаковые одновременные запросы ждут один вызов LLM вместо своих
+        flight, coalesced = single_flight.join(
+            cache_key, lambda flight: self._upstream(filled_prompt, cache_key, stream, flight)
+        )
+        if coalesced:
+            record_usage(coalesced=True)
+        return flight
 
     async def _execute_llm(self, context_data: dict[str, Any]) -> str:
-        template = self._load_prompt_template()
+        return (await self._complete_llm(context_data))[0]
+
+    async def _complete_llm(self, context_data: dict[str, Any]) -> tuple[str, str | None]:
+        """
+        Ответ модели и finish_reason. Для ответа из кэша — None: обрезанные ответы
+        в кэш не попадают.
+        """
         try:
-            # Подстановка переменных в шаблон
-            filled_prompt = template.format(**context_data)
+            filled_prompt = self._fill_prompt(context_data)
         except KeyError as e:
-            return f"Template Error: Missing variable {e} in context."
+            return f"Template Error: Missing variable {e} in context.", None
+
+        cache_key = self._cache_key(filled_prompt)
+        cached = await self._cached(cache_key)
+        if cached is not None:
+            return cached, None
 
         # Вызов LLM
-        return await asyncio.to_thread(self.llm_service.send_request, filled_prompt)
\ No newline at end of file
+        flight = self._join_flight(filled_prompt, cache_key, stream=False)
+        result = await flight.result()
+        return result, flight.finish_reason
+
+    async def _stream_llm(self, context_data: dict[str, Any]) -> AsyncIterator[str]:
+        try:
+            filled_prompt = self._fill_prompt(context_data)
+        except KeyError as e:
+            yield f"Template Error: Missing variable {e} in context."
+            return
+
+        cache_key = self._cache_key(filled_prompt)
+        cached = await self._cached(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        async for chunk in self._join_flight(filled_prompt, cache_key, stream=True).subscribe():
+            yield chunk
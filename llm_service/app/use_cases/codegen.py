@@ -1,9 +1,167 @@
+import ast
+import asyncio
+import logging
+import re
+from typing import Any, AsyncIterator
+from app.config import settings
 from app.domain.models import AutoTestContext
+from app.services.cache_service import ResponseCache
+from app.services.code_merge import PytestModuleMerger, extract_code
+from app.services.llm_service import LLMService
+from app.services.markdown_table import MarkdownTable
+from app.services.metrics import track_stage
 from app.use_cases.base import BaseUseCase
 
+logger = logging.getLogger(__name__)
+
+# Колонки, по которым строки плана группируются в части (первая найденная)
+_GROUP_COLUMNS = ("Module", "Модуль", "Feature", "Раздел", "Компонент", "Endpoint")
+
+
 class AutoTestGeneratorUseCase(BaseUseCase):
-    def __init__(self):
-        super().__init__("prompt_codegen_pytest.txt")
+    """
+    Генерация pytest-кода по тест-плану. Большой план делится на части по модулю
+    (или по Endpoint) до CODEGEN_CHUNK_ROWS строк, части генерируются параллельно,
+    а модули собираются в один через AST. Часть принимается, только если ответ не обрезан
+    (finish_reason, незакрытый блок кода), разбирается и для каждого ID плана есть тест;
+    иначе она генерируется заново двумя половинами.
+    """
+    FIELD_WEIGHTS = {"test_plan": 4.0}
+
+    def __init__(self, llm_service: LLMService, cache: ResponseCache | None = None):
+        super().__init__("prompt_codegen_pytest.txt", llm_service, cache)
+
+    @staticmethod
+    def _group_key(table: MarkdownTable, column: int | None, row: list[str]) -> str:
+        if column is None or column >= len(row):
+            return ""
+        value = row[column].strip()
+        if table.header[column].lower() == "endpoint":
+            # /users/{id}/orders -> users: один ресурс — одна часть
+            return next((part for part in value.split("/") if part and not part.startswith("{")), value)
+        return value.lower()
+
+    @classmethod
+    def _plan_chunks(cls, context: AutoTestContext) -> tuple[MarkdownTable | None, list[list[list[str]]]]:
+        """Таблица плана (None — план не таблица) и ее строки, разложенные по частям."""
+        table = MarkdownTable.parse(context.test_plan)
+        size = settings.CODEGEN_CHUNK_ROWS
+        if table is None or len(table.rows) <= size:
+            return table, [table.rows if table else []]
+
+        column = next((c for c in (table.column(name) for name in _GROUP_COLUMNS) if c is not None), None)
+        groups: dict[str, list[list[str]]] = {}
+        for row in table.rows:
+            groups.setdefault(cls._group_key(table, column, row), []).append(row)
+
+        # Группы упаковываются в части целиком, если помещаются; большие делятся по size строк
+        chunks: list[list[list[str]]] = []
+        for rows in groups.values():
+            if chunks and len(chunks[-1]) + len(rows) <= size:
+                chunks[-1].extend(rows)
+            else:
+                chunks.extend(rows[i:i + size] for i in range(0, len(rows), size))
+        return table, chunks
+
+    @staticmethod
+    def _chunk_data(context: AutoTestContext, table: MarkdownTable, rows: list[list[str]]) -> dict[str, Any]:
+        data = context.__dict__.copy()
+        data["test_plan"] = MarkdownTable(header=table.header, rows=rows).render()
+        return data
+
+    @staticmethod
+    def _missing_ids(code: str, ids: list[str]) -> list[str]:
+        """ID строк плана, которых нет ни в одном тесте (имя, декораторы или тело `test_*`)."""
+        tree = ast.parse(code)
+        lines = code.splitlines()
+        tests = "\n".join(
+            "\n".join(lines[min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1:node.end_lineno])
+            for node in ast.walk(tree)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test")
+        )
+        missing = []
+        for row_id in ids:
+            # TC-1 находится и как "TC-1", и как test_tc_1, но не внутри TC-12
+            parts = re.findall(r"[^\W_]+", row_id)
+            pattern = r"(?<![^\W_])" + r"[\W_]?".join(map(re.escape, parts)) + r"(?![^\W_])"
+            if parts and not re.search(pattern, tests, re.IGNORECASE):
+                missing.append(row_id)
+        return missing
+
+    async def _generate_part(self, context: AutoTestContext, table: MarkdownTable, rows: list[list[str]],
+                             semaphore: asyncio.Semaphore) -> list[tuple[str, bool, list[str]]]:
+        """
+        Код по строкам плана: [(код, разобрался ли он, ID строк без теста)] — несколько,
+        если часть пришлось делить.
+        """
+        async with semaphore:
+            answer, finish_reason = await self._complete_llm(self._chunk_data(context, table, rows))
+        code, complete = extract_code(answer)
+        try:
+            compile(code, "<generated>", "exec")
+            parsed = True
+        except SyntaxError:
+            parsed = False
+        id_column = table.column("ID")
+        ids = [row[id_column] for row in rows if id_column is not None and id_column < len(row) and row[id_column]]
+        missing = self._missing_ids(code, ids) if parsed else []
+        if (parsed and complete and finish_reason != "length" and not missing) or len(rows) == 1:
+            return [(code, parsed, missing)]
+        logger.warning("Codegen: code for %d plan rows is cut off (finish_reason=%s), does not parse or misses "
+                       "%d tests, regenerating in halves", len(rows), finish_reason, len(missing))
+        middle = len(rows) // 2
+        halves = await asyncio.gather(
+            self._generate_part(context, table, rows[:middle], semaphore),
+            self._generate_part(context, table, rows[middle:], semaphore),
+        )
+        return halves[0] + halves[1]
+
+    async def _generate(self, context: AutoTestContext, table: MarkdownTable, chunks: list[list[list[str]]]) -> str:
+        semaphore = asyncio.Semaphore(settings.CODEGEN_MAX_PARALLEL)
+        tasks = [asyncio.create_task(self._generate_part(context, table, rows, semaphore)) for rows in chunks]
+        try:
+            parts = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        merger = PytestModuleMerger()
+        broken = []
+        missing = []
+        for code, parsed, part_missing in (part for chunk_parts in parts for part in chunk_parts):
+            missing.extend(part_missing)
+            if parsed:
+                merger.add(code)
+            else:
+                broken.append(code)
+        module = merger.render()
+        compile(module, "test_generated.py", "exec")  # Сборка из разобранных частей обязана компилироваться
+
+        result = f"```python\n{module}```"
+        for code in broken:
+            # Не теряем код, который не удалось разобрать, — отдаем отдельным блоком
+            result += f"\n\n**Не удалось встроить в модуль (синтаксическая ошибка):**\n```python\n{code}\n```"
+        if missing:
+            logger.warning("Codegen: no tests generated for %d plan rows", len(missing))
+            result += "\n\n**Не найдены тесты для строк плана:** " + ", ".join(missing)
+        return result
 
     async def execute(self, context: AutoTestContext) -> str:
-        return await self._execute_llm(context.__dict__)
\ No newline at end of file
+        with track_stage("preprocess"):
+            table, chunks = self._plan_chunks(context)
+        if table is None or not table.rows:
+            return await self._execute_llm(context.__dict__)
+        return await self._generate(context, table, chunks)
+
+    async def stream(self, context: AutoTestContext) -> AsyncIterator[str]:
+        # Табличный план проверяется на обрыв ответа до отдачи, поэтому идет не потоком токенов
+        with track_stage("preprocess"):
+            table, chunks = self._plan_chunks(context)
+        if table is None or not table.rows:
+            return self._stream_llm(context.__dict__)
+        return self._stream_generated(context, table, chunks)
+
+    async def _stream_generated(self, context: AutoTestContext, table: MarkdownTable,
+                                chunks: list[list[list[str]]]) -> AsyncIterator[str]:
+        # Модуль собирается только из всех частей — отдается одним фрагментом
+        yield await self._generate(context, table, chunks)
@@ -1,20 +1,79 @@
+import asyncio
+from typing import Any, AsyncIterator
 from app.domain.models import UiTestContext  # <--- Исправленный импорт
 from app.services.html_service import HTMLService
+from app.services.cache_service import ResponseCache
+from app.services.llm_service import LLMService
+from app.services.metrics import track_stage
+from app.services.token_budget import TokenUsage, request_usage
 from app.use_cases.base import BaseUseCase
 
 
+class PageUnavailableError(Exception):
+    pass
+
+
 class UiTestGeneratorUseCase(BaseUseCase):  # <--- Переименовали класс для ясности
-    def __init__(self):
-        super().__init__("prompt_template.txt")
-        self.html_service = HTMLService()
+    FIELD_WEIGHTS = {"html_content": 4.0}
 
-    async def execute(self, context: UiTestContext) -> str:
+    def __init__(self, llm_service: LLMService, html_service: HTMLService, cache: ResponseCache | None = None):
+        super().__init__("prompt_template.txt", llm_service, cache)
+        self.html_service = html_service
+
+    async def _prepare(self, context: UiTestContext) -> dict[str, Any]:
         # Специфичная логика для этого кейса: загрузка HTML
+        # Сводка страницы уже ужата до HTML_MAX_CHARS в HTMLService
         html_content = await self.html_service.fetch_page(context.url)
-        truncated_html = html_content[:30000] if html_content else "HTML недоступен"
+        return self._page_data(context, html_content)
 
+    @staticmethod
+    def _page_data(context: UiTestContext, html_content: str) -> dict[str, Any]:
         # Копируем данные контекста и добавляем HTML
         data = context.__dict__.copy()
-        data['html_content'] = truncated_html
+        data['html_content'] = html_content or "HTML недоступен"
+        return data
+
+    async def _generate_one(
+            self, context: UiTestContext, fetch_slots: asyncio.Semaphore, llm_slots: asyncio.Semaphore
+    ) -> tuple[str, TokenUsage]:
+        # Задача исполняется в своей копии контекста: токены учитываются по каждой странице
+        usage = TokenUsage()
+        request_usage.set(usage)
+        async with fetch_slots:
+            with track_stage("preprocess"):
+                html_content = await self.html_service.fetch_page(context.url)
+        # План по пустой заглушке вместо страницы бесполезен: токены на него не тратим
+        if not html_content:
+            raise PageUnavailableError(f"Page could not be loaded: {context.url}")
+        async with llm_slots:
+            return await self._execute_llm(self._page_data(context, html_content)), usage
 
-        return await self._execute_llm(data)
\ No newline at end of file
+    async def execute_batch(
+            self, contexts: list[UiTestContext], fetch_limit: int, llm_limit: int
+    ) -> AsyncIterator[tuple[int, str | None, TokenUsage | None, Exception | None]]:
+        """
+        Генерация по многим страницам: загрузка и очистка идут параллельно (не больше
+        fetch_limit страниц сразу), вызовы LLM — не больше llm_limit сразу.
+        Отдает (индекс, план, usage, ошибка) по мере готовности; ошибка одной страницы
+        не прерывает остальные.
+        """
+        fetch_slots = asyncio.Semaphore(fetch_limit)
+        llm_slots = asyncio.Semaphore(llm_limit)
+        tasks = {
+            asyncio.create_task(self._generate_one(context, fetch_slots, llm_slots)): index
+            for index, context in enumerate(contexts)
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=tasks.get):
+                    if task.exception() is not None:
+                        yield tasks[task], None, None, task.exception()
+                    else:
+                        result, usage = task.result()
+                        yield tasks[task], result, usage, None
+        finally:
+            # Клиент отключился посреди пакета — оставшиеся страницы не генерируем
+            for task in pending:
+                task.cancel()
@@ -1,9 +1,66 @@
+import asyncio
+from typing import Any
+from app.config import settings
 from app.domain.models import OptimizationContext
+from app.services.cache_service import ResponseCache
+from app.services.duplicate_detector import DuplicateGroup, drop_duplicates, find_duplicates
+from app.services.llm_service import LLMService
+from app.services.markdown_table import MarkdownTable, join_tables, split_tables
 from app.use_cases.base import BaseUseCase
 
 class OptimizationUseCase(BaseUseCase):
-    def __init__(self):
-        super().__init__("prompt_optimization.txt")
+    """
+    Ревью тест-плана. Дубликаты ищутся локально до вызова модели, в каждой таблице плана:
+    модель получает план без повторов (разделы и текст вокруг таблиц сохраняются)
+    и готовый список найденных дубликатов.
+    """
+    FIELD_WEIGHTS = {"test_cases": 4.0}
 
-    async def execute(self, context: OptimizationContext) -> str:
-        return await self._execute_llm(context.__dict__)
\ No newline at end of file
+    def __init__(self, llm_service: LLMService, cache: ResponseCache | None = None):
+        super().__init__("prompt_optimization.txt", llm_service, cache)
+
+    async def _prepare(self, context: OptimizationContext) -> dict[str, Any]:
+        data = context.__dict__.copy()
+        parts = split_tables(context.test_cases)
+        tables = [part for part in parts if isinstance(part, MarkdownTable) and part.rows]
+        if not tables:
+            data["duplicates"] = "Автоматический поиск не выполнялся: тест-план не в виде Markdown таблицы."
+            return data
+
+        # Каждая таблица (раздел плана) проверяется отдельно, текст между ними остается на месте.
+        # На планах в сотни строк сравнение занимает заметное время — не блокируем Event Loop
+        found = await asyncio.to_thread(
+            lambda: [find_duplicates(table, settings.OPTIMIZE_DUPLICATE_THRESHOLD) for table in tables])
+        if any(found):
+            cleaned = {id(table): drop_duplicates(table, groups) for table, groups in zip(tables, found)}
+            data["test_cases"] = join_tables([cleaned.get(id(part), part) for part in parts])
+        data["duplicates"] = self._describe(tables, found)
+        return data
+
+    @staticmethod
+    def _describe(tables: list[MarkdownTable], found: list[list[DuplicateGroup]]) -> str:
+        groups_count = sum(len(groups) for groups in found)
+        if not groups_count:
+            return "Дубликатов по шагам и ожидаемому результату не найдено."
+
+        dropped = sum(len(group.duplicates) for groups in found for group in groups)
+        total = sum(len(table.rows) for table in tables)
+        lines = [f"Групп дубликатов: {groups_count}; {dropped} из {total} строк убраны из плана выше."]
+        for number, (table, groups) in enumerate(zip(tables, found), start=1):
+            id_column = table.column("ID")
+
+            def name(row: int) -> str:
+                cells = table.rows[row]
+                if id_column is not None and id_column < len(cells) and cells[id_column]:
+                    return cells[id_column]
+                # Без ID строку можно найти только по номеру — в плане из нескольких таблиц еще и по таблице
+                return f"таблица {number}, строка {row + 1}" if len(tables) > 1 else f"строка {row + 1}"
+
+            for group in groups:
+                copies = ", ".join(
+                    f"{name(row)} (дословно)" if row in group.exact
+                    else f"{name(row)} (сходство {group.similarity[row]:.2f})"
+                    for row in group.duplicates
+                )
+                lines.append(f"- {name(group.keep)} (оставлен): {copies}")
+        return "\n".join(lines)
@@ -1,9 +1,98 @@
+import logging
+from typing import Any, AsyncIterator
+from app.config import settings
 from app.domain.models import RedactContext
+from app.services.cache_service import ResponseCache
+from app.services.llm_service import LLMService
+from app.services.metrics import track_stage
+from app.services.table_patch import (
+    TableDocument, apply_operations, edit_kind, parse_operations, render_excerpt, select_rows
+)
 from app.use_cases.base import BaseUseCase
 
+logger = logging.getLogger(__name__)
+
+
+class _RowPatchUseCase(BaseUseCase):
+    """Запрос к модели за операциями над строками таблицы (режим patch редактора)."""
+    FIELD_WEIGHTS = {"table_rows": 4.0}
+
+    def __init__(self, llm_service: LLMService, cache: ResponseCache | None = None):
+        super().__init__("prompt_redactor_patch.txt", llm_service, cache)
+
+    async def request_operations(self, data: dict[str, Any]) -> str:
+        return await self._execute_llm(data)
+
+
 class RedactorUseCase(BaseUseCase):
-    def __init__(self):
-        super().__init__("prompt_redactor.txt")
+    """
+    Правки контента по инструкции. Большие таблицы тест-кейсов правятся в режиме patch:
+    модель видит заголовок и строки, относящиеся к правке, и возвращает операции
+    insert/update/delete, которые применяются здесь же. Размер ответа модели
+    пропорционален правке, а не всему документу. Правки структуры (колонки) и всей
+    таблицы («переведи») в режиме auto идут полной перезаписью.
+    """
+    FIELD_WEIGHTS = {"original_content": 4.0}
+
+    def __init__(self, llm_service: LLMService, cache: ResponseCache | None = None):
+        super().__init__("prompt_redactor.txt", llm_service, cache)
+        self._patcher = _RowPatchUseCase(llm_service, cache)
+
+    @staticmethod
+    def _patch_target(context: RedactContext) -> tuple[TableDocument, list[int]] | None:
+        """Таблица и строки для режима patch или None, если документ переписывается целиком."""
+        if context.mode == "full":
+            return None
+        document = TableDocument.parse(context.original_content)
+        if document is None or not document.table.rows:
+            return None
+        kind = edit_kind(context.edit_instructions)
+        # Новые колонки операциями над строками не выразить
+        if context.mode == "auto" and (len(document.table.rows) < settings.REDACT_PATCH_MIN_ROWS or kind == "structure"):
+            return None
+        with track_stage("preprocess"):
+            rows, matched = select_rows(document.table, context.edit_instructions, settings.REDACT_PATCH_CONTEXT_ROWS)
+        # Вставке хватает самых похожих строк как образца и последней строки для нумерации, сколько бы
+        # строк ни совпало. Прочая правка не про конкретные строки («переведи») или про большее их число,
+        # чем уходит модели, — в patch она применилась бы только к части таблицы
+        if context.mode == "auto" and kind == "rows" and (matched == 0 or matched > settings.REDACT_PATCH_CONTEXT_ROWS):
+            return None
+        return document, rows
+
+    async def _patch(self, context: RedactContext, document: TableDocument, rows: list[int]) -> str | None:
+        table = document.table
+        data = {**context.__dict__, "table_rows": render_excerpt(table, rows), "total_rows": len(table.rows)}
+        answer = await self._patcher.request_operations(data)
+
+        operations = parse_operations(answer, table.header)
+        if operations is None:
+            logger.warning("Redactor: answer is not a table of row operations over the original columns, "
+                           "falling back to full rewrite")
+            return None
+        document.table, skipped = apply_operations(table, operations)
+        if skipped:
+            logger.warning("Redactor: %d of %d row operations reference missing rows", skipped, len(operations))
+        return document.render()
 
     async def execute(self, context: RedactContext) -> str:
-        return await self._execute_llm(context.__dict__)
\ No newline at end of file
+        target = self._patch_target(context)
+        if target is not None:
+            result = await self._patch(context, *target)
+            if result is not None:
+                return result
+        return await super().execute(context)
+
+    async def stream(self, context: RedactContext) -> AsyncIterator[str]:
+        target = self._patch_target(context)
+        if target is None:
+            return await super().stream(context)
+        return self._stream_patch(context, *target)
+
+    async def _stream_patch(self, context: RedactContext, document: TableDocument, rows: list[int]) -> AsyncIterator[str]:
+        # Документ готов только после применения всех операций — отдается одним фрагментом
+        result = await self._patch(context, document, rows)
+        if result is not None:
+            yield result
+            return
+        async for chunk in await super().stream(context):
+            yield chunk
@@ -1,9 +1,103 @@
+import ast
+import asyncio
+import logging
+from typing import Any, AsyncIterator
+from app.config import settings
 from app.domain.models import ReviewContext
+from app.services.cache_service import ResponseCache
+from app.services.code_review import (
+    CodeChunk, Finding, findings_for_prompt, merge_findings, parse_findings, render_report,
+    split_chunks, static_findings
+)
+from app.services.llm_service import LLMService
+from app.services.metrics import track_stage
+from app.services.prompt_registry import prompt_registry
+from app.services.token_budget import prompt_budget, token_counter
 from app.use_cases.base import BaseUseCase
 
+logger = logging.getLogger(__name__)
+
+
+class _ChunkReviewUseCase(BaseUseCase):
+    """Ревью одного фрагмента модуля: модель возвращает таблицу замечаний по строкам."""
+    FIELD_WEIGHTS = {"code_snippet": 4.0}
+
+    def __init__(self, llm_service: LLMService, cache: ResponseCache | None = None):
+        super().__init__("prompt_review_chunk.txt", llm_service, cache)
+
+    async def review(self, data: dict[str, Any]) -> str:
+        return await self._execute_llm(data)
+
+
 class ReviewUseCase(BaseUseCase):
-    def __init__(self):
-        super().__init__("prompt_review.txt")
+    """
+    Ревью автотестов. Python-код разбирается в AST: нарушения, которые видны без модели
+    (нет assert, `time.sleep`, хардкод, имена, allure), находятся локально, а модели
+    уходят фрагменты по тестам/классам — параллельно, с уже найденным в промпте.
+    Замечания сводятся в одну таблицу по номерам строк. Код, который не разбирается
+    как Python, ревьюится одним запросом, как раньше.
+    """
+    FIELD_WEIGHTS = {"code_snippet": 4.0}
+
+    def __init__(self, llm_service: LLMService, cache: ResponseCache | None = None):
+        super().__init__("prompt_review.txt", llm_service, cache)
+        self._chunk_reviewer = _ChunkReviewUseCase(llm_service, cache)
+
+    @staticmethod
+    def _analyze(context: ReviewContext) -> tuple[list[Finding], list[CodeChunk]] | None:
+        try:
+            tree = ast.parse(context.code_snippet)
+        except SyntaxError:
+            return None
+        # Бюджет фрагмента: не больше того, что остается от окна после шаблона и остальных полей
+        template = prompt_registry.get("prompt_review_chunk.txt")
+        budget = min(
+            settings.REVIEW_CHUNK_TOKENS,
+            prompt_budget.field_budget(template, {**context.__dict__, "local_findings": ""}, "code_snippet"),
+        )
+        return static_findings(tree), split_chunks(context.code_snippet, tree, budget, token_counter.count)
+
+    async def _review(self, context: ReviewContext, findings: list[Finding], chunks: list[CodeChunk]) -> str:
+        semaphore = asyncio.Semaphore(settings.REVIEW_MAX_PARALLEL)
+
+        async def review(chunk: CodeChunk) -> str:
+            data = {**context.__dict__, "code_snippet": chunk.numbered(),
+                    "local_findings": findings_for_prompt(findings, chunk)}
+            async with semaphore:
+                return await self._chunk_reviewer.review(data)
+
+        tasks = [asyncio.create_task(review(chunk)) for chunk in chunks]
+        try:
+            answers = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        model_findings: list[Finding] = []
+        notes = []
+        for chunk, answer in zip(chunks, answers):
+            parsed = parse_findings(answer, chunk)
+            if parsed is None:
+                logger.warning("Review: answer for lines %d-%d is not a findings table", chunk.start, chunk.end)
+                notes.append(f"**Строки {chunk.start}-{chunk.end}:**\n{answer.strip()}")
+                continue
+            model_findings.extend(parsed)
+        return render_report(merge_findings(findings, model_findings), len(chunks), notes)
 
     async def execute(self, context: ReviewContext) -> str:
-        return await self._execute_llm(context.__dict__)
\ No newline at end of file
+        with track_stage("preprocess"):
+            analysis = await asyncio.to_thread(self._analyze, context)
+        if analysis is None:
+            return await self._execute_llm(context.__dict__)
+        return await self._review(context, *analysis)
+
+    async def stream(self, context: ReviewContext) -> AsyncIterator[str]:
+        with track_stage("preprocess"):
+            analysis = await asyncio.to_thread(self._analyze, context)
+        if analysis is None:
+            return self._stream_llm(context.__dict__)
+        return self._stream_review(context, *analysis)
+
+    async def _stream_review(self, context: ReviewContext, findings: list[Finding], chunks: list[CodeChunk]) -> AsyncIterator[str]:
+        # Сводная таблица готова только после ответов по всем фрагментам — отдается одним фрагментом
+        yield await self._review(context, findings, chunks)
@@ -0,0 +1,86 @@
+"""
+Бенчмарк: HTMLDistiller против прежней очистки BeautifulSoup (HTMLService._clean_structure).
+
+Запуск из папки llm_service:
+    python -m benchmarks.bench_html_distill                 # синтетические страницы
+    python -m benchmarks.bench_html_distill page1.html ...  # сохраненные реальные страницы
+
+Для каждой страницы печатает время разбора (медиана), размер результата и
+сколько полей форм/кнопок попало в первые HTML_MAX_CHARS символов результата.
+"""
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from app.config import settings
+from app.services.html_distiller import HTMLDistiller
+from app.services.html_service import HTMLService
+
+RUNS = 5
+_CONTROL = re.compile(r'<(?:input|button|select|textarea)\b[^>]*?(?:name|id)="([^"]+)"', re.I)
+
+
+def synthetic_page(sections: int) -> str:
+    """Страница в духе корпоративного портала: большое меню, контент, формы в конце, подвал."""
+    nav = "".join(f'<li><a href="/section/{i}">Раздел {i}</a></li>' for i in range(300))
+    articles = "".join(
+        f"<article><h2>Новость {i}</h2><p>{'Текст новости с подробностями. ' * 40}</p>"
+        f'<img src="/i{i}.png" alt="Иллюстрация {i}"></article>'
+        for i in range(sections)
+    )
+    forms = "".join(
+        f'<form id="f{i}" action="/submit/{i}" method="post">'
+        f'<label for="email{i}">Email</label><input id="email{i}" name="email{i}" type="email" required>'
+        f'<label>Пароль <input name="password{i}" type="password" minlength="8"></label>'
+        f'<select name="role{i}"><option>Admin</option><option>User</option></select>'
+        f'<button type="submit" id="submit{i}">Отправить</button></form>'
+        for i in range(5)
+    )
+    footer = "".join(f'<a href="/legal/{i}">Документ {i}</a>' for i in range(200))
+    scripts = "<script>" + "var a = 1;" * 5000 + "</script>"
+    return (
+        f"<html><head><title>Портал</title>{scripts}<style>{'.x{{color:red}}' * 2000}</style></head>"
+        f"<body><nav><ul>{nav}</ul></nav><main>{articles}{forms}</main>"
+        f'<div role="dialog" aria-label="Cookies"><button id="accept">Принять</button></div>'
+        f"<footer>{footer}</footer></body></html>"
+    )
+
+
+def measure(fn, html: str) -> tuple[float, str]:
+    timings = []
+    result = ""
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        result = fn(html)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def report(name: str, html: str):
+    budget = settings.HTML_MAX_CHARS
+    distiller = HTMLDistiller()
+    controls = set(_CONTROL.findall(html))
+
+    print(f"\n=== {name}: {len(html) / 1024:.0f} KiB HTML, {len(controls)} именованных элементов управления")
+    for label, fn in (
+        ("bs4 cleaner", lambda h: HTMLService._clean_structure(h)[:budget]),
+        ("distiller", lambda h: distiller.distill(h, budget)),
+    ):
+        elapsed, result = measure(fn, html)
+        found = sum(1 for c in controls if c in result)
+        print(f"{label:12} {elapsed * 1000:8.1f} ms  {len(result):7d} chars  controls kept: {found}/{len(controls)}")
+
+
+def main(paths: list[str]):
+    if paths:
+        for path in paths:
+            report(path, Path(path).read_text(encoding="utf-8", errors="replace"))
+        return
+    for sections in (50, 200, 800):
+        report(f"synthetic x{sections}", synthetic_page(sections))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,18 +1,64 @@
-import uvicorn
+# Первым импортом: в режиме STARTUP_PROFILE меряет импорт всех остальных модулей
+from app.startup_profile import startup_profiler
+
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.config import settings
+from app.services.cache_service import ResponseCache
+from app.services.html_service import HTMLService
+from app.services.job_service import job_manager
+from app.services.llm_service import LLMService
+from app.services import metrics, tracing
+from app.services.scheduler import scheduler
+from app.services.prompt_registry import prompt_registry
+from app.services.token_budget import token_counter
 from app.handler.ai_handler import router as ai_router
 from app.handler.api import router as api_router
 
+def _warm_up():
+    """Импорт тяжелых зависимостей и загрузка токенизатора — в фоне, после готовности сервиса."""
+    token_counter.load()
+    import aiohttp  # noqa: F401
+    import openai  # noqa: F401
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print(f"🚀 Starting TestOps-Copilot on port {settings.PORT}...")
+    # Шаблоны промптов загружаются и проверяются один раз: сломанный шаблон не даст стартовать
+    with startup_profiler.stage("prompt_registry.load_all"):
+        prompt_registry.load_all()
+    # Общий на процесс async-клиент LLM с пулом keep-alive соединений (создается при первом запросе)
+    with startup_profiler.stage("LLMService"):
+        app.state.llm_service = LLMService()
+    # Общий пул соединений и кэш разобранных страниц для UI-генерации (сессия — при первой загрузке)
+    with startup_profiler.stage("HTMLService"):
+        app.state.html_service = HTMLService()
+    with startup_profiler.stage("ResponseCache"):
+        app.state.response_cache = ResponseCache(
+            db_path=settings.CACHE_DB_PATH,
+            memory_items=settings.CACHE_MEMORY_ITEMS,
+            ttl_seconds=settings.CACHE_TTL_SECONDS,
+            max_db_bytes=settings.CACHE_MAX_DB_MB * 1024 * 1024,
+        ) if settings.CACHE_ENABLED else None
+    # Пул воркеров для фоновых задач (?job=true)
+    with startup_profiler.stage("job_manager.start"):
+        await job_manager.start()
+    startup_profiler.report()
+    if settings.STARTUP_WARMUP:
+        app.state.warmup = asyncio.create_task(asyncio.to_thread(_warm_up))
     # Здесь можно добавить проверку соединения с БД или LLM
     yield
     print("🛑 Shutting down...")
+    await job_manager.close()
+    await app.state.llm_service.close()
+    await app.state.html_service.close()
+    if app.state.response_cache:
+        app.state.response_cache.close()
 
 app = FastAPI(
     title="TestOps-Copilot Backend",
@@ -27,11 +73,32 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Трасса запроса (traceparent, Server-Timing, лог этапов) — поверх CORS
+app.add_middleware(tracing.TracingMiddleware)
+# Внешним слоем: время запроса включает CORS и отдачу потока целиком
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.include_router(api_router, prefix="/api/v1")
 app.include_router(ai_router, prefix="/api/v1/ai")
 
+
+@app.get("/health")
+async def health_check():
+    return {"status": "ok", "service": "llm_service"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Метрики Prometheus: задержки по эндпоинтам и этапам, токены, очереди."""
+    metrics.SCHEDULER_QUEUE.set(scheduler.queued())
+    metrics.SCHEDULER_IN_FLIGHT.set(scheduler.in_flight)
+    metrics.JOB_QUEUE.set(job_manager.stats()["queued"])
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(
         "main:app", 
         host=settings.HOST, 
@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+
+class Upstream:
+    """Источник ответа LLM, который генерирует, пока его не отменят."""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def source(self, flight):
+        self.started.set()
+        try:
+            yield "first"
+            await asyncio.sleep(3600)
+            yield "never"
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+@pytest.fixture
+def upstream():
+    return Upstream()
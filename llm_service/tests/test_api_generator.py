@@ -0,0 +1,30 @@
+from app.use_cases.api_generator import ApiTableMerger
+
+_HEADER = "| ID | Endpoint | Method | Scenario Title |\n|---|---|---|---|\n"
+
+
+def test_merger_renumbers_and_drops_repeated_scenarios():
+    merger = ApiTableMerger()
+    merger.add(_HEADER + "| 1 | /users | GET | List users |\n| 2 | /users | POST | Create user |")
+    merger.add(_HEADER + "| 1 | /users | GET | List users |\n| 2 | /orders | GET | List orders |")
+
+    assert [row[0] for row in merger.table.rows] == ["API_001", "API_002", "API_003"]
+    assert [row[1] for row in merger.table.rows] == ["/users", "/users", "/orders"]
+
+
+def test_merger_keeps_answers_without_table():
+    merger = ApiTableMerger()
+    merger.add("Спецификация фрагмента не содержит операций.")
+    merger.add("Endpoint /orders: 1. Получить список заказов")
+
+    assert merger.render() == "Спецификация фрагмента не содержит операций.\n\nEndpoint /orders: 1. Получить список заказов"
+
+
+def test_merger_appends_unparsed_answers_after_table():
+    merger = ApiTableMerger()
+    merger.add(_HEADER + "| 1 | /users | GET | List users |")
+    merger.add("Endpoint /orders: 1. Получить список заказов")
+
+    rendered = merger.render()
+    assert rendered.startswith("| ID | Endpoint | Method | Scenario Title |")
+    assert rendered.endswith("\n\nEndpoint /orders: 1. Получить список заказов")
@@ -0,0 +1,27 @@
+import asyncio
+
+from app.services.job_service import JobManager, JobStatus
+from app.services.single_flight import SingleFlight
+
+
+def test_cancel_running_job_cancels_llm_call(upstream):
+    async def scenario():
+        manager = JobManager(workers=1, max_queue=10, result_ttl=60)
+        await manager.start()
+        flights = SingleFlight()
+
+        async def run() -> str:
+            flight, _ = flights.join("key", upstream.source)
+            return await flight.result()
+
+        job = manager.submit("codegen", run)
+        await upstream.started.wait()
+        manager.cancel(job)
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        assert job.status == JobStatus.CANCELLED
+        assert upstream.cancelled
+        await manager.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.domain.models import RedactContext
+from app.services.markdown_table import MarkdownTable
+from app.services.table_patch import edit_kind
+from app.use_cases.redactor import RedactorUseCase
+
+_SCENARIOS = [
+    ("Ввести логин и пароль, нажать «Войти»", "Открыт профиль"),
+    ("Ввести неверный пароль", "Ошибка «Неверный логин или пароль»"),
+    ("Открыть корзину, добавить товар", "Товар в корзине"),
+    ("Оформить заказ с оплатой картой", "Заказ создан"),
+    ("Открыть каталог, применить фильтр по цене", "Показаны товары в диапазоне"),
+]
+
+
+def _plan(rows: int = 200) -> str:
+    lines = ["# Тест-план", "", "| ID | Шаги | Ожидаемый результат |", "|---|---|---|"]
+    for i in range(1, rows + 1):
+        steps, expected = _SCENARIOS[i % len(_SCENARIOS)]
+        lines.append(f"| TC-{i} | {steps} (вариант {i}) | {expected} |")
+    lines += ["", "Итого: план регресса."]
+    return "\n".join(lines)
+
+
+def _context(instruction: str, mode: str = "auto") -> RedactContext:
+    return RedactContext(original_content=_plan(), edit_instructions=instruction, mode=mode)
+
+
+class _Patcher:
+    """Ответ модели в режиме patch: заранее заданная таблица операций."""
+
+    def __init__(self, answer: str):
+        self.answer = answer
+        self.requests = []
+
+    async def request_operations(self, data):
+        self.requests.append(data)
+        return self.answer
+
+
+def _redactor(answer: str) -> tuple[RedactorUseCase, _Patcher]:
+    redactor = RedactorUseCase.__new__(RedactorUseCase)
+    redactor._patcher = _Patcher(answer)
+    return redactor, redactor._patcher
+
+
+@pytest.mark.parametrize("instruction, kind", [
+    ("Добавь негативный тест на пустой пароль", "insert"),
+    ("add a negative test for an empty password", "insert"),
+    ("Допиши проверку выхода из аккаунта", "insert"),
+    ("Добавь колонку Приоритет", "structure"),
+    ("Add a Priority column", "structure"),
+    ("Удали TC-15", "rows"),
+    ("Исправь ожидаемый результат в TC-7", "rows"),
+    ("Переведи все на английский", "rows"),
+    ("Check the address field", "rows"),
+])
+def test_edit_kind(instruction, kind):
+    assert edit_kind(instruction) == kind
+
+
+@pytest.mark.parametrize("instruction", [
+    "Добавь негативный тест на пустой пароль",
+    "add a negative test for an empty password",
+])
+def test_auto_mode_patches_inserts_regardless_of_matches(instruction):
+    target = RedactorUseCase._patch_target(_context(instruction))
+
+    assert target is not None
+    document, rows = target
+    # Последняя строка — чтобы новые ID продолжили нумерацию; образцы — не больше лимита контекста
+    assert rows[-1] == len(document.table.rows) - 1
+    assert len(rows) <= settings.REDACT_PATCH_CONTEXT_ROWS + 3
+
+
+@pytest.mark.parametrize("instruction, expected_row", [
+    ("Удали TC-15", 14),
+    ("Исправь ожидаемый результат в TC-7: «Открыт личный кабинет»", 6),
+])
+def test_auto_mode_patches_edits_of_specific_rows(instruction, expected_row):
+    target = RedactorUseCase._patch_target(_context(instruction))
+
+    assert target is not None
+    assert expected_row in target[1]
+
+
+@pytest.mark.parametrize("instruction", [
+    "Переведи все на английский",
+    "Добавь колонку Приоритет",
+])
+def test_auto_mode_rewrites_whole_table_edits(instruction):
+    assert RedactorUseCase._patch_target(_context(instruction)) is None
+
+
+def test_full_mode_never_patches():
+    assert RedactorUseCase._patch_target(_context("Удали TC-15", mode="full")) is None
+
+
+def test_patch_applies_insert_and_keeps_text_around_table():
+    answer = "\n".join([
+        "| op | # | ID | Шаги | Ожидаемый результат |",
+        "|---|---|---|---|---|",
+        "| insert | 200 | TC-201 | Оставить пароль пустым, нажать «Войти» | Ошибка «Введите пароль» |",
+    ])
+    redactor, patcher = _redactor(answer)
+    context = _context("Добавь негативный тест на пустой пароль")
+
+    result = asyncio.run(redactor._patch(context, *redactor._patch_target(context)))
+
+    table = MarkdownTable.parse(result)
+    assert len(table.rows) == 201
+    assert table.rows[-1][0] == "TC-201"
+    assert result.startswith("# Тест-план") and result.endswith("Итого: план регресса.")
+    assert patcher.requests[0]["total_rows"] == 200
+
+
+def test_patch_applies_update_and_delete():
+    answer = "\n".join([
+        "| op | # | ID | Шаги | Ожидаемый результат |",
+        "|---|---|---|---|---|",
+        "| update | 7 | | | Открыт личный кабинет |",
+        "| delete | 15 | | | |",
+    ])
+    redactor, _ = _redactor(answer)
+    context = _context("Исправь ожидаемый результат в TC-7 и удали TC-15")
+
+    table = MarkdownTable.parse(asyncio.run(redactor._patch(context, *redactor._patch_target(context))))
+
+    assert len(table.rows) == 199
+    assert table.rows[6][0] == "TC-7" and table.rows[6][2] == "Открыт личный кабинет"
+    assert "TC-15" not in [row[0] for row in table.rows]
+
+
+def test_patch_rejects_answer_with_new_columns():
+    answer = "\n".join([
+        "| op | # | ID | Шаги | Ожидаемый результат | Приоритет |",
+        "|---|---|---|---|---|---|",
+        "| update | 1 | | | | High |",
+    ])
+    redactor, _ = _redactor(answer)
+    context = _context("Удали TC-15", mode="patch")
+
+    assert asyncio.run(redactor._patch(context, *redactor._patch_target(context))) is None
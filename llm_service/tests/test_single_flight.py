@@ -0,0 +1,47 @@
+import asyncio
+
+from app.services.single_flight import SingleFlight
+
+
+async def _cancel(task: asyncio.Task):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def test_last_subscriber_leaving_cancels_upstream(upstream):
+    async def scenario():
+        flights = SingleFlight()
+        flight, _ = flights.join("key", upstream.source)
+        waiter = asyncio.create_task(flight.result())
+        await upstream.started.wait()
+
+        await _cancel(waiter)
+        await asyncio.wait([flight.task], timeout=1)
+
+        assert upstream.cancelled
+        assert flight.abandoned
+        # Новый запрос с тем же ключом не подключается к отмененному вызову
+        assert flights.join("key", upstream.source)[1] is False
+
+    asyncio.run(scenario())
+
+
+def test_upstream_continues_while_someone_waits(upstream):
+    async def scenario():
+        flights = SingleFlight()
+        flight, _ = flights.join("key", upstream.source)
+        first = asyncio.create_task(flight.result())
+        coalesced, joined = flights.join("key", upstream.source)
+        second = asyncio.create_task(coalesced.result())
+        await upstream.started.wait()
+        await asyncio.sleep(0)
+
+        await _cancel(first)
+
+        assert joined
+        assert not upstream.cancelled and not flight.task.done()
+        await _cancel(second)
+        await asyncio.wait([flight.task], timeout=1)
+        assert upstream.cancelled
+
+    asyncio.run(scenario())